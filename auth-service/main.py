@@ -6,12 +6,20 @@ from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 from redis.asyncio import Redis
 
-from src.api.v1 import (admin_roles, admin_user_permissions, authentication,
-                        personal_account, registration)
+from src.api import metrics, well_known
+from src.api.v1 import (admin_roles, admin_user_permissions, admin_users,
+                        authentication, personal_account, registration)
 from src.core.api_settings import settings
 from src.core.logger import setup_logging
+from src.core.middleware import (pin_primary_after_write,
+                                 record_request_latency)
 from src.db import redis_db
+from src.db.postgres import engine, replica_engine
 from src.models.db_entity import create_database, purge_database
+from src.services.email_filter import email_filter
+from src.services.hashing import password_hasher
+from src.services.login_history import login_history_writer
+from src.services.rbac import rbac_service
 
 setup_logging()
 
@@ -21,12 +29,22 @@ async def lifespan(app: FastAPI):
     # On startup events
     logging.info('Config: %s', vars(settings))
     redis_db.redis = Redis(host=settings.redis_host, port=settings.redis_port)
+    password_hasher.start()
     # Creating and filling DB
     await create_database()
+    await rbac_service.start()
+    await email_filter.load()
+    login_history_writer.start()
     yield
     # On shutdown events
+    # Draining login history before closing connections.
+    await login_history_writer.stop()
     # await purge_database()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
     await redis_db.redis.close()
+    password_hasher.shutdown()
 
 app = FastAPI(
     lifespan=lifespan,
@@ -38,11 +56,19 @@ app = FastAPI(
     version='1.0.0'
 )
 
+if settings.pg_replica_host:
+    app.middleware('http')(pin_primary_after_write)
+# Added last to be the outermost middleware and measure the whole request.
+app.middleware('http')(record_request_latency)
+
 app.include_router(registration.router, prefix="/api/v1", tags=['Registration'])
 app.include_router(authentication.router, prefix="/api/v1", tags=['Authentication'])
 app.include_router(personal_account.router, prefix="/api/v1", tags=['Personal account'])
 app.include_router(admin_roles.router, prefix="/api/v1", tags=['Administrate roles'])
 app.include_router(admin_user_permissions.router, prefix="/api/v1", tags=['Administrate user permissions'])
+app.include_router(admin_users.router, prefix="/api/v1", tags=['Administrate users'])
+app.include_router(well_known.router, tags=['Keys'])
+app.include_router(metrics.router, tags=['Metrics'])
 
 
 if __name__ == '__main__':
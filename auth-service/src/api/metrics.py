@@ -0,0 +1,23 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, generate_latest,
+                               multiprocess)
+
+router = APIRouter()
+
+
+@router.get('/metrics', include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    Prometheus scrape endpoint. Not proxied by nginx, scraped from the app port directly.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Aggregating metrics of all gunicorn workers.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -4,12 +4,11 @@ from fastapi import APIRouter, Cookie, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.v1.authentication import get_superuser
-from src.db.postgres import get_pg_session
-from src.models.db_entity import User
+from src.db.postgres import get_pg_read_session, get_pg_session
 from src.schema.model import (PermissionCreateReq, PermissionCreateResp,
                               PermissionInfoResp, PermissionsListResp,
                               RoleCreateReq, RoleCreateResp, RoleInfoResp,
-                              RolesListResp)
+                              RolesListResp, UserPrincipal)
 from src.services.admin_roles import AdminRolesService, get_admin_roles_service
 
 router = APIRouter()
@@ -21,9 +20,9 @@ router = APIRouter()
     status_code=status.HTTP_200_OK
 )
 async def get_permissions(
-    db: AsyncSession = Depends(get_pg_session),
+    db: AsyncSession = Depends(get_pg_read_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> PermissionsListResp:
 
     return await admin_roles_service.get_all_permissions(db=db)
@@ -38,7 +37,7 @@ async def create_permission(
     permission_data: PermissionCreateReq,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> PermissionInfoResp:
 
     return await admin_roles_service.create_permission(db=db, permission_data=permission_data)
@@ -49,7 +48,7 @@ async def delete_permission(
     permission_name: str,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> None:
 
     return await admin_roles_service.delete_permission(db=db, permission_name=permission_name)
@@ -61,9 +60,9 @@ async def delete_permission(
     status_code=status.HTTP_200_OK
 )
 async def get_roles(
-    db: AsyncSession = Depends(get_pg_session),
+    db: AsyncSession = Depends(get_pg_read_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> RolesListResp:
 
     return await admin_roles_service.get_all_roles(db=db)
@@ -78,7 +77,7 @@ async def create_role(
     role_data: RoleCreateReq,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> RoleInfoResp:
 
     return await admin_roles_service.create_role(db=db, role_data=role_data)
@@ -91,9 +90,9 @@ async def create_role(
 )
 async def get_role_permissions(
     role_name: str,
-    db: AsyncSession = Depends(get_pg_session),
+    db: AsyncSession = Depends(get_pg_read_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> PermissionsListResp:
 
     return await admin_roles_service.get_permissions_by_role(db=db, role_name=role_name)
@@ -105,7 +104,7 @@ async def update_role_permissions(
     permissions: List[str],
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> RoleInfoResp:
 
     return await admin_roles_service.update_role_permissions(db=db, role_name=role_name, permissions=permissions)
@@ -116,7 +115,7 @@ async def delete_permission(
     role_name: str,
     db: AsyncSession = Depends(get_pg_session),
     admin_roles_service: AdminRolesService = Depends(get_admin_roles_service),
-    su_user: User = Depends(get_superuser)
+    su_user: UserPrincipal = Depends(get_superuser)
 ) -> None:
 
     return await admin_roles_service.delete_role(db=db, role_name=role_name)
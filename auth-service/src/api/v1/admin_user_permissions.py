@@ -6,10 +6,11 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.v1.authentication import get_superuser
-from src.db.postgres import get_pg_session
-from src.models.db_entity import User
-from src.schema.model import UserRolesResp
+from src.db.postgres import get_pg_read_session, get_pg_session
+from src.schema.model import (UserPrincipal, UserRolesBatchReq,
+                              UserRolesBatchResp, UserRolesResp)
 from src.services.base import BaseService, get_base_service
+from src.services.principal import PrincipalService, get_principal_service
 
 router = APIRouter()
 
@@ -20,9 +21,9 @@ router = APIRouter()
             description='Details regarding user permissions')
 async def get_user_roles_list(
         user_id: UUID4,
-        db: AsyncSession = Depends(get_pg_session),
+        db: AsyncSession = Depends(get_pg_read_session),
         base_service: BaseService = Depends(get_base_service),
-        su_user: User = Depends(get_superuser)):
+        su_user: UserPrincipal = Depends(get_superuser)):
     """
     Endpoint to get info regarding user roles.
     """
@@ -48,7 +49,8 @@ async def add_role_to_user(
         role_id: UUID4,
         db: AsyncSession = Depends(get_pg_session),
         base_service: BaseService = Depends(get_base_service),
-        su_user: User = Depends(get_superuser)):
+        principal_service: PrincipalService = Depends(get_principal_service),
+        su_user: UserPrincipal = Depends(get_superuser)):
     """
     Endpoint to add a role to a user.
     """
@@ -66,6 +68,8 @@ async def add_role_to_user(
         logging.error('Role id:%s already assigned to user id:%s', role.id, user.id)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='role alredy assingned')
 
+    await principal_service.invalidate(user.id)
+
     return UserRolesResp(
         user_id=str(user.id),
         user_name=user.email,
@@ -82,7 +86,8 @@ async def delete_role_from_user(
         role_id: UUID4,
         db: AsyncSession = Depends(get_pg_session),
         base_service: BaseService = Depends(get_base_service),
-        su_user: User = Depends(get_superuser)):
+        principal_service: PrincipalService = Depends(get_principal_service),
+        su_user: UserPrincipal = Depends(get_superuser)):
     """
     Endpoint to remove a role from a user.
     """
@@ -95,9 +100,47 @@ async def delete_role_from_user(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='role does not exist')
 
     user_roles = await base_service.remove_role_from_user(db, user.id, role.id)
+    await principal_service.invalidate(user.id)
 
     return UserRolesResp(
         user_id=str(user.id),
         user_name=user.email,
         roles=user_roles
     )
+
+
+@router.post('/admin/users/roles/assign',
+             status_code=status.HTTP_200_OK,
+             response_model=UserRolesBatchResp,
+             description='Add roles to users in one batch')
+async def assign_roles_to_users(
+        batch: UserRolesBatchReq,
+        db: AsyncSession = Depends(get_pg_session),
+        base_service: BaseService = Depends(get_base_service),
+        principal_service: PrincipalService = Depends(get_principal_service),
+        su_user: UserPrincipal = Depends(get_superuser)):
+    """
+    Assigns every role to every user. Already assigned roles and unknown ids are skipped,
+    the response contains only the added roles and the unknown ids.
+    """
+    result = await base_service.assign_roles_to_users(db, batch.user_ids, batch.role_ids)
+    await principal_service.invalidate(*{user_id for user_ids in result.changed.values() for user_id in user_ids})
+    return result
+
+
+@router.post('/admin/users/roles/revoke',
+             status_code=status.HTTP_200_OK,
+             response_model=UserRolesBatchResp,
+             description='Delete roles from users in one batch')
+async def revoke_roles_from_users(
+        batch: UserRolesBatchReq,
+        db: AsyncSession = Depends(get_pg_session),
+        base_service: BaseService = Depends(get_base_service),
+        principal_service: PrincipalService = Depends(get_principal_service),
+        su_user: UserPrincipal = Depends(get_superuser)):
+    """
+    Revokes every role from every user, the response contains only the removed roles and the unknown ids.
+    """
+    result = await base_service.revoke_roles_from_users(db, batch.user_ids, batch.role_ids)
+    await principal_service.invalidate(*{user_id for user_ids in result.changed.values() for user_id in user_ids})
+    return result
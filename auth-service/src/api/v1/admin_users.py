@@ -0,0 +1,28 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Request, status
+
+from src.api.v1.authentication import get_superuser
+from src.schema.model import UserImportResp, UserPrincipal
+from src.services.user_import import (ImportFormat, UserImporter,
+                                      get_user_importer, iter_lines)
+
+router = APIRouter()
+
+
+@router.post('/admin/users/import',
+             status_code=status.HTTP_200_OK,
+             response_model=UserImportResp,
+             description='Bulk import of users from NDJSON or CSV request body')
+async def import_users(
+        request: Request,
+        file_format: Annotated[ImportFormat, Query(alias='format')] = ImportFormat.ndjson,
+        user_importer: UserImporter = Depends(get_user_importer),
+        su_user: UserPrincipal = Depends(get_superuser)) -> UserImportResp:
+    """
+    Imports users from the request body, which is read as a stream.
+    Every row has 'email' and either 'password' or 'hashed_password',
+    optionally 'is_active', 'is_verified' and 'registered_at'.
+    Rows with errors are skipped and reported, the rest of the rows are imported.
+    """
+    return await user_importer.run(iter_lines(request.stream()), file_format)
@@ -1,4 +1,6 @@
+import ipaddress
 import logging
+from math import ceil
 from typing import Annotated, Dict
 
 from fastapi import (APIRouter, Cookie, Depends, HTTPException, Request,
@@ -7,24 +9,74 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.core.api_settings import settings
 from src.db.postgres import get_pg_session
-from src.models.db_entity import User
 from src.schema.cookie import AccessTokenCookie, RefreshTokenCookie
-from src.schema.model import AccessTokenData
+from src.schema.model import (AccessTokenData, PermissionCheckResp,
+                              PermissionsBitmapResp, UserPrincipal)
 from src.services.authentication import (AuthenticationService,
                                          get_authentication_service)
 from src.services.base import BaseService, get_base_service
 from src.services.jwt_token import JWTService, get_jwt_service
+from src.services.principal import PrincipalService, get_principal_service
+from src.services.rate_limit import LoginRateLimiter, get_login_rate_limiter
+from src.services.rbac import RBACService, get_rbac_service
 
 router = APIRouter()
 
+TRUSTED_PROXIES = [ipaddress.ip_network(proxy, strict=False) for proxy in settings.trusted_proxies]
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    Returns the client IP behind trusted reverse proxies. X-Forwarded-For is read from the right,
+    the first address which is not a trusted proxy is the client. X-Real-IP is used without X-Forwarded-For.
+    The headers are ignored if the peer is not a trusted proxy, so clients can not spoof them.
+    """
+    peer = request.client.host if request.client else ''
+    if not is_trusted_proxy(peer):
+        return peer
+
+    forwarded_for = [address.strip() for header in request.headers.getlist('x-forwarded-for')
+                     for address in header.split(',')]
+    for address in reversed(forwarded_for):
+        if not is_trusted_proxy(address):
+            try:
+                return str(ipaddress.ip_address(address))
+            except ValueError:
+                # Garbage added by a client in front of the proxies.
+                return peer
+    if forwarded_for:
+        # The request has passed trusted proxies only.
+        return forwarded_for[0]
+
+    real_ip = request.headers.get('x-real-ip', '').strip()
+    try:
+        return str(ipaddress.ip_address(real_ip))
+    except ValueError:
+        return peer
+
 
 async def check_access_token(
+        request: Request,
         input_token: str = Cookie(alias=AccessTokenCookie.name),
         jwt_service: JWTService = Depends(get_jwt_service)) -> dict:
     """
     Function to check access jwt token from the Cookie.
+    Verified payload is memoised in 'request.state' for the rest of the request.
     """
+    memoised_result = getattr(request.state, 'access_token_payload', None)
+    if memoised_result is not None:
+        return memoised_result
+
     if not input_token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='unauthorised')
 
@@ -33,31 +85,33 @@ async def check_access_token(
     if not result:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='unauthorised')
 
+    request.state.access_token_payload = result
+
     return result
 
 
 async def get_user(
         db: Annotated[AsyncSession, Depends(get_pg_session)],
-        base_service: Annotated[BaseService, Depends(get_base_service)],
+        principal_service: Annotated[PrincipalService, Depends(get_principal_service)],
         access_token_dict: Annotated[Dict, Depends(check_access_token)]
-        ) -> User:
+        ) -> UserPrincipal:
     """
-    Checks if user_id, received in JWT token exists in DB.
+    Checks if user_id, received in JWT token exists.
     Depends on func 'check_access_token'.
-    Returns User DB model.
+    Returns cached user snapshot, DB is queried on a cache miss only.
     """
 
     access_token = AccessTokenData(**access_token_dict)
 
-    db_user = await base_service.get_user_by_uuid(db, user_id=access_token.user_id)
+    user = await principal_service.get_principal(db, user_id=access_token.user_id)
 
-    if not db_user:
+    if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
-    return db_user
+    return user
 
 
-async def get_current_active_user(user: Annotated[User, Depends(get_user)]) -> User:
+async def get_current_active_user(user: Annotated[UserPrincipal, Depends(get_user)]) -> UserPrincipal:
     """
     Checks if received from DB user is active.
     Depends on func 'get_user'.
@@ -68,7 +122,7 @@ async def get_current_active_user(user: Annotated[User, Depends(get_user)]) -> U
     return user
 
 
-async def get_superuser(user: Annotated[User, Depends(get_current_active_user)]) -> User:
+async def get_superuser(user: Annotated[UserPrincipal, Depends(get_current_active_user)]) -> UserPrincipal:
     """
     Checks if received from DB user is superuser.
     Depends on func 'get_current_active_user'.
@@ -79,6 +133,36 @@ async def get_superuser(user: Annotated[User, Depends(get_current_active_user)])
     return user
 
 
+def require_permission(permission_name: str):
+    """
+    Builds a dependency which checks if the current user has the permission.
+    The user principal is always resolved (cached, the DB is queried on a cache miss only),
+    so deactivated and deleted users are rejected whatever their tokens contain.
+    Permissions bitmap from the access token is used only if it was built by the current
+    RBAC matrix from the current roles of the user, otherwise the principal is checked
+    against the in-memory RBAC matrix. RBAC sync polls Redis at most once per poll interval.
+    """
+    async def checker(
+            db: Annotated[AsyncSession, Depends(get_pg_session)],
+            principal_service: Annotated[PrincipalService, Depends(get_principal_service)],
+            rbac_service: Annotated[RBACService, Depends(get_rbac_service)],
+            access_token_dict: Annotated[Dict, Depends(check_access_token)]) -> None:
+        await rbac_service.sync()
+        user = await get_current_active_user(await get_user(db, principal_service, access_token_dict))
+
+        token_role_ids = set(AuthenticationService.get_role_ids(access_token_dict.get('roles')))
+        granted = None
+        if not user.is_superuser and token_role_ids == set(user.role_ids):
+            granted = rbac_service.matrix.check_permissions_claim(access_token_dict.get('perms'), permission_name)
+        if granted is None:
+            # Claim is absent, outdated or built from other roles.
+            granted = rbac_service.has_permission(user, permission_name)
+        if not granted:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='permission denied')
+
+    return checker
+
+
 async def check_refresh_token(
         input_token: str = Cookie(alias=RefreshTokenCookie.name),
         jwt_service: JWTService = Depends(get_jwt_service)) -> dict:
@@ -103,11 +187,23 @@ async def login_user_for_access_token_cookie(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: AsyncSession = Depends(get_pg_session),
     base_service: BaseService = Depends(get_base_service),
-    authentication_service: AuthenticationService = Depends(get_authentication_service)
+    authentication_service: AuthenticationService = Depends(get_authentication_service),
+    login_rate_limiter: LoginRateLimiter = Depends(get_login_rate_limiter),
+    client_ip: str = Depends(get_client_ip)
 ):
     """
     User login endpoint
     """
+    if settings.login_rate_limit_enabled:
+        retry_after = await login_rate_limiter.check(form_data.username, client_ip)
+        if retry_after is not None:
+            logging.warning('Login attempt of %s from %s is rate limited', form_data.username, client_ip)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail='too many login attempts',
+                headers={'Retry-After': str(ceil(retry_after))}
+            )
+
     try:
         user = await authentication_service.authenticate_user(db, form_data.username, form_data.password)
     except Exception as excp:
@@ -120,6 +216,9 @@ async def login_user_for_access_token_cookie(
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='user is inactive')
 
+    if settings.login_rate_limit_enabled:
+        await login_rate_limiter.reset(form_data.username)
+
     try:
         user_roles_list = await base_service.get_user_roles(db, user.id)
         user_roles = [jsonable_encoder(role) for role in user_roles_list]
@@ -128,7 +227,11 @@ async def login_user_for_access_token_cookie(
         logging.error('Unable to get roles for user %s. The following error occured: %s', form_data.username, excp)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='internal server error')
 
-    access_token, refresh_token = await authentication_service.get_tokens(user_id=str(user.id), user_roles=user_roles)
+    access_token, refresh_token = await authentication_service.get_tokens(
+        user_id=str(user.id),
+        user_roles=user_roles,
+        ip_address=client_ip,
+        user_agent=request.headers.get('user-agent'))
 
     # In production, when you have https certificate, add secure=True to the methods below.
     response.set_cookie(key=AccessTokenCookie.name, value=access_token, httponly=True)
@@ -136,9 +239,8 @@ async def login_user_for_access_token_cookie(
 
     try:
         await authentication_service.save_login_history(
-            db,
             user_id=str(user.id),
-            ip_address=request.client.host,
+            ip_address=client_ip,
             user_agent=request.headers.get('user-agent'),
             location=request.headers.get('location')
         )
@@ -170,6 +272,32 @@ async def logout_user(
     return
 
 
+@router.post('/logout-all', status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user_everywhere(
+    response: Response,
+    access_token_dict: dict = Depends(check_access_token),
+    authentication_service: AuthenticationService = Depends(get_authentication_service)
+):
+    """
+    User logout endpoint, revokes refresh tokens of all the user sessions.
+    Already issued access tokens stay valid until they expire.
+    """
+    access_token = AccessTokenData(**access_token_dict)
+
+    try:
+        revoked = await authentication_service.logout_user_everywhere(access_token.user_id)
+    except Exception as excp:
+        logging.error('Unable to revoke sessions of user %s: %s', access_token.user_id, excp)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='internal server error')
+
+    logging.info('Revoked %s sessions of user %s', revoked, access_token.user_id)
+
+    response.delete_cookie(key=AccessTokenCookie.name)
+    response.delete_cookie(key=RefreshTokenCookie.name)
+
+    return
+
+
 @router.post('/token-refresh', status_code=status.HTTP_200_OK)
 async def refresh_user_tokens_cookie_pair(
     response: Response,
@@ -189,3 +317,42 @@ async def refresh_user_tokens_cookie_pair(
     response.set_cookie(key=RefreshTokenCookie.name, value=refresh_token, httponly=True)
 
     return
+
+
+@router.get('/permissions/{permission_name}/check',
+            status_code=status.HTTP_200_OK,
+            response_model=PermissionCheckResp,
+            description='Check if the current user has a permission')
+async def check_user_permission(
+    permission_name: str,
+    user: UserPrincipal = Depends(get_current_active_user),
+    rbac_service: RBACService = Depends(get_rbac_service)
+) -> PermissionCheckResp:
+    """
+    Permission check endpoint for resource services.
+    """
+    await rbac_service.sync()
+
+    return PermissionCheckResp(
+        user_id=str(user.id),
+        permission=permission_name,
+        granted=rbac_service.has_permission(user, permission_name)
+    )
+
+
+@router.get('/permissions/bitmap',
+            status_code=status.HTTP_200_OK,
+            response_model=PermissionsBitmapResp,
+            description='Permission names in the order of bits of the access token "perms" claim')
+async def get_permissions_bitmap(
+    response: Response,
+    rbac_service: RBACService = Depends(get_rbac_service)
+) -> PermissionsBitmapResp:
+    """
+    Lets resource services decode the "perms" access token claim locally.
+    """
+    await rbac_service.sync()
+    matrix = rbac_service.matrix
+    response.headers['Cache-Control'] = f'public, max-age={int(settings.rbac_poll_interval_sec)}'
+
+    return PermissionsBitmapResp(version=matrix.fingerprint, permissions=list(matrix.permission_names))
@@ -1,21 +1,29 @@
+from datetime import UTC, datetime
 from math import ceil
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
 from pydantic import UUID4
 from sqlalchemy import asc, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.api.v1.authentication import (check_access_token,
                                        get_current_active_user)
-from src.db.postgres import get_pg_session
-from src.models.db_entity import User
+from src.db.postgres import get_pg_read_session, get_pg_session
 from src.schema.model import (AccessTokenData, ResetCredentialsResp,
                               ResetPasswordResp, UserAccountInfoResp,
-                              UserLoginHistoryResp, UserResetEmailReq,
-                              UserResetPasswordReq)
+                              UserLoginHistory, UserLoginHistoryResp,
+                              UserPrincipal,
+                              UserResetEmailReq, UserResetPasswordReq,
+                              UserSessionsResp)
+from src.services.authentication import (AuthenticationService,
+                                         get_authentication_service)
 from src.services.base import BaseService, get_base_service
-from src.services.pagination import Pagination, SortEnum, pagination_params
+from src.services.email_filter import EmailFilter, get_email_filter
+from src.services.pagination import (Pagination, SortEnum, decode_cursor,
+                                     encode_cursor, pagination_params)
+from src.services.principal import PrincipalService, get_principal_service
 
 router = APIRouter()
 
@@ -35,7 +43,7 @@ async def check_user_id(user_id: UUID4, access_token_dict: dict) -> None:
             description='Details regarding user account')
 async def get_user_account_info(
         user_id: UUID4,
-        db_user: User = Depends(get_current_active_user),
+        db_user: UserPrincipal = Depends(get_current_active_user),
         access_token_dic: dict = Depends(check_access_token)):
     """
     Returns details regarding user account.
@@ -49,6 +57,15 @@ async def get_user_account_info(
     return db_user
 
 
+def as_naive_utc(moment: datetime | None) -> datetime | None:
+    """
+    Login history timestamps are naive UTC, comparing them with aware values fails.
+    """
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(UTC).replace(tzinfo=None)
+
+
 @router.get('/account/{user_id}/history',
             status_code=status.HTTP_200_OK,
             response_model=UserLoginHistoryResp,
@@ -56,27 +73,74 @@ async def get_user_account_info(
 async def get_user_login_history_info(
         pagination: Annotated[Pagination, Depends(pagination_params)],
         user_id: UUID4,
-        db: AsyncSession = Depends(get_pg_session),
+        date_from: datetime | None = Query(default=None, description='Logins since this time, UTC.'),
+        date_to: datetime | None = Query(default=None, description='Logins before this time, UTC.'),
+        db: AsyncSession = Depends(get_pg_read_session),
         base_service: BaseService = Depends(get_base_service),
-        db_user: User = Depends(get_current_active_user),
+        db_user: UserPrincipal = Depends(get_current_active_user),
         access_token_dic: dict = Depends(check_access_token)) -> UserLoginHistoryResp:
     """
     Returns paginated details regarding user login history.
     """
     await check_user_id(user_id, access_token_dic)
 
-    offset = pagination.get_offset()
     order = desc if pagination.order == SortEnum.DESC else asc
-
-    login_history, count = await base_service.get_user_login_history(
-        db, db_user.id, limit=pagination.per_page, offset=offset, order=order)
+    after = None
+    if pagination.cursor:
+        try:
+            after = decode_cursor(pagination.cursor, pagination.order)
+        except ValueError as excp:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(excp))
+        after = (as_naive_utc(after[0]), after[1])
+    date_from, date_to = as_naive_utc(date_from), as_naive_utc(date_to)
+
+    # One extra row tells whether there is a next page.
+    login_history = await base_service.get_user_login_history(
+        db,
+        db_user.id,
+        limit=pagination.per_page + 1,
+        offset=pagination.get_offset(),
+        order=order,
+        after=after,
+        date_from=date_from,
+        date_to=date_to)
+
+    next_cursor = None
+    if len(login_history) > pagination.per_page:
+        login_history = login_history[:pagination.per_page]
+        last = login_history[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id, pagination.order)
+
+    count = None
+    if pagination.include_total:
+        count = await base_service.count_user_login_history(db, db_user.id, date_from, date_to)
 
     return UserLoginHistoryResp(
-        page=pagination.page,
-        total_pages=ceil(count / pagination.per_page),
+        page=None if after else pagination.page,
+        total_pages=None if count is None else ceil(count / pagination.per_page),
         total_entries=count,
         per_page=pagination.per_page,
-        data=login_history)
+        next_cursor=next_cursor,
+        data=[UserLoginHistory(**jsonable_encoder(login)) for login in login_history])
+
+
+@router.get('/account/{user_id}/sessions',
+            status_code=status.HTTP_200_OK,
+            response_model=UserSessionsResp,
+            description='Active sessions of the user')
+async def get_user_sessions(
+        user_id: UUID4,
+        authentication_service: AuthenticationService = Depends(get_authentication_service),
+        db_user: UserPrincipal = Depends(get_current_active_user),
+        access_token_dic: dict = Depends(check_access_token)) -> UserSessionsResp:
+    """
+    Returns active sessions (devices) of the user.
+    """
+    await check_user_id(user_id, access_token_dic)
+
+    sessions = await authentication_service.get_user_sessions(str(db_user.id))
+
+    return UserSessionsResp(user_id=str(db_user.id), data=sessions)
 
 
 @router.put('/account/{user_id}/reset-email',
@@ -88,19 +152,23 @@ async def update_user_email(
         user_data: UserResetEmailReq,
         db: AsyncSession = Depends(get_pg_session),
         base_service: BaseService = Depends(get_base_service),
-        db_user: User = Depends(get_current_active_user),
+        principal_service: PrincipalService = Depends(get_principal_service),
+        email_filter: EmailFilter = Depends(get_email_filter),
+        db_user: UserPrincipal = Depends(get_current_active_user),
         access_token_dic: dict = Depends(check_access_token)) -> ResetCredentialsResp:
     """
     Updates user email in the DB.
     """
     await check_user_id(user_id, access_token_dic)
 
-    if await base_service.check_email_exists(db, user_data.email):
+    if await email_filter.might_contain(user_data.email) and await base_service.check_email_exists(db, user_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='user with received email already exists')
 
+    await email_filter.add(user_data.email)
     result = await base_service.update_user_email(db, user_data.email, db_user.id)
+    await principal_service.invalidate(db_user.id)
 
     return result
 
@@ -114,7 +182,8 @@ async def update_user_password(
         user_data: UserResetPasswordReq,
         db: AsyncSession = Depends(get_pg_session),
         base_service: BaseService = Depends(get_base_service),
-        db_user: User = Depends(get_current_active_user),
+        principal_service: PrincipalService = Depends(get_principal_service),
+        db_user: UserPrincipal = Depends(get_current_active_user),
         access_token_dic: dict = Depends(check_access_token)) -> ResetPasswordResp:
     """
     Updates user password in the DB.
@@ -122,5 +191,6 @@ async def update_user_password(
     await check_user_id(user_id, access_token_dic)
 
     result = await base_service.update_user_password(db, user_data.password, db_user.id)
+    await principal_service.invalidate(db_user.id)
 
     return result
@@ -0,0 +1,28 @@
+import hashlib
+
+import orjson
+from fastapi import APIRouter, Header, Response, status
+
+from src.core.api_settings import settings
+from src.services.jwt_keys import get_key_ring
+
+router = APIRouter()
+
+
+@router.get('/.well-known/jwks.json', description='Public keys to verify jwt tokens')
+async def get_jwks(if_none_match: str | None = Header(default=None)) -> Response:
+    """
+    JWK Set endpoint for resource services verifying tokens locally.
+    Key ring does not change while the service is running, so responses are cacheable.
+    """
+    body = orjson.dumps(get_key_ring().get_jwks())
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {
+        'Cache-Control': f'public, max-age={settings.jwks_cache_max_age_sec}',
+        'ETag': etag
+    }
+
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,74 @@
+"""
+Password hashing profiles benchmark. Measures hashes per second of every profile
+on all the given worker processes, so KDF parameters can be picked for the login latency target.
+A login costs one hash check, a registration or a password reset one hash generation.
+
+Usage, from the auth-service folder:
+    python -m src.cli.hashing
+    python -m src.cli.hashing --profile scrypt --profile scrypt:65536:8:1 --workers 4 --duration 10
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.services.hashing import (PASSWORD_HASH_PROFILES, generate_hash,
+                                  resolve_profile, verify_hash)
+
+
+def run_checks(hashed_password: str, duration: float) -> list[float]:
+    """
+    Checks the password in a loop for 'duration' seconds, returns durations of the checks.
+    """
+    durations = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        verify_hash(hashed_password, 'benchmark-password')
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def benchmark(method: str, workers: int, duration: float) -> dict:
+    hashed_password = generate_hash('benchmark-password', method)
+    # 'spawn' as in the service executor.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # Warming up the worker processes, so their start is not measured.
+        list(executor.map(run_checks, [hashed_password] * workers, [0] * workers))
+        results = list(executor.map(run_checks, [hashed_password] * workers, [duration] * workers))
+
+    durations = sorted(value for worker_durations in results for value in worker_durations)
+    return {
+        'hashes_per_sec': len(durations) / duration,
+        'hashes_per_sec_per_core': len(durations) / duration / workers,
+        'p50_ms': durations[len(durations) // 2] * 1000,
+        'p99_ms': durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000,
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    profiles = args.profile or list(PASSWORD_HASH_PROFILES)
+    print(f'{"profile":<20} {"method":<22} {"hashes/s":>10} {"per core":>10} {"p50 ms":>8} {"p99 ms":>8}')
+    for profile in profiles:
+        method = resolve_profile(profile)
+        try:
+            result = benchmark(method, args.workers, args.duration)
+        except ImportError as excp:
+            print(f'{profile:<20} {method:<22} skipped: {excp}')
+            continue
+        print(
+            f'{profile:<20} {method:<22} {result["hashes_per_sec"]:>10.1f} {result["hashes_per_sec_per_core"]:>10.1f} '
+            f'{result["p50_ms"]:>8.1f} {result["p99_ms"]:>8.1f}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', action='append',
+                        help='profile name or method, may be repeated; all the presets by default')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes, use PASSWORD_HASH_WORKERS of the service for comparable numbers')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per profile')
+
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+"""
+Login history partitions maintenance. Meant to be run daily by cron or a k8s CronJob.
+
+    create-partitions  creates partitions of the current and of the next months,
+                       moves rows from the default partition to their monthly partitions
+    apply-retention    archives partitions older than the retention period
+                       to gzipped CSV files, detaches and drops them
+    rebuild-stats      recounts 'user_login_stats' from 'login_history',
+                       needed once after upgrade from a version without the counters
+
+Usage, from the auth-service folder:
+    python -m src.cli.login_history create-partitions --months-ahead 3
+    python -m src.cli.login_history apply-retention --retention-months 12 --archive-dir /var/lib/auth/archive
+    python -m src.cli.login_history rebuild-stats
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import delete, exists, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.core.api_settings import settings
+from src.core.logger import setup_logging
+from src.db.partitions import create_partitions, drop_old_partitions
+from src.db.postgres import engine
+from src.models.db_entity import LoginHistory, UserLoginStats
+
+
+async def subtract_partition_stats(conn: AsyncConnection, partition: str) -> None:
+    """
+    Keeps login counters equal to the amount of rows left in 'login_history'.
+    """
+    await conn.execute(text(
+        f'UPDATE {UserLoginStats.__tablename__} AS stats '
+        f'SET login_count = GREATEST(stats.login_count - dropped.login_count, 0) '
+        f'FROM (SELECT user_id, count(*) AS login_count FROM "{partition}" GROUP BY user_id) AS dropped '
+        f'WHERE stats.user_id = dropped.user_id'
+    ))
+
+
+async def rebuild_stats(conn: AsyncConnection) -> None:
+    """
+    Makes 'user_login_stats' match 'login_history', stats of users without history rows are deleted.
+    """
+    await conn.execute(delete(UserLoginStats).where(
+        ~exists().where(LoginHistory.user_id == UserLoginStats.user_id)
+    ))
+    statement = insert(UserLoginStats).from_select(
+        ['user_id', 'login_count', 'last_login_at'],
+        select(LoginHistory.user_id, func.count(), func.max(LoginHistory.timestamp)).group_by(LoginHistory.user_id)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[UserLoginStats.user_id],
+        set_={'login_count': statement.excluded.login_count, 'last_login_at': statement.excluded.last_login_at}
+    )
+    await conn.execute(statement)
+
+
+async def main(args: argparse.Namespace) -> None:
+    table = LoginHistory.__tablename__
+    try:
+        if args.command == 'apply-retention':
+            # One transaction per partition, so the table is not locked while all of them are processed.
+            archive_dir = Path(args.archive_dir) if args.archive_dir else None
+            await drop_old_partitions(
+                engine, table, args.retention_months, archive_dir, before_detach=subtract_partition_stats)
+            return
+
+        async with engine.begin() as conn:
+            if args.command == 'create-partitions':
+                await create_partitions(conn, table, args.months_ahead)
+            else:
+                await rebuild_stats(conn)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = subparsers.add_parser('create-partitions')
+    create_parser.add_argument('--months-ahead', type=int, default=settings.login_history_partitions_ahead)
+
+    retention_parser = subparsers.add_parser('apply-retention')
+    retention_parser.add_argument('--retention-months', type=int, default=settings.login_history_retention_months)
+    retention_parser.add_argument('--archive-dir', default=settings.login_history_archive_dir,
+                                  help='dump partitions here before dropping, no archive if empty')
+
+    subparsers.add_parser('rebuild-stats')
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+"""
+Bulk user import from NDJSON or CSV files, e.g. a migration from another system.
+Every row has 'email' and either 'password' or 'hashed_password' (a hash of a supported method),
+optionally 'is_active', 'is_verified' and 'registered_at'. CSV files must have a header line.
+Rows with errors are skipped and written to stderr or to '--errors-file' as NDJSON.
+
+Usage, from the auth-service folder:
+    python -m src.cli.users import users.ndjson
+    python -m src.cli.users import users.csv --chunk-size 10000 --errors-file import-errors.ndjson
+"""
+import argparse
+import asyncio
+import sys
+from typing import AsyncIterator
+
+from redis.asyncio import Redis
+
+from src.core.api_settings import settings
+from src.core.logger import setup_logging
+from src.db import redis_db
+from src.db.postgres import async_session, engine
+from src.services.email_filter import email_filter
+from src.services.hashing import password_hasher
+from src.services.user_import import ImportFormat, UserImporter
+
+
+async def read_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding='utf-8', newline='') as import_file:
+        for line in import_file:
+            yield line.rstrip('\n')
+
+
+async def main(args: argparse.Namespace) -> None:
+    file_format = ImportFormat(args.format or ('csv' if args.path.endswith('.csv') else 'ndjson'))
+    # Imported emails are added to the shared email filter, so running workers see them.
+    redis_db.redis = Redis(host=settings.redis_host, port=settings.redis_port)
+    password_hasher.start()
+    importer = UserImporter(async_session, email_filter, chunk_size=args.chunk_size)
+    try:
+        result = await importer.run(read_lines(args.path), file_format)
+    finally:
+        password_hasher.shutdown()
+        await engine.dispose()
+        await redis_db.redis.close()
+
+    errors_file = open(args.errors_file, 'w', encoding='utf-8') if args.errors_file else sys.stderr
+    try:
+        for error in result.errors:
+            errors_file.write(error.model_dump_json() + '\n')
+    finally:
+        if errors_file is not sys.stderr:
+            errors_file.close()
+    print(f'Imported: {result.imported}, failed: {result.failed}')
+
+
+if __name__ == '__main__':
+    setup_logging()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--format', choices=[item.value for item in ImportFormat],
+                               help='by the file extension if not set: .csv or NDJSON otherwise')
+    import_parser.add_argument('--chunk-size', type=int, default=settings.user_import_chunk_size)
+    import_parser.add_argument('--errors-file', help='NDJSON file for rows with errors, stderr by default')
+
+    asyncio.run(main(parser.parse_args()))
@@ -21,6 +21,26 @@ class Settings(BaseSettings):
     pg_password: str = Field('', alias='PG_PASSWORD')
     pg_host: str = Field('127.0.0.1', alias='PG_HOST')
     pg_port: int = Field(5433, alias='PG_PORT')
+    # Read replica for read-only endpoints. Empty host means all reads go to the primary.
+    pg_replica_host: str | None = Field(None, alias='PG_REPLICA_HOST')
+    # Primary port is used if not set.
+    pg_replica_port: int | None = Field(None, alias='PG_REPLICA_PORT')
+    # Client reads go to the primary for this period after its own write, should exceed the replication lag.
+    pg_read_your_writes_sec: int = Field(5, alias='PG_READ_YOUR_WRITES_SEC')
+    # Replica is not used for this period after a connection failure.
+    pg_replica_retry_sec: float = Field(30, alias='PG_REPLICA_RETRY_SEC')
+    # Logs every statement, for debugging only.
+    pg_echo: bool = Field(False, alias='PG_ECHO')
+    # Every gunicorn worker has its own pool:
+    # workers * (pool_size + max_overflow) must stay below Postgres max_connections.
+    pg_pool_size: int = Field(10, alias='PG_POOL_SIZE')
+    pg_max_overflow: int = Field(10, alias='PG_MAX_OVERFLOW')
+    pg_pool_timeout_sec: float = Field(30, alias='PG_POOL_TIMEOUT_SEC')
+    # Connections older than this are reopened, -1 disables recycling.
+    pg_pool_recycle_sec: int = Field(1800, alias='PG_POOL_RECYCLE_SEC')
+    pg_pool_pre_ping: bool = Field(True, alias='PG_POOL_PRE_PING')
+    # Prepared statements cached per connection. Set 0 behind pgbouncer in transaction mode.
+    pg_statement_cache_size: int = Field(100, alias='PG_STATEMENT_CACHE_SIZE')
     # Logging
     log_format: str = Field('%(asctime)s - %(name)s - %(levelname)s - %(message)s', alias='API_LOG_FORMAT')
     log_default_handlers: list = Field(['console', ], alias='API_LOG_DEFAULT_HANDLERS')
@@ -29,11 +49,80 @@ class Settings(BaseSettings):
     unicorn_error_log_lvl: str = Field('INFO', alias='API_UNICORN_ERROR_LOG_LVL')
     unicorn_access_log_lvl: str = Field('INFO', alias='API_UNICORN_ACCESS_LOG_LVL')
     root_log_lvl: str = Field('INFO', alias='API_ROOT_LOG_LVL')
+    # One JSON object per line instead of 'log_format'.
+    log_json: bool = Field(False, alias='API_LOG_JSON')
+    # Handlers run in a background thread instead of the event loop.
+    log_queue: bool = Field(True, alias='API_LOG_QUEUE')
+    # Max records per second of every message template below WARNING, 0 disables sampling.
+    log_sample_max_per_sec: int = Field(0, alias='API_LOG_SAMPLE_MAX_PER_SEC')
     # JWT token settings
     jwt_secret_key: str = Field('', alias='JWT_SECRET_KEY')
     jwt_algorithm: str = Field('HS256', alias='JWT_ALGORITHM')
+    # 'jose' supports all algorithms, 'hmac' is a faster codec for HS256/HS384/HS512 only.
+    jwt_backend: str = Field('jose', alias='JWT_BACKEND')
     jwt_at_expire_minutes: int = Field(30, alias='JWT_ACCESS_TOKEN_EXPIRE_MINUTES')
     jwt_rt_expire_minutes: int = Field(1440, alias='JWT_REFRESH_TOKEN_EXPIRE_MINUTES')
+    # Asymmetric algorithms (RS256, ES256, ...) only.
+    # Active private key PEM and public key PEMs of previous keys, still valid for verification.
+    jwt_private_key_path: str = Field('', alias='JWT_PRIVATE_KEY_PATH')
+    jwt_previous_public_key_paths: list = Field([], alias='JWT_PREVIOUS_PUBLIC_KEY_PATHS')
+    # 'kid' header of the active key. Derived from the public key if empty.
+    jwt_key_id: str = Field('', alias='JWT_KEY_ID')
+    jwks_cache_max_age_sec: int = Field(300, alias='JWKS_CACHE_MAX_AGE_SEC')
+    # Add 'perms' claim with permissions bitmap to access tokens.
+    jwt_permissions_claim: bool = Field(False, alias='JWT_PERMISSIONS_CLAIM')
+    # Put role ids only into tokens instead of role id and name pairs.
+    jwt_compact_roles: bool = Field(False, alias='JWT_COMPACT_ROLES')
+    # Verified tokens cache. TTL is capped by the token 'exp' claim.
+    jwt_verify_cache_size: int = Field(10000, alias='JWT_VERIFY_CACHE_SIZE')
+    jwt_verify_cache_ttl_sec: int = Field(60, alias='JWT_VERIFY_CACHE_TTL_SEC')
+    # Principal (user snapshot) cache
+    principal_cache_ttl_sec: int = Field(300, alias='PRINCIPAL_CACHE_TTL_SEC')
+    principal_local_cache_size: int = Field(10000, alias='PRINCIPAL_LOCAL_CACHE_SIZE')
+    principal_local_cache_ttl_sec: int = Field(5, alias='PRINCIPAL_LOCAL_CACHE_TTL_SEC')
+    # RBAC. Max delay before a worker picks up roles and permissions changes.
+    rbac_poll_interval_sec: float = Field(5, alias='RBAC_POLL_INTERVAL_SEC')
+    # Login history writer
+    login_history_queue_size: int = Field(10000, alias='LOGIN_HISTORY_QUEUE_SIZE')
+    login_history_batch_size: int = Field(500, alias='LOGIN_HISTORY_BATCH_SIZE')
+    login_history_flush_interval_sec: float = Field(1, alias='LOGIN_HISTORY_FLUSH_INTERVAL_SEC')
+    # 'drop' discards rows when the queue is full, 'block' makes login requests wait for a free slot.
+    login_history_overflow_policy: str = Field('drop', alias='LOGIN_HISTORY_OVERFLOW_POLICY')
+    # Login history monthly partitions: created ahead of time and kept for the retention period.
+    login_history_partitions_ahead: int = Field(3, alias='LOGIN_HISTORY_PARTITIONS_AHEAD')
+    login_history_retention_months: int = Field(12, alias='LOGIN_HISTORY_RETENTION_MONTHS')
+    # Old partitions are dumped here as gzipped CSV before being dropped. Empty means no archive.
+    login_history_archive_dir: str | None = Field(None, alias='LOGIN_HISTORY_ARCHIVE_DIR')
+    # Login brute force protection: attempts per sliding window by email and by client IP.
+    login_rate_limit_enabled: bool = Field(True, alias='LOGIN_RATE_LIMIT_ENABLED')
+    login_limit_email_attempts: int = Field(5, alias='LOGIN_LIMIT_EMAIL_ATTEMPTS')
+    login_limit_email_window_sec: int = Field(60, alias='LOGIN_LIMIT_EMAIL_WINDOW_SEC')
+    login_limit_ip_attempts: int = Field(50, alias='LOGIN_LIMIT_IP_ATTEMPTS')
+    login_limit_ip_window_sec: int = Field(60, alias='LOGIN_LIMIT_IP_WINDOW_SEC')
+    # Lockout after exceeding a limit, doubled for every next lockout within 'login_lockout_reset_sec'.
+    login_lockout_base_sec: int = Field(30, alias='LOGIN_LOCKOUT_BASE_SEC')
+    login_lockout_max_sec: int = Field(3600, alias='LOGIN_LOCKOUT_MAX_SEC')
+    login_lockout_reset_sec: int = Field(86400, alias='LOGIN_LOCKOUT_RESET_SEC')
+    # Reverse proxies (IPs or CIDRs) trusted to set X-Forwarded-For and X-Real-IP with the client IP.
+    trusted_proxies: list = Field([], alias='TRUSTED_PROXIES')
+    # Probabilistic set of registered emails answering unknown emails without a DB query.
+    # 'redis' shares new emails between workers, 'local' is for a single process only, 'off' disables the filter.
+    email_filter_mode: str = Field('off', alias='EMAIL_FILTER_MODE')
+    email_filter_capacity: int = Field(1_000_000, alias='EMAIL_FILTER_CAPACITY')
+    email_filter_error_rate: float = Field(0.01, alias='EMAIL_FILTER_ERROR_RATE')
+    # Misses of an older filter go to the DB and rebuild the filter, so users inserted bypassing the service are found.
+    email_filter_max_age_sec: float = Field(300, alias='EMAIL_FILTER_MAX_AGE_SEC')
+    # Bulk user import: rows per COPY chunk and errors returned by the import endpoint.
+    user_import_chunk_size: int = Field(5000, alias='USER_IMPORT_CHUNK_SIZE')
+    user_import_max_errors: int = Field(1000, alias='USER_IMPORT_MAX_ERRORS')
+    # Password hashing
+    # Name from PASSWORD_HASH_PROFILES in src/services/hashing.py or a method like 'scrypt:16384:8:1'.
+    # Hashes of other methods are upgraded on the next successful login.
+    password_hash_profile: str = Field('scrypt', alias='PASSWORD_HASH_PROFILE')
+    # 'process' or 'thread'. Process pool falls back to threads if it can not be started.
+    password_hash_executor: str = Field('process', alias='PASSWORD_HASH_EXECUTOR')
+    # None means os.cpu_count(). Keep in mind that every gunicorn worker has its own pool.
+    password_hash_workers: int | None = Field(None, alias='PASSWORD_HASH_WORKERS')
 
 
 settings = Settings(_env_file=DOTENV, _env_file_encoding='utf-8')
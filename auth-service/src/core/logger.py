@@ -1,12 +1,121 @@
+import atexit
+import logging
+import queue
+import threading
+import time
 from logging import config
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
 
 from src.core.api_settings import settings
 
+# Standard LogRecord attributes, everything else has been passed in 'extra'.
+RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime'}
+
+# Keys masked by Redacted at any nesting level.
+SENSITIVE_KEYS = frozenset(('password', 'hashed_password', 'token', 'access_token', 'refresh_token', 'session_id'))
+
+
+class Redacted:
+    """
+    Log argument masking sensitive keys of a payload. Redaction runs only when
+    the record is formatted, so it costs nothing for filtered out records.
+    """
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    @classmethod
+    def redact(cls, value):
+        if isinstance(value, dict):
+            return {key: '***' if key in SENSITIVE_KEYS else cls.redact(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [cls.redact(item) for item in value]
+        return value
+
+    def __str__(self) -> str:
+        return str(self.redact(self.payload))
+
+    __repr__ = __str__
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one-line JSON objects with orjson. Fields passed in 'extra' are added as is.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes at most 'max_per_sec' records per second of every message template below WARNING.
+    The amount of dropped records is added to the next passed record of the template.
+    """
+
+    def __init__(self, max_per_sec: int):
+        super().__init__()
+        self.max_per_sec = max_per_sec
+        # (logger, template) -> [current second, passed in the second, dropped since the last passed]
+        self.counters: dict[tuple[str, str], list[int]] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        second = int(time.monotonic())
+        with self.lock:
+            counter = self.counters.setdefault((record.name, str(record.msg)), [second, 0, 0])
+            if counter[0] != second:
+                counter[0], counter[1] = second, 0
+            if counter[1] >= self.max_per_sec:
+                counter[2] += 1
+                return False
+            counter[1] += 1
+            dropped, counter[2] = counter[2], 0
+
+        if dropped:
+            record.sampled_out = dropped
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them. Unlike QueueHandler, message formatting
+    happens in the listener thread too, so log arguments must not be mutated after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {
+            '()': SamplingFilter,
+            'max_per_sec': settings.log_sample_max_per_sec,
+        },
+    },
     'formatters': {
         'verbose': {'format': settings.log_format},
+        'json': {'()': JSONFormatter},
         'default': {
             '()': 'uvicorn.logging.DefaultFormatter',
             'fmt': '%(levelprefix)s %(message)s',
@@ -21,7 +130,8 @@ LOGGING = {
         'console': {
             'level': settings.console_log_lvl,
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': 'json' if settings.log_json else 'verbose',
+            'filters': ['sampling'] if settings.log_sample_max_per_sec else [],
         },
         'default': {
             'formatter': 'default',
@@ -29,7 +139,7 @@ LOGGING = {
             'stream': 'ext://sys.stdout',
         },
         'access': {
-            'formatter': 'access',
+            'formatter': 'json' if settings.log_json else 'access',
             'class': 'logging.StreamHandler',
             'stream': 'ext://sys.stdout',
         },
@@ -56,5 +166,27 @@ LOGGING = {
 }
 
 
+def move_handlers_to_queue(logger: logging.Logger) -> QueueListener | None:
+    """
+    Replaces handlers of the logger with a queue handler. The original handlers
+    run in a listener thread, so formatting and writes do not block the event loop.
+    """
+    if not logger.handlers:
+        return None
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    logger.handlers = [LazyQueueHandler(log_queue)]
+    listener.start()
+    return listener
+
+
 def setup_logging():
     config.dictConfig(LOGGING)
+
+    if settings.log_queue:
+        for logger_name in ('', 'uvicorn.access'):
+            listener = move_handlers_to_queue(logging.getLogger(logger_name))
+            if listener is not None:
+                # Flushes records left in the queue on exit.
+                atexit.register(listener.stop)
@@ -0,0 +1,124 @@
+"""
+Module to store all application metrics in one place.
+In gunicorn every worker has its own metrics, they are aggregated on scrape
+through PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py).
+"""
+import asyncio
+import functools
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# HTTP requests
+HTTP_REQUEST_SECONDS = Histogram(
+    'auth_http_request_seconds',
+    'HTTP request latency by route template.',
+    ['method', 'route', 'status'],
+    buckets=(0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Calls of Redis, Postgres and JWT codec
+DEPENDENCY_SECONDS = Histogram(
+    'auth_dependency_seconds',
+    'Latency of calls to Redis, Postgres and JWT codec by operation.',
+    ['component', 'operation'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+
+def timed(component: str, operation: str | None = None):
+    """
+    Decorator recording the function latency in DEPENDENCY_SECONDS.
+    Operation defaults to the function name.
+    """
+    def decorator(func):
+        observer = DEPENDENCY_SECONDS.labels(component=component, operation=operation or func.__name__)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observer.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observer.observe(time.perf_counter() - started)
+        return wrapper
+
+    return decorator
+
+
+# Password hashing
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'auth_password_hash_queue_depth',
+    'Password hashing jobs submitted to the executor and not finished yet.',
+    multiprocess_mode='livesum'
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    'auth_password_hash_seconds',
+    'Password hashing latency including time spent in the executor queue.',
+    ['operation'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Email filter
+EMAIL_FILTER_LOOKUPS = Counter(
+    'auth_email_filter_lookups',
+    'Email filter lookups by result: local_hit, shared_hit, unavailable, stale or miss (DB query skipped).',
+    ['result']
+)
+
+# Login rate limit
+LOGIN_RATE_LIMITED = Counter(
+    'auth_login_rate_limited',
+    'Login attempts rejected before checking credentials by the limited subject: email or ip.',
+    ['subject']
+)
+
+# Login history writer
+LOGIN_HISTORY_QUEUE_DEPTH = Gauge(
+    'auth_login_history_queue_depth',
+    'Login history rows waiting to be written to the DB.',
+    multiprocess_mode='livesum'
+)
+LOGIN_HISTORY_BATCH_SIZE = Histogram(
+    'auth_login_history_batch_size',
+    'Login history rows written in one transaction.',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+LOGIN_HISTORY_DROPPED = Counter(
+    'auth_login_history_dropped',
+    'Login history rows lost because of a full queue or a DB error.'
+)
+
+# Postgres connection pools
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'auth_db_pool_checkout_seconds',
+    'Time to get a connection from the pool including waiting for a free one.',
+    ['pool'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+DB_POOL_CONNECTIONS = Gauge(
+    'auth_db_pool_connections',
+    'Connections of the pool by state: in_use or idle.',
+    ['pool', 'state'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Counter(
+    'auth_db_pool_overflow',
+    'Connections opened above pool_size.',
+    ['pool']
+)
+DB_POOL_TIMEOUTS = Counter(
+    'auth_db_pool_timeouts',
+    'Checkouts failed after waiting pool_timeout for a free connection.',
+    ['pool']
+)
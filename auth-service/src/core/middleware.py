@@ -0,0 +1,45 @@
+import time
+
+from fastapi import Request, Response
+
+from src.core.api_settings import settings
+from src.core.metrics import HTTP_REQUEST_SECONDS
+from src.schema.cookie import PrimaryPinCookie
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+async def pin_primary_after_write(request: Request, call_next) -> Response:
+    """
+    Pins reads of the client to the primary DB for a while after a successful write request,
+    so the client does not read stale data from a lagging replica.
+    """
+    response = await call_next(request)
+    if request.method not in READ_METHODS and response.status_code < 400:
+        response.set_cookie(
+            key=PrimaryPinCookie.name,
+            value=str(int(time.time()) + settings.pg_read_your_writes_sec),
+            max_age=settings.pg_read_your_writes_sec,
+            httponly=True
+        )
+    return response
+
+
+async def record_request_latency(request: Request, call_next) -> Response:
+    """
+    Records request latency labeled by the route template, e.g. '/api/v1/account/{user_id}'.
+    """
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            # Unknown paths are not used as labels to keep metrics cardinality bounded.
+            route=route.path if route is not None else 'unmatched',
+            status=status_code
+        ).observe(time.perf_counter() - started)
@@ -0,0 +1,167 @@
+"""
+Monthly range partitions management for tables declared with
+'postgresql_partition_by': 'RANGE (<timestamp column>)'.
+Partitions are named '<table>_yYYYYmMM' and cover [first day of the month, first day of the next month).
+Rows of months without a partition go to the '<table>_default' partition, so inserts do not fail
+if partitions have not been created in time. Such rows are moved to their monthly partitions
+by the next 'create_partitions'.
+"""
+import gzip
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """
+    Returns the first day of the month shifted by 'months' from the month of 'moment'.
+    """
+    month_index = moment.year * 12 + moment.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def get_partition_name(table: str, month: datetime) -> str:
+    return f'{table}_y{month.year:04d}m{month.month:02d}'
+
+
+def get_default_partition_name(table: str) -> str:
+    return f'{table}_default'
+
+
+async def get_partition_key(conn: AsyncConnection, table: str) -> str:
+    result = await conn.execute(
+        text(
+            'SELECT a.attname FROM pg_partitioned_table p '
+            'JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] '
+            'WHERE p.partrelid = CAST(:table AS regclass)'
+        ),
+        {'table': table}
+    )
+    return result.scalar_one()
+
+
+async def get_partitions(conn: AsyncConnection, table: str) -> dict[str, datetime]:
+    """
+    Returns partition name -> month of the partitions attached to the table.
+    Partitions not created by this module are skipped.
+    """
+    result = await conn.execute(
+        text(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = CAST(:table AS regclass)'
+        ),
+        {'table': table}
+    )
+    pattern = re.compile(rf'^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$')
+    partitions = {}
+    for name, in result:
+        match = pattern.match(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+async def create_partitions(conn: AsyncConnection, table: str, months_ahead: int, now: datetime | None = None) -> list[str]:
+    """
+    Creates the default partition, partitions of the current month and of 'months_ahead' next months
+    if they do not exist, and partitions of the months which have rows in the default partition.
+    Returns names of the created monthly partitions.
+    """
+    default_name = get_default_partition_name(table)
+    await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{default_name}" PARTITION OF "{table}" DEFAULT'))
+    key = await get_partition_key(conn, table)
+
+    current_month = month_start(now or datetime.utcnow())
+    months = {month_start(current_month, months) for months in range(months_ahead + 1)}
+    # Normally empty, the rows are there only if partitions have not been created in time.
+    default_months = {
+        month for month, in await conn.execute(text(
+            f'SELECT DISTINCT CAST(date_trunc(\'month\', "{key}") AS timestamp) FROM "{default_name}"'
+        ))
+    }
+    existing = await get_partitions(conn, table)
+    created = []
+    for start in sorted(months | default_months):
+        name = get_partition_name(table, start)
+        if name in existing:
+            continue
+        bounds = f"FROM ('{start.isoformat()}') TO ('{month_start(start, 1).isoformat()}')"
+        if start not in default_months:
+            await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" FOR VALUES {bounds}'))
+        else:
+            # A partition can not be created while the default partition has rows of its range.
+            logging.warning('Moving rows of %s from %s to a new partition %s', start.strftime('%Y-%m'),
+                            default_name, name)
+            await conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+            await conn.execute(text(
+                f'WITH moved AS (DELETE FROM "{default_name}" WHERE "{key}" >= :start AND "{key}" < :end RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved'
+            ), {'start': start, 'end': month_start(start, 1)})
+            await conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES {bounds}'))
+        created.append(name)
+    if created:
+        logging.info('Created partitions of %s: %s', table, ', '.join(created))
+    return created
+
+
+async def archive_partition(conn: AsyncConnection, name: str, archive_dir: Path) -> Path:
+    """
+    Dumps the partition rows with COPY into '<archive_dir>/<name>.csv.gz'.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f'{name}.csv.gz'
+    raw_connection = await conn.get_raw_connection()
+
+    with gzip.open(path, 'wb') as archive:
+        async def write(chunk: bytes) -> None:
+            archive.write(chunk)
+
+        await raw_connection.driver_connection.copy_from_table(name, output=write, format='csv', header=True)
+    return path
+
+
+async def drop_old_partitions(
+        engine: AsyncEngine,
+        table: str,
+        retention_months: int,
+        archive_dir: Path | None = None,
+        before_detach: Callable[[AsyncConnection, str], Awaitable[None]] | None = None,
+        lock_timeout_ms: int = 5000,
+        now: datetime | None = None) -> list[str]:
+    """
+    Archives partitions which are older than 'retention_months' full months if 'archive_dir' is given,
+    then detaches and drops them, one short transaction per partition.
+    Archiving does not lock the table against inserts. Partitions of past months do not get new rows,
+    so the archive has all the rows which are dropped.
+    'before_detach' is called in the transaction of every partition before it is detached.
+    DETACH blocks the table until the commit, it gives up after 'lock_timeout_ms'
+    instead of queueing inserts behind a long query.
+    Returns names of the dropped partitions.
+    """
+    oldest_kept_month = month_start(now or datetime.utcnow(), -retention_months)
+    async with engine.connect() as conn:
+        partitions = await get_partitions(conn, table)
+
+    dropped = []
+    for name, month in sorted(partitions.items(), key=lambda item: item[1]):
+        if month >= oldest_kept_month:
+            continue
+        if archive_dir is not None:
+            async with engine.connect() as conn:
+                path = await archive_partition(conn, name, archive_dir)
+            logging.info('Partition %s is archived to %s', name, path)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+            if before_detach is not None:
+                await before_detach(conn, name)
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+        dropped.append(name)
+    if dropped:
+        logging.info('Dropped partitions of %s: %s', table, ', '.join(dropped))
+    return dropped
@@ -0,0 +1,45 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.core.metrics import (DB_POOL_CHECKOUT_SECONDS, DB_POOL_CONNECTIONS,
+                              DB_POOL_OVERFLOW, DB_POOL_TIMEOUTS)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool publishing checkout wait time, in use/idle connections, overflow and timeout events.
+    Metrics are labeled by the engine 'pool_logging_name'.
+    """
+
+    @property
+    def metrics_name(self) -> str:
+        return self.logging_name or 'default'
+
+    def _update_connections(self) -> None:
+        DB_POOL_CONNECTIONS.labels(pool=self.metrics_name, state='in_use').set(self.checkedout())
+        DB_POOL_CONNECTIONS.labels(pool=self.metrics_name, state='idle').set(self.checkedin())
+
+    def _inc_overflow(self) -> bool:
+        created = super()._inc_overflow()
+        # Overflow counter starts from -pool_size, so positive values are connections above pool_size.
+        if created and self._overflow > 0:
+            DB_POOL_OVERFLOW.labels(pool=self.metrics_name).inc()
+        return created
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(pool=self.metrics_name).inc()
+            raise
+        finally:
+            # Includes establishing a new connection when the pool has none idle.
+            DB_POOL_CHECKOUT_SECONDS.labels(pool=self.metrics_name).observe(time.perf_counter() - started)
+            self._update_connections()
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self._update_connections()
@@ -1,8 +1,15 @@
-from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
-                                    create_async_engine)
+import logging
+import time
+
+from fastapi import Request
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    async_sessionmaker, create_async_engine)
 from sqlalchemy.orm import DeclarativeBase
 
 from src.core.api_settings import settings
+from src.db.pool import InstrumentedAsyncPool
+from src.schema.cookie import PrimaryPinCookie
 
 
 # Base class for all further models
@@ -10,12 +17,94 @@ class Base(DeclarativeBase):
     pass
 
 
+def build_engine(host: str, port: int, pool_name: str) -> AsyncEngine:
+    dsn = f'postgresql+asyncpg://{settings.pg_user}:{settings.pg_password}@{host}:{port}/{settings.pg_db}'
+    return create_async_engine(
+        f'{dsn}?prepared_statement_cache_size={settings.pg_statement_cache_size}',
+        echo=settings.pg_echo,
+        future=True,
+        poolclass=InstrumentedAsyncPool,
+        pool_logging_name=pool_name,
+        pool_size=settings.pg_pool_size,
+        max_overflow=settings.pg_max_overflow,
+        pool_timeout=settings.pg_pool_timeout_sec,
+        pool_recycle=settings.pg_pool_recycle_sec,
+        pool_pre_ping=settings.pg_pool_pre_ping,
+        # asyncpg own cache of statements, used besides SQLAlchemy prepared statements cache.
+        connect_args={'statement_cache_size': settings.pg_statement_cache_size}
+    )
+
+
 # Add DB engine
-dsn = f'postgresql+asyncpg://{settings.pg_user}:{settings.pg_password}@{settings.pg_host}:{settings.pg_port}/{settings.pg_db}'
-engine = create_async_engine(dsn, echo=True, future=True)
+engine = build_engine(settings.pg_host, settings.pg_port, 'primary')
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read replica engine, reads go to the primary if it is not configured.
+replica_engine: AsyncEngine | None = None
+async_read_session: async_sessionmaker[AsyncSession] | None = None
+if settings.pg_replica_host:
+    replica_engine = build_engine(settings.pg_replica_host, settings.pg_replica_port or settings.pg_port, 'replica')
+    async_read_session = async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class ReplicaHealth:
+    """
+    Sends reads to the primary for 'retry_interval' seconds after the replica has failed to connect.
+    """
+
+    def __init__(self, retry_interval: float):
+        self.retry_interval = retry_interval
+        self.down_until = 0.0
+
+    def is_available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, excp: Exception) -> None:
+        logging.error('DB. Read replica is unavailable, reading from the primary for %s sec: %s',
+                      self.retry_interval, excp)
+        self.down_until = time.monotonic() + self.retry_interval
+
+
+replica_health = ReplicaHealth(retry_interval=settings.pg_replica_retry_sec)
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    """
+    Checks if the client has written to the DB recently and must read its own writes from the primary.
+    """
+    try:
+        return float(request.cookies.get(PrimaryPinCookie.name, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def open_read_session(request: Request) -> AsyncSession:
+    if async_read_session is None or not replica_health.is_available() or is_pinned_to_primary(request):
+        return async_session()
+
+    session = async_read_session()
+    try:
+        # Connecting eagerly to fall back to the primary before the endpoint runs its queries.
+        await session.connection()
+        return session
+    except (DBAPIError, OSError, TimeoutError) as excp:
+        await session.close()
+        replica_health.mark_down(excp)
+        return async_session()
+
 
 async def get_pg_session() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+async def get_pg_read_session(request: Request) -> AsyncSession:
+    """
+    Session for read-only endpoints. Uses the replica unless it is down
+    or the client is pinned to the primary after its own write.
+    """
+    session = await open_read_session(request)
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -1,11 +1,12 @@
 import uuid
 from datetime import UTC, datetime
 
-from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, String,
-                        UniqueConstraint)
+from sqlalchemy import (BigInteger, Boolean, Column, DateTime, ForeignKey,
+                        Index, String, UniqueConstraint)
 from sqlalchemy.dialects.postgresql import UUID
-from werkzeug.security import check_password_hash, generate_password_hash
 
+from src.core.api_settings import settings
+from src.db.partitions import create_partitions
 from src.db.postgres import Base, engine
 
 
@@ -36,19 +37,13 @@ class User(UUIDMixin, Base):
                  registered_at: datetime | None = None) -> None:
         super().__init__()
         self.email = email
-        self.hashed_password = self.hashed_password = generate_password_hash(hashed_password)
+        # Passwords are hashed by the services with 'password_hasher', off the event loop.
+        self.hashed_password = hashed_password
         self.is_active = is_active
         self.is_superuser = is_superuser
         self.is_verified = is_verified
         self.registered_at = registered_at
 
-    async def check_password(self, password: str) -> bool:
-        return check_password_hash(self.hashed_password, password)
-
-    @staticmethod
-    async def get_password_hashed(password) -> str:
-        return generate_password_hash(password)
-
     def __repr__(self) -> str:
         return f'<User {self.email}>'
 
@@ -93,22 +88,44 @@ class UserRole(UUIDMixin, Base):
     __table_args__ = (UniqueConstraint('user_id', 'role_id', name='_user_role_unic'),)
 
 
-class LoginHistory(UUIDMixin, Base):
+class LoginHistory(Base):
     """
-    Class to represent DB 'login_history' table data model
+    Class to represent DB 'login_history' table data model.
+    Partitioned by month of 'timestamp', partitions are managed by 'src.db.partitions'.
     """
     __tablename__ = 'login_history'
-
+    __table_args__ = (
+        # Serves user history pages in both directions including keyset pagination on (timestamp, id).
+        Index('ix_login_history_user_id_timestamp', 'user_id', 'timestamp', 'id'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+
+    # Primary key and unique constraints of a partitioned table must include the partition key.
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime)
-    ip_address = Column(String(15))
+    # Text form of an IPv6 address is up to 45 characters.
+    ip_address = Column(String(45))
     location = Column(String(255))
     user_agent = Column(String(255))
 
 
+class UserLoginStats(Base):
+    """
+    Class to represent DB 'user_login_stats' table data model.
+    Login counters maintained together with 'login_history' inserts and partitions retention.
+    """
+    __tablename__ = 'user_login_stats'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    login_count = Column(BigInteger, nullable=False, default=0)
+    last_login_at = Column(DateTime)
+
+
 async def create_database() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await create_partitions(conn, LoginHistory.__tablename__, settings.login_history_partitions_ahead)
 
 
 async def purge_database() -> None:
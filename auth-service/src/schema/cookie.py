@@ -11,3 +11,10 @@ class AccessTokenCookie:
 class RefreshTokenCookie:
     name = 'auth-app-refresh-key'
     value: str
+
+
+@dataclass(frozen=True)
+class PrimaryPinCookie:
+    # Unix timestamp until which reads of the client go to the primary DB.
+    name = 'auth-app-primary-until'
+    value: str
@@ -1,8 +1,9 @@
 import datetime
 import uuid
-from typing import List
+from typing import Dict, List
 
-from pydantic import UUID4, BaseModel, EmailStr, Field, field_validator
+from pydantic import (UUID4, BaseModel, EmailStr, Field, field_validator,
+                      model_validator)
 
 
 class UserRegistrationReq(BaseModel):
@@ -18,6 +19,38 @@ class UserResetPasswordReq(BaseModel):
     password: str
 
 
+class UserImportRow(BaseModel):
+    """
+    A row of the bulk user import, either a plain or an already hashed password.
+    """
+    email: EmailStr
+    password: str | None = None
+    hashed_password: str | None = None
+    is_active: bool = True
+    is_verified: bool = False
+    registered_at: datetime.datetime | None = None
+
+    @model_validator(mode='after')
+    def check_password(self):
+        if (self.password is None) == (self.hashed_password is None):
+            raise ValueError('exactly one of password and hashed_password is required')
+        return self
+
+
+class UserImportError(BaseModel):
+    line: int
+    email: str | None = None
+    error: str
+
+
+class UserImportResp(BaseModel):
+    imported: int = 0
+    failed: int = 0
+    # Only the first errors are returned if there are more than the limit.
+    errors: List[UserImportError] = []
+    errors_truncated: bool = False
+
+
 class UserLoginReq(BaseModel):
     email: EmailStr
     password: str
@@ -49,6 +82,17 @@ class UserAccountInfoResp(BaseModel):
     email: str
 
 
+class UserPrincipal(BaseModel):
+    """
+    Compact snapshot of a user, enough to authorise a request.
+    """
+    id: UUID4
+    email: str
+    is_active: bool
+    is_superuser: bool
+    role_ids: List[str] = []
+
+
 class UserLoginHistory(BaseModel):
     timestamp: datetime.datetime | None = None
     ip_address: str | None = None
@@ -57,13 +101,29 @@ class UserLoginHistory(BaseModel):
 
 
 class UserLoginHistoryResp(BaseModel):
-    page: int
-    total_pages: int
-    total_entries: int
+    # 'page' is None in cursor mode, totals are None if not requested.
+    page: int | None = None
+    total_pages: int | None = None
+    total_entries: int | None = None
     per_page: int
+    # Cursor of the next page, None on the last page.
+    next_cursor: str | None = None
     data: List[UserLoginHistory]
 
 
+class UserSession(BaseModel):
+    session_id: str
+    expires_at: datetime.datetime
+    created_at: datetime.datetime | None = None
+    ip_address: str | None = None
+    user_agent: str | None = None
+
+
+class UserSessionsResp(BaseModel):
+    user_id: str
+    data: List[UserSession]
+
+
 class UserRoles(BaseModel):
     id: UUID4
     name: str
@@ -75,6 +135,20 @@ class UserRolesResp(BaseModel):
     roles: List[UserRoles] | List
 
 
+class UserRolesBatchReq(BaseModel):
+    user_ids: List[UUID4] = Field(min_length=1, max_length=100_000)
+    role_ids: List[UUID4] = Field(min_length=1, max_length=100)
+
+
+class UserRolesBatchResp(BaseModel):
+    result: str = 'success'
+    # role id -> ids of the users the role has been assigned to or revoked from by the request
+    changed: Dict[str, List[str]]
+    changed_count: int
+    unknown_user_ids: List[str] = []
+    unknown_role_ids: List[str] = []
+
+
 class UserPermissionsResp(BaseModel):
     result: str
     data: str
@@ -82,6 +156,18 @@ class UserPermissionsResp(BaseModel):
     roles: str
 
 
+class PermissionsBitmapResp(BaseModel):
+    # RBAC matrix fingerprint, the prefix of "perms" claims which can be decoded with these permissions
+    version: str
+    permissions: List[str]
+
+
+class PermissionCheckResp(BaseModel):
+    user_id: str
+    permission: str
+    granted: bool
+
+
 class UserAddRoleResp(BaseModel):
     result: str
     user_id: str
@@ -115,7 +201,9 @@ class AccessTokenData(BaseModel):
     user_id: str
     iat: datetime.datetime
     exp: datetime.datetime
-    roles: list | None
+    roles: list | None = None
+    # '<rbac matrix fingerprint>:<permissions bitmap>', see PermissionMatrix.get_permissions_claim
+    perms: str | None = None
 
     # The following two functions are necessary
     # to remove Timezone info from the timestamps
@@ -133,7 +221,7 @@ class RefreshTokenData(BaseModel):
     user_id: str
     iat: datetime.datetime
     exp: datetime.datetime
-    roles: list | None
+    roles: list | None = None
     session_id: str
 
     @field_validator('iat', mode='after')
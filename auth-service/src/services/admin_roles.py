@@ -15,13 +15,14 @@ from src.schema.model import (PermissionCreateReq, PermissionCreateResp,
                               RolesListResp)
 
 from .helper import AsyncCache
+from .rbac import RBACService, get_rbac_service
 
 T = TypeVar('T')
 
 
 class AdminRolesService(Generic[T]):
-    def __init__(self):
-        ...
+    def __init__(self, rbac_service: RBACService):
+        self.rbac_service = rbac_service
 
     async def create_permission(self, db: AsyncSession, permission_data: PermissionCreateReq) -> PermissionInfoResp:
         permission_exists = await self._check_entity_exists(entity_type=Permission, db=db, name=permission_data.name)
@@ -42,6 +43,7 @@ class AdminRolesService(Generic[T]):
         db.add(permission)
         await db.commit()
         await db.refresh(permission)
+        await self.rbac_service.invalidate()
         return PermissionCreateResp(
             permission_id=str(permission.id),
             name=permission.name
@@ -84,31 +86,33 @@ class AdminRolesService(Generic[T]):
         )
 
     async def get_all_roles(self, db: AsyncSession) -> RolesListResp:
-        statement = select(Role)
+        """
+        Returns all roles with their permissions using a single query.
+        """
+        statement = (
+            select(
+                Role.id,
+                Role.name,
+                Permission.id.label('permission_id'),
+                Permission.name.label('permission_name')
+            )
+            .outerjoin(RolePermission, RolePermission.role_id == Role.id)
+            .outerjoin(Permission, Permission.id == RolePermission.permission_id)
+            .order_by(Role.name, Permission.name)
+        )
         statement_result = await db.execute(statement=statement)
-        roles = statement_result.scalars()
-        roles_data = []
-        for role in roles:
-            statement_role_permission = select(RolePermission).where(RolePermission.role_id == role.id)
-            statement_role_permission_result = await db.execute(statement_role_permission)
-            role_permissions = statement_role_permission_result.scalars()
-
-            roles_data.append(
-                RoleInfoResp(
-                    role_id = str(role.id),
-                    name=role.name,
-                    permissions=[
-                        PermissionInfoResp(
-                            permission_id=str(rp.permission_id),
-                            name=(
-                                await self._get_entity_by_id(entity_type=Permission, db=db, entity_id=rp.permission_id)
-                            ).name
-                        ) for rp in role_permissions
-                    ]
 
+        roles_data = {}
+        for row in statement_result:
+            role = roles_data.get(row.id)
+            if role is None:
+                role = roles_data[row.id] = RoleInfoResp(role_id=str(row.id), name=row.name, permissions=[])
+            # Outer join returns a row with empty permission for roles without permissions.
+            if row.permission_id is not None:
+                role.permissions.append(
+                    PermissionInfoResp(permission_id=str(row.permission_id), name=row.permission_name)
                 )
-            )
-        return RolesListResp(data=roles_data)
+        return RolesListResp(data=list(roles_data.values()))
 
     async def get_permissions_by_role(self, db: AsyncSession, role_name: str):
         role = await self._get_entity_by_name(entity_type=Role, db=db, entity_name=role_name)
@@ -145,6 +149,7 @@ class AdminRolesService(Generic[T]):
         db.add_all(role_permission_objects)
         await db.commit()
         await db.refresh(role)
+        await self.rbac_service.invalidate()
         return RoleInfoResp(
             role_id=str(role.id),
             name=role.name,
@@ -172,6 +177,7 @@ class AdminRolesService(Generic[T]):
         await db.commit()
         await db.delete(permission)
         await db.commit()
+        await self.rbac_service.invalidate()
 
     async def delete_role(self, role_name, db: AsyncSession) -> None:
         role = await self._get_entity_by_name(
@@ -189,6 +195,7 @@ class AdminRolesService(Generic[T]):
         await db.commit()
         await db.delete(role)
         await db.commit()
+        await self.rbac_service.invalidate()
 
     async def _check_entity_exists(self, entity_type: Type[T], db: AsyncSession, name: str) -> bool:
         statement = select(entity_type).where(entity_type.name == name)
@@ -221,4 +228,4 @@ class AdminRolesService(Generic[T]):
 
 @lru_cache()
 def get_admin_roles_service() -> AdminRolesService:
-    return AdminRolesService[Union[Role, Permission]]()
+    return AdminRolesService[Union[Role, Permission]](rbac_service=get_rbac_service())
@@ -1,60 +1,101 @@
 import logging
 import uuid
-from datetime import datetime
+from datetime import UTC, datetime
 from functools import lru_cache
 
+import orjson
 from fastapi import Depends
-from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import select
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import select, update
 
+from src.core.api_settings import settings
 from src.db.redis_db import get_redis
-from src.models.db_entity import LoginHistory, User
-from src.schema.model import RefreshTokenData
+from src.models.db_entity import User
+from src.schema.model import RefreshTokenData, UserSession
+from src.services.email_filter import EmailFilter, get_email_filter
+from src.services.hashing import password_hasher
 from src.services.jwt_token import JWTService, get_jwt_service
+from src.services.login_history import (LoginHistoryWriter,
+                                        get_login_history_writer)
+from src.services.rbac import RBACService, get_rbac_service
 from src.services.redis import RedisService, get_redis_service
 
 from .helper import AsyncCache
 
 
 class AuthenticationService:
-    def __init__(self, cache: AsyncCache, redis_service: RedisService, jwt_service: JWTService):
+    def __init__(
+            self,
+            cache: AsyncCache,
+            redis_service: RedisService,
+            jwt_service: JWTService,
+            rbac_service: RBACService,
+            login_history_writer: LoginHistoryWriter,
+            email_filter: EmailFilter):
         self.cache = cache
         self.redis_service: RedisService = redis_service
         self.jwt_service: JWTService = jwt_service
+        self.rbac_service: RBACService = rbac_service
+        self.login_history_writer: LoginHistoryWriter = login_history_writer
+        self.email_filter: EmailFilter = email_filter
 
-    @staticmethod
-    async def authenticate_user(db: AsyncSession, email: str, password: str) -> [User | None]:
+    async def authenticate_user(self, db: AsyncSession, email: str, password: str) -> [User | None]:
         """
-        Searching for a user in the DB
+        Searching for a user in the DB. Emails missing in the email filter are not queried.
         """
-        statement = select(User).where(User.email == email)
-        statement_result = await db.execute(statement=statement)
-        user = statement_result.scalar_one_or_none()
+        user = None
+        if await self.email_filter.might_contain(email):
+            statement = select(User).where(User.email == email)
+            statement_result = await db.execute(statement=statement)
+            user = statement_result.scalar_one_or_none()
         if not user:
+            await password_hasher.check_dummy_password(password)
             return None
-        if not await user.check_password(password):
+        if not await password_hasher.check_password(user.hashed_password, password):
             return None
+        if password_hasher.needs_rehash(user.hashed_password):
+            await self.upgrade_password_hash(db, user, password)
         return user
 
     @staticmethod
-    async def save_login_history(db: AsyncSession, user_id: str, ip_address: str, location: str, user_agent: str) -> None:
+    async def upgrade_password_hash(db: AsyncSession, user: User, password: str) -> None:
         """
-        Save user login info in the DB
+        Rehashes the password with the current hashing profile. The hash is not updated
+        if it has been changed since the user was read, e.g. by a concurrent password reset.
         """
+        hashed_password = await password_hasher.hash_password(password)
         statement = (
-            insert(LoginHistory).
-            values(
-                user_id=user_id,
-                timestamp=datetime.utcnow(),
-                ip_address=ip_address,
-                location=location,
-                user_agent=user_agent)
+            update(User)
+            .where(User.id == user.id, User.hashed_password == user.hashed_password)
+            .values(hashed_password=hashed_password)
+            # The user object is updated below only if the row has been updated.
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            result = await db.execute(statement)
+            await db.commit()
+        except Exception as excp:
+            await db.rollback()
+            logging.error('DB. Unable to upgrade password hash of user %s: %s', user.id, excp)
+            return
+        if result.rowcount != 1:
+            # The password has been changed meanwhile, the user keeps the stale hash in memory only.
+            logging.info('Password hash of user %s has been changed concurrently, not upgraded.', user.id)
+            return
+        # Not marking the user as modified, the hash is already saved.
+        set_committed_value(user, 'hashed_password', hashed_password)
+
+    async def save_login_history(self, user_id: str, ip_address: str, location: str, user_agent: str) -> None:
+        """
+        Enqueue user login info to be saved in the DB by the background writer
+        """
+        await self.login_history_writer.put(
+            user_id=user_id,
+            ip_address=ip_address,
+            location=location,
+            user_agent=user_agent
         )
-        await db.execute(statement=statement)
-        await db.commit()
-
-        return
 
     @staticmethod
     async def generate_session_id() -> str:
@@ -70,40 +111,110 @@ class AuthenticationService:
 
         return
 
-    async def get_tokens(self, user_id: str, user_roles: list | None) -> (str, str):
+    @staticmethod
+    def get_role_ids(user_roles: list | None) -> list[str]:
+        """
+        Returns role ids from the 'roles' claim, which contains
+        either role dicts or role ids depending on 'jwt_compact_roles'.
+        """
+        return [role['id'] if isinstance(role, dict) else role for role in user_roles or []]
 
+    async def logout_user_everywhere(self, user_id: str) -> int:
+        """
+        Revokes all the user refresh tokens. Returns the number of revoked sessions.
+        """
+        return await self.redis_service.del_all_refresh_tokens(user_id=user_id)
+
+    async def get_user_sessions(self, user_id: str) -> list[UserSession]:
+        """
+        Returns active sessions (refresh tokens) of the user.
+        """
+        sessions = []
+        for session_id, expire_at, value in await self.redis_service.get_user_sessions(user_id=user_id):
+            try:
+                session_info = orjson.loads(value)
+            except orjson.JSONDecodeError:
+                # Sessions saved before session info was introduced.
+                session_info = {}
+            sessions.append(
+                UserSession(
+                    session_id=session_id,
+                    expires_at=datetime.fromtimestamp(expire_at, UTC),
+                    **session_info
+                )
+            )
+        return sessions
+
+    async def get_tokens(
+            self,
+            user_id: str,
+            user_roles: list | None,
+            ip_address: str | None = None,
+            user_agent: str | None = None) -> (str, str):
+        """
+        Starts a new session and returns its token pair.
+        """
         session_id = await self.generate_session_id()
-        access_token, refresh_token = await self.jwt_service.get_token_pair(
+        access_token, refresh_token = await self.get_session_tokens(
             user_id=user_id,
             session_id=session_id,
-            roles=user_roles)
+            user_roles=user_roles)
+
+        # Session info is kept for sessions listing and survives refresh token rotation.
+        session_info = orjson.dumps({
+            'created_at': datetime.now(UTC),
+            'ip_address': ip_address,
+            'user_agent': user_agent
+        })
 
         try:
             await self.redis_service.save_refresh_token(
                 user_id=user_id,
                 session_id=session_id,
-                expire_time_sec=JWTService.refresh_token_expire * 60
+                expire_time_sec=JWTService.refresh_token_expire * 60,
+                value=session_info
             )
         except Exception as excp:
             logging.error('Unable to save refresh_token %s:%s to Redis. %s', user_id, session_id, excp)
 
         return access_token, refresh_token
 
+    async def get_session_tokens(self, user_id: str, session_id: str, user_roles: list | None) -> (str, str):
+        role_ids = self.get_role_ids(user_roles)
+
+        permissions = None
+        if settings.jwt_permissions_claim:
+            await self.rbac_service.sync()
+            permissions = self.rbac_service.matrix.get_permissions_claim(role_ids)
+
+        return await self.jwt_service.get_token_pair(
+            user_id=user_id,
+            session_id=session_id,
+            roles=role_ids if settings.jwt_compact_roles else user_roles,
+            permissions=permissions)
+
     async def refresh_tokens(self, rt_input_dict: dict) -> (str, str):
 
         logging.debug('Received "refresh_token": %s', rt_input_dict)
 
         token = RefreshTokenData(**rt_input_dict)
-        redis_key = await self.redis_service.get_redis_key(user_id=token.user_id, session_id=token.session_id)
+        new_session_id = await self.generate_session_id()
 
-        redis_refresh_token = await self.redis_service.redis.get(name=redis_key)
         # For now, we use refresh token white list.
-        if not redis_refresh_token:
+        # Check, revoke and whitelist happen atomically, so a refresh token can be used once only.
+        rotated = await self.redis_service.rotate_refresh_token(
+            user_id=token.user_id,
+            session_id=token.session_id,
+            new_session_id=new_session_id,
+            expire_time_sec=JWTService.refresh_token_expire * 60
+        )
+        if not rotated:
             return None, None
 
-        await self.redis_service.redis.expire(name=redis_key, time=0)
-
-        access_token, refresh_token = await self.get_tokens(user_id=token.user_id, user_roles=token.roles)
+        access_token, refresh_token = await self.get_session_tokens(
+            user_id=token.user_id,
+            session_id=new_session_id,
+            user_roles=token.roles)
 
         return access_token, refresh_token
 
@@ -112,6 +223,9 @@ class AuthenticationService:
 def get_authentication_service(
         cache: AsyncCache = Depends(get_redis),
         redis_service: RedisService = Depends(get_redis_service),
-        jwt_service: JWTService = Depends(get_jwt_service)
+        jwt_service: JWTService = Depends(get_jwt_service),
+        rbac_service: RBACService = Depends(get_rbac_service),
+        login_history_writer: LoginHistoryWriter = Depends(get_login_history_writer),
+        email_filter: EmailFilter = Depends(get_email_filter)
 ) -> AuthenticationService:
-    return AuthenticationService(cache, redis_service, jwt_service)
+    return AuthenticationService(cache, redis_service, jwt_service, rbac_service, login_history_writer, email_filter)
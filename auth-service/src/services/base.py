@@ -1,19 +1,28 @@
+from datetime import datetime
 from functools import lru_cache
 from typing import List
+from uuid import UUID
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import desc, func
+from sqlalchemy import (ARRAY, BindParameter, Column, any_, bindparam, desc,
+                        func, true, tuple_)
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import delete, insert, select, update
+from sqlalchemy.sql import Select, delete, insert, select, update
 
-from src.models.db_entity import LoginHistory, Role, User, UserRole
-from src.schema.model import (ResetCredentialsResp,
-                              ResetPasswordResp, UserLoginHistory, UserRoles)
+from src.core.metrics import timed
+from src.models.db_entity import (LoginHistory, Role, User, UserLoginStats,
+                                  UserRole)
+from src.schema.model import (ResetCredentialsResp, ResetPasswordResp,
+                              UserRoles, UserRolesBatchResp)
+from src.services.hashing import password_hasher
 
 
 class BaseService:
 
     @staticmethod
+    @timed('postgres')
     async def get_user_by_uuid(db: AsyncSession, user_id: str) -> [User | None]:
         """
         Searching for a user in the DB by uuid.
@@ -28,6 +37,7 @@ class BaseService:
         return user
 
     @staticmethod
+    @timed('postgres')
     async def get_role_by_uuid(db: AsyncSession, role_id: str) -> [Role | None]:
         """
         Searching for a role in the DB by uuid.
@@ -41,6 +51,7 @@ class BaseService:
         return role
 
     @staticmethod
+    @timed('postgres')
     async def get_user_roles(db: AsyncSession, user_id: str) -> [List[UserRoles] | List]:
         """
         Searching for a user roles.
@@ -58,6 +69,7 @@ class BaseService:
         return [UserRoles(**jsonable_encoder(role._mapping)) for role in user_roles]
 
     @staticmethod
+    @timed('postgres')
     async def check_email_exists(db: AsyncSession, email: str) -> bool:
         statement = select(User).where(User.email == email)
         statement_result = await db.execute(statement=statement)
@@ -65,43 +77,80 @@ class BaseService:
         return user is not None
 
     @staticmethod
+    def filter_user_login_history(
+            statement: Select,
+            user_id: str,
+            date_from: datetime | None = None,
+            date_to: datetime | None = None) -> Select:
+        """
+        Restricts a login history query to the user and to [date_from, date_to).
+        Conditions on 'timestamp' let Postgres skip partitions out of the range.
+        """
+        statement = statement.where(LoginHistory.user_id == user_id)
+        if date_from is not None:
+            statement = statement.where(LoginHistory.timestamp >= date_from)
+        if date_to is not None:
+            statement = statement.where(LoginHistory.timestamp < date_to)
+        return statement
+
+    @timed('postgres')
     async def get_user_login_history(
+            self,
             db: AsyncSession,
             user_id: str,
             limit: int = 50,
             offset: int = 0,
-            order=desc
-    ) -> [List[UserLoginHistory], int]:
+            order=desc,
+            after: tuple[datetime, UUID] | None = None,
+            date_from: datetime | None = None,
+            date_to: datetime | None = None
+    ) -> [List[LoginHistory]]:
         """
-        Searching for a user login history in DB.
-        Returns amount of results depending on received pagination parameters.
+        Searching for a user login history in DB ordered by (timestamp, id).
+        Skips 'offset' rows or, if 'after' (timestamp, id) is given, seeks right after that row,
+        which costs the same for any page depth.
         """
         statement = (
-            select(LoginHistory)
-            .where(LoginHistory.user_id == user_id)
+            self.filter_user_login_history(select(LoginHistory), user_id, date_from, date_to)
+            .order_by(order(LoginHistory.timestamp), order(LoginHistory.id))
             .limit(limit)
-            .offset(offset)
-            .order_by(order(LoginHistory.timestamp))
         )
+        if after is not None:
+            position = tuple_(LoginHistory.timestamp, LoginHistory.id)
+            # Row comparison alone does not prune partitions, so the timestamp bound is repeated.
+            if order is desc:
+                statement = statement.where(position < after, LoginHistory.timestamp <= after[0])
+            else:
+                statement = statement.where(position > after, LoginHistory.timestamp >= after[0])
+        else:
+            statement = statement.offset(offset)
+
         statement_result = await db.execute(statement=statement)
-        login_history = statement_result.scalars()
-        if not login_history:
-            return [], 0
-
-        # Достаем из LoginHistory количество записей с LoginHistory.user_id == user_id
-        count_query = select(func.count()).select_from(
-            select(LoginHistory.user_id)
-            .where(LoginHistory.user_id == user_id).subquery()
-        )
-        count_result = await db.execute(statement=count_query)
-        count = count_result.scalar_one()
+        return list(statement_result.scalars())
+
+    @timed('postgres')
+    async def count_user_login_history(
+            self,
+            db: AsyncSession,
+            user_id: str,
+            date_from: datetime | None = None,
+            date_to: datetime | None = None) -> int:
+        """
+        Returns the amount of user logins. Without date filters it is read from
+        the maintained counter instead of counting history rows.
+        """
+        if date_from is None and date_to is None:
+            statement = select(UserLoginStats.login_count).where(UserLoginStats.user_id == user_id)
+            statement_result = await db.execute(statement=statement)
+            return statement_result.scalar_one_or_none() or 0
 
-        # Получили из базы список из LoginHistory (схема БД)
-        # берем каждый объект списка, декодируем в dict
-        # dict распаковываем в UserLoginHistory - модель которую мы отдаем пользователю.
-        return [UserLoginHistory(**jsonable_encoder(login)) for login in login_history], count
+        statement = self.filter_user_login_history(
+            select(func.count()).select_from(LoginHistory), user_id, date_from, date_to)
+        statement_result = await db.execute(statement=statement)
+        return statement_result.scalar_one()
 
     @staticmethod
+    @timed('postgres')
     async def update_user_email(db: AsyncSession, email: str, user_id: str) -> ResetCredentialsResp:
         statement = update(User).values(email=email).where(User.id == user_id)
 
@@ -117,41 +166,140 @@ class BaseService:
 
     @staticmethod
     async def update_user_password(db: AsyncSession, password: str, user_id: str) -> ResetPasswordResp:
-        hashed_password = await User.get_password_hashed(password)
+        # Hashing is measured by the password hasher, DB latency by 'save_password_hash'.
+        hashed_password = await password_hasher.hash_password(password)
+        await BaseService.save_password_hash(db, hashed_password, user_id)
+
+        return ResetPasswordResp(user_id=str(user_id))
+
+    @staticmethod
+    @timed('postgres')
+    async def save_password_hash(db: AsyncSession, hashed_password: str, user_id: str) -> None:
         statement = update(User).values(hashed_password=hashed_password).where(User.id == user_id)
 
         await db.execute(statement=statement)
         await db.commit()
 
-        return ResetPasswordResp(user_id=str(user_id))
-
     async def assigne_role_to_user(self, db: AsyncSession, user_id: str, role_id: str) -> [List[UserRoles] | List]:
         """
         Function to assign a role to a user.
         """
+        # Every statement is measured by its own method, so the latencies are not counted twice.
+        await self.save_user_role(db, user_id, role_id)
+
+        result = await self.get_user_roles(db, user_id)
+
+        return result
 
+    @staticmethod
+    @timed('postgres')
+    async def save_user_role(db: AsyncSession, user_id: str, role_id: str) -> None:
         statement = insert(UserRole).values(user_id=user_id, role_id=role_id)
 
         await db.execute(statement=statement)
         await db.commit()
 
-        result = await self.get_user_roles(db, user_id)
-
-        return result
-
     async def remove_role_from_user(self, db: AsyncSession, user_id: str, role_id: str) -> [List[UserRoles] | List]:
         """
         Function to remove a role from a user.
         """
+        await self.delete_user_role(db, user_id, role_id)
+
+        result = await self.get_user_roles(db, user_id)
 
+        return result
+
+    @staticmethod
+    @timed('postgres')
+    async def delete_user_role(db: AsyncSession, user_id: str, role_id: str) -> None:
         statement = delete(UserRole).where(UserRole.user_id == user_id, UserRole.role_id == role_id)
 
         await db.execute(statement=statement)
         await db.commit()
 
-        result = await self.get_user_roles(db, user_id)
+    @staticmethod
+    def uuid_array(name: str, values: List[UUID]) -> BindParameter:
+        # One array parameter instead of a parameter per id, asyncpg allows 32767 parameters per query.
+        return bindparam(name, value=list(values), type_=ARRAY(PG_UUID(as_uuid=True)))
 
-        return result
+    @timed('postgres')
+    async def get_unknown_ids(self, db: AsyncSession, column: Column, ids: List[UUID]) -> List[str]:
+        """
+        Returns ids which are not present in the column.
+        """
+        statement = select(column).where(column == any_(self.uuid_array('ids', ids)))
+        existing = set((await db.execute(statement)).scalars())
+        return [str(item) for item in dict.fromkeys(ids) if item not in existing]
+
+    async def get_batch_diff(
+            self,
+            db: AsyncSession,
+            changed_pairs: list,
+            user_ids: List[UUID],
+            role_ids: List[UUID]) -> UserRolesBatchResp:
+        changed: dict[str, list[str]] = {}
+        for user_id, role_id in changed_pairs:
+            changed.setdefault(str(role_id), []).append(str(user_id))
+        return UserRolesBatchResp(
+            changed=changed,
+            changed_count=len(changed_pairs),
+            unknown_user_ids=await self.get_unknown_ids(db, User.id, user_ids),
+            unknown_role_ids=await self.get_unknown_ids(db, Role.id, role_ids)
+        )
+
+    async def assign_roles_to_users(
+            self,
+            db: AsyncSession,
+            user_ids: List[UUID],
+            role_ids: List[UUID]) -> UserRolesBatchResp:
+        """
+        Assigns every role to every user with one INSERT ... SELECT. Already assigned roles
+        and unknown ids are skipped, only the added pairs are returned.
+        """
+        added = await self.save_user_roles(db, user_ids, role_ids)
+        return await self.get_batch_diff(db, added, user_ids, role_ids)
+
+    @timed('postgres')
+    async def save_user_roles(self, db: AsyncSession, user_ids: List[UUID], role_ids: List[UUID]) -> list:
+        pairs = (
+            select(func.gen_random_uuid(), User.id, Role.id)
+            .select_from(User)
+            .join(Role, true())
+            .where(User.id == any_(self.uuid_array('user_ids', user_ids)),
+                   Role.id == any_(self.uuid_array('role_ids', role_ids)))
+        )
+        statement = (
+            pg_insert(UserRole)
+            .from_select(['id', 'user_id', 'role_id'], pairs)
+            .on_conflict_do_nothing(constraint='_user_role_unic')
+            .returning(UserRole.user_id, UserRole.role_id)
+        )
+        added = (await db.execute(statement)).all()
+        await db.commit()
+        return added
+
+    async def revoke_roles_from_users(
+            self,
+            db: AsyncSession,
+            user_ids: List[UUID],
+            role_ids: List[UUID]) -> UserRolesBatchResp:
+        """
+        Revokes every role from every user with one DELETE, only the removed pairs are returned.
+        """
+        removed = await self.delete_user_roles(db, user_ids, role_ids)
+        return await self.get_batch_diff(db, removed, user_ids, role_ids)
+
+    @timed('postgres')
+    async def delete_user_roles(self, db: AsyncSession, user_ids: List[UUID], role_ids: List[UUID]) -> list:
+        statement = (
+            delete(UserRole)
+            .where(UserRole.user_id == any_(self.uuid_array('user_ids', user_ids)),
+                   UserRole.role_id == any_(self.uuid_array('role_ids', role_ids)))
+            .returning(UserRole.user_id, UserRole.role_id)
+        )
+        removed = (await db.execute(statement)).all()
+        await db.commit()
+        return removed
 
 
 @lru_cache()
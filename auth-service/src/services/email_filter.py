@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import select
+
+from src.core.api_settings import settings
+from src.core.metrics import EMAIL_FILTER_LOOKUPS
+from src.db import redis_db
+from src.db.postgres import async_session
+from src.models.db_entity import User
+
+# Checks the shared filter bits. KEYS[1] - bitmap, KEYS[2] - marker set once the bitmap has been merged
+# with a worker filter built from the DB. ARGV - bit offsets of the email.
+# Returns -1 if the bitmap is not complete (e.g. Redis has been flushed), 1 if all the bits are set, 0 otherwise.
+CHECK_EMAIL_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return -1
+end
+for _, offset in ipairs(ARGV) do
+    if redis.call('GETBIT', KEYS[1], offset) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+
+class BloomFilter:
+    """
+    Bloom filter over a bytearray. Bit order is the same as in Redis bitmaps
+    (offset 0 is the most significant bit of the first byte), so the bytes can be merged into a Redis key.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def get_offsets(self, value: str) -> list[int]:
+        # Double hashing: k offsets from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value: str) -> list[int]:
+        offsets = self.get_offsets(value)
+        for offset in offsets:
+            self.bits[offset >> 3] |= 0x80 >> (offset & 7)
+        return offsets
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[offset >> 3] & (0x80 >> (offset & 7)) for offset in self.get_offsets(value))
+
+    def update(self, other: 'BloomFilter') -> None:
+        """
+        Adds the values of a filter of the same size.
+        """
+        # One OR of big integers instead of a Python loop over the bytes, which would block the event loop.
+        merged = int.from_bytes(self.bits, 'big') | int.from_bytes(other.bits, 'big')
+        self.bits = bytearray(merged.to_bytes(len(self.bits), 'big'))
+
+
+class EmailFilter:
+    """
+    Probabilistic set of registered emails, so logins and registrations with unknown emails
+    are answered without a DB query. A miss is definite, a hit still has to be checked in the DB.
+    Every worker keeps a filter built from the DB at startup. In 'redis' mode emails added later
+    by any worker are also set in a shared Redis bitmap, which is checked on local misses.
+    'local' mode is safe only for a single process: other workers would not see new emails.
+    Until the filter is loaded, and if Redis is unavailable, every email is reported as possibly registered.
+    Processes which do not load the filter (e.g. CLIs) still add emails to the shared bitmap.
+    Users inserted bypassing the service (psql, restores) are not in the filter. So misses of a filter
+    older than 'max_age' seconds are reported as possibly registered and the filter is rebuilt in the background.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker[AsyncSession],
+            mode: str,
+            capacity: int,
+            error_rate: float,
+            max_age: float):
+        if mode not in ('off', 'local', 'redis'):
+            raise ValueError(f'Unknown email filter mode: {mode}')
+
+        self.session_factory = session_factory
+        self.mode = mode
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self.filter: BloomFilter | None = BloomFilter(capacity, error_rate) if mode != 'off' else None
+        self.loaded = False
+        self.loaded_at = 0.0
+        self._check_script = None
+        self._reload_task: asyncio.Task | None = None
+
+    @property
+    def redis_key(self) -> str:
+        # Filters of different sizes are not compatible, so the size is a part of the key.
+        return f'email_filter:{self.filter.size}:{self.filter.hash_count}'
+
+    @staticmethod
+    def normalize(email: str) -> str:
+        # Lowercased emails make the filter a superset of case variants, which is still correct.
+        return email.strip().lower()
+
+    async def load(self) -> None:
+        """
+        Builds the filter from the 'users' table and merges it into the shared Redis bitmap.
+        """
+        if self.mode == 'off':
+            return
+
+        started = time.monotonic()
+        bloom_filter = BloomFilter(self.capacity, self.error_rate)
+        count = 0
+        async with self.session_factory() as db:
+            emails = await db.stream_scalars(select(User.email).execution_options(yield_per=10000))
+            async for email in emails:
+                bloom_filter.add(self.normalize(email))
+                count += 1
+        # Emails added while the filter was loading.
+        bloom_filter.update(self.filter)
+        self.filter = bloom_filter
+        self.loaded = True
+        # Users inserted bypassing the service during the load may be missing, so the age counts from the start.
+        self.loaded_at = started
+
+        if count > self.capacity:
+            logging.warning('Email filter capacity %s is less than %s users, false positive rate is higher than %s.',
+                            self.capacity, count, self.error_rate)
+        logging.info('Email filter loaded: %s emails, %s bits, %s hashes.',
+                     count, bloom_filter.size, bloom_filter.hash_count)
+
+        if self.mode == 'redis':
+            await self.merge_to_redis()
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.loaded_at > self.max_age
+
+    def schedule_reload(self) -> None:
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self.reload(), name='email-filter-reload')
+
+    async def reload(self) -> None:
+        try:
+            await self.load()
+        except Exception as excp:
+            logging.error('Unable to reload email filter: %s', excp)
+
+    async def merge_to_redis(self) -> None:
+        redis = redis_db.redis
+        self._check_script = redis.register_script(CHECK_EMAIL_SCRIPT)
+        upload_key = f'{self.redis_key}:upload:{uuid.uuid4().hex}'
+        try:
+            # OR keeps bits set by other workers, unlike overwriting the key.
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.set(upload_key, bytes(self.filter.bits), px=60000)
+                pipe.bitop('OR', self.redis_key, self.redis_key, upload_key)
+                pipe.delete(upload_key)
+                pipe.set(f'{self.redis_key}:complete', 1)
+                await pipe.execute()
+        except Exception as excp:
+            logging.error('Unable to merge email filter into Redis: %s', excp)
+
+    async def add(self, email: str) -> None:
+        """
+        Must be called before an email is saved to the DB.
+        """
+        await self.add_many([email])
+
+    async def add_many(self, emails: list[str]) -> None:
+        """
+        Adds emails with one Redis round trip.
+        """
+        if self.filter is None or not emails:
+            return
+
+        offsets = [offset for email in emails for offset in self.filter.add(self.normalize(email))]
+        if self.mode != 'redis':
+            return
+
+        try:
+            async with redis_db.redis.pipeline(transaction=True) as pipe:
+                for offset in offsets:
+                    pipe.setbit(self.redis_key, offset, 1)
+                await pipe.execute()
+        except Exception as excp:
+            # Other workers will reject the emails until they are restarted.
+            logging.error('Unable to add %s emails to the shared email filter: %s', len(emails), excp)
+
+    async def might_contain(self, email: str) -> bool:
+        """
+        Returns False only if the email is definitely not registered.
+        """
+        if not self.loaded:
+            return True
+
+        email = self.normalize(email)
+        if email in self.filter:
+            EMAIL_FILTER_LOOKUPS.labels(result='local_hit').inc()
+            return True
+
+        if self.mode == 'redis':
+            try:
+                found = await self._check_script(keys=[self.redis_key, f'{self.redis_key}:complete'],
+                                                 args=self.filter.get_offsets(email))
+            except Exception as excp:
+                logging.error('Unable to check the shared email filter: %s', excp)
+                found = -1
+            if found:
+                EMAIL_FILTER_LOOKUPS.labels(result='shared_hit' if found > 0 else 'unavailable').inc()
+                return True
+
+        if self.is_stale():
+            # The email may have been inserted bypassing the service, the DB has to be checked.
+            self.schedule_reload()
+            EMAIL_FILTER_LOOKUPS.labels(result='stale').inc()
+            return True
+
+        EMAIL_FILTER_LOOKUPS.labels(result='miss').inc()
+        return False
+
+
+email_filter = EmailFilter(
+    session_factory=async_session,
+    mode=settings.email_filter_mode,
+    capacity=settings.email_filter_capacity,
+    error_rate=settings.email_filter_error_rate,
+    max_age=settings.email_filter_max_age_sec
+)
+
+
+def get_email_filter() -> EmailFilter:
+    return email_filter
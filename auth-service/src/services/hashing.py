@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import secrets
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from src.core.api_settings import settings
+from src.core.metrics import PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_SECONDS
+
+# Hash methods use werkzeug notation '<name>:<param>:...', argon2 is 'argon2:<memory KiB>:<time cost>:<parallelism>'.
+# Omitted trailing parameters take these defaults.
+METHOD_DEFAULTS = {
+    'scrypt': ('32768', '8', '1'),
+    'pbkdf2': ('sha256', '600000'),
+    'argon2': ('65536', '3', '4'),
+}
+
+# Named presets for 'PASSWORD_HASH_PROFILE', which also accepts a method string.
+PASSWORD_HASH_PROFILES = {
+    # werkzeug default
+    'scrypt': 'scrypt:32768:8:1',
+    'scrypt-fast': 'scrypt:16384:8:1',
+    'pbkdf2': 'pbkdf2:sha256:600000',
+    'argon2': 'argon2:65536:3:4',
+    # OWASP minimum for argon2id
+    'argon2-fast': 'argon2:19456:2:1',
+}
+
+
+def canonical_method(method: str) -> str:
+    """
+    Returns the method with all the parameters, e.g. 'scrypt' -> 'scrypt:32768:8:1'.
+    """
+    name, *params = method.split(':')
+    defaults = METHOD_DEFAULTS.get(name)
+    if defaults is None or len(params) > len(defaults):
+        raise ValueError(f'Unknown password hash method: {method}')
+    # Numeric parameters must be numbers, the pbkdf2 digest must be known to hashlib.
+    for default, param in zip(defaults, params):
+        if not (param.isdigit() if default.isdigit() else param in hashlib.algorithms_available):
+            raise ValueError(f'Invalid parameter {param!r} of password hash method: {method}')
+    return ':'.join([name, *params, *defaults[len(params):]])
+
+
+def resolve_profile(profile: str) -> str:
+    return canonical_method(PASSWORD_HASH_PROFILES.get(profile, profile))
+
+
+def get_hash_method(hashed_password: str) -> str:
+    """
+    Returns the method a stored hash has been generated with, e.g. 'scrypt:32768:8:1'.
+    Argon2 variants other than argon2id are returned by name, e.g. 'argon2i'.
+    Raises ValueError if the hash is malformed.
+    """
+    parts = hashed_password.split('$')
+    if hashed_password.startswith('$argon2'):
+        # '$argon2id$v=19$m=65536,t=3,p=4$<salt>$<hash>', hashes of argon2 1.0 have no version.
+        if len(parts) == 5:
+            parts.insert(2, '')
+        if len(parts) != 6 or not all(parts[3:]):
+            raise ValueError('Malformed argon2 hash')
+        variant, params = parts[1], parts[3]
+        try:
+            params = dict(param.split('=', 1) for param in params.split(','))
+            memory_cost, time_cost, parallelism = (int(params[name]) for name in ('m', 't', 'p'))
+        except (KeyError, ValueError) as excp:
+            raise ValueError('Malformed argon2 hash parameters') from excp
+        if variant != 'argon2id':
+            return variant
+        return f'argon2:{memory_cost}:{time_cost}:{parallelism}'
+
+    # werkzeug '<method>$<salt>$<hash>'
+    if len(parts) != 3 or not all(parts):
+        raise ValueError('Malformed password hash')
+    return parts[0]
+
+
+def generate_hash(password: str, method: str) -> str:
+    name, *params = canonical_method(method).split(':')
+    if name == 'argon2':
+        from argon2 import PasswordHasher as Argon2Hasher
+
+        memory_cost, time_cost, parallelism = map(int, params)
+        return Argon2Hasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism).hash(password)
+    return generate_password_hash(password, method)
+
+
+def verify_hash(hashed_password: str, password: str) -> bool:
+    if hashed_password.startswith('$argon2'):
+        from argon2 import PasswordHasher as Argon2Hasher
+        from argon2.exceptions import InvalidHashError, VerificationError
+
+        try:
+            # Parameters are read from the hash.
+            return Argon2Hasher().verify(hashed_password, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(hashed_password, password)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing (scrypt/pbkdf2/argon2) in a dedicated executor,
+    so KDF computation does not block the event loop.
+    New hashes are generated with 'method', hashes of any supported method can be checked.
+    """
+
+    def __init__(self, method: str = 'scrypt', executor_type: str = 'process', max_workers: int | None = None):
+        self.method = canonical_method(method)
+        if self.method.startswith('argon2') and importlib.util.find_spec('argon2') is None:
+            raise ValueError('argon2-cffi package is required for argon2 password hashing')
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.executor: Executor | None = None
+        self._dummy_hash: str | None = None
+
+    def start(self) -> None:
+        """
+        Starts the executor. Falls back to a thread pool if a process pool is not available.
+        """
+        if self.executor is not None:
+            return
+
+        if self.executor_type == 'process':
+            try:
+                # 'spawn' since forking a process with a running event loop and threads is not safe.
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                return
+            except (OSError, NotImplementedError, ValueError) as excp:
+                logging.warning('Unable to start process pool for password hashing, using threads: %s', excp)
+
+        # hashlib releases the GIL while computing scrypt/pbkdf2, so threads still scale across cores.
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='password-hasher')
+
+    def shutdown(self) -> None:
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.executor = None
+
+    def _fallback_to_threads(self, broken_executor: Executor) -> None:
+        if self.executor is not broken_executor:
+            # Another coroutine has already replaced the broken pool.
+            return
+        logging.error('Password hashing process pool is broken, switching to threads.')
+        self.executor = None
+        self.executor_type = 'thread'
+        self.start()
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, operation: str, func, *args):
+        if self.executor is None:
+            self.start()
+
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        started = time.perf_counter()
+        try:
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                self._fallback_to_threads(executor)
+                return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+            PASSWORD_HASH_SECONDS.labels(operation=operation).observe(time.perf_counter() - started)
+
+    async def hash_password(self, password: str) -> str:
+        return await self._run('hash', generate_hash, password, self.method)
+
+    async def check_password(self, hashed_password: str, password: str) -> bool:
+        return await self._run('check', verify_hash, hashed_password, password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        Checks if the stored hash has been generated with another method or parameters.
+        """
+        try:
+            return canonical_method(get_hash_method(hashed_password)) != self.method
+        except ValueError:
+            return True
+
+    async def check_dummy_password(self, password: str) -> None:
+        """
+        Checks the password against a random hash, so a login with an unknown email
+        takes as long as a login with a wrong password and does not reveal registered emails.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash_password(secrets.token_urlsafe())
+        await self.check_password(self._dummy_hash, password)
+
+
+password_hasher = PasswordHasher(
+    method=resolve_profile(settings.password_hash_profile),
+    executor_type=settings.password_hash_executor,
+    max_workers=settings.password_hash_workers
+)
+
+
+def get_password_hasher() -> PasswordHasher:
+    return password_hasher
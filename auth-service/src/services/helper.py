@@ -1,4 +1,9 @@
+import time
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from redis.asyncio import Redis
 
 
 class AsyncCache(ABC):
@@ -9,3 +14,103 @@ class AsyncCache(ABC):
     @abstractmethod
     async def set(self, key: str, value: str, expire: int, **kwargs):
         pass
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        pass
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with a per-entry expiration time.
+    Not thread safe, it is meant to be used from the event loop only.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expire_at, value = item
+        if expire_at <= time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expire: float) -> None:
+        """
+        Saves value for 'expire' seconds, evicting the least recently used entries if necessary.
+        """
+        if self.max_size <= 0 or expire <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + expire, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache(AsyncCache):
+    """
+    AsyncCache implementation on top of Redis.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    async def get(self, key: str, **kwargs):
+        return await self.redis.get(name=key)
+
+    async def set(self, key: str, value: str, expire: int, **kwargs):
+        await self.redis.set(name=key, value=value, ex=expire)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.redis.delete(*keys)
+
+
+class TieredCache(AsyncCache):
+    """
+    In-process LRUCache in front of a shared AsyncCache.
+    Local entries live for 'local_expire' seconds only, since
+    deleting a key is not propagated to other processes.
+    """
+
+    def __init__(self, cache: AsyncCache, local_max_size: int, local_expire: int):
+        self.cache = cache
+        self.local = LRUCache(max_size=local_max_size)
+        self.local_expire = local_expire
+
+    async def get(self, key: str, **kwargs):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        value = await self.cache.get(key)
+        if value is not None:
+            self.local.set(key, value, expire=self.local_expire)
+        return value
+
+    async def set(self, key: str, value: str, expire: int, **kwargs):
+        await self.cache.set(key, value, expire)
+        self.local.set(key, value, expire=min(expire, self.local_expire))
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.local.delete(key)
+        await self.cache.delete(*keys)
@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import hmac
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+import orjson
+from jose import JWTError, jwt
+from jose.constants import ALGORITHMS
+
+from src.core.api_settings import settings
+
+from .jwt_keys import KeyRing, SigningKey
+
+
+class TokenError(Exception):
+    """
+    Raised when a token can not be decoded or verified.
+    """
+
+
+class JWTBackend(ABC):
+    """
+    Encodes and decodes jwt tokens. Claims 'iat' and 'exp' are int timestamps.
+    """
+
+    @abstractmethod
+    def encode(self, claims: dict, key: SigningKey) -> str:
+        pass
+
+    @abstractmethod
+    def decode(self, token: str, key_ring: KeyRing) -> dict:
+        pass
+
+
+class JoseBackend(JWTBackend):
+    """
+    python-jose based backend, supports all algorithms of the key ring.
+    """
+
+    def encode(self, claims: dict, key: SigningKey) -> str:
+        return jwt.encode(claims, key.signing_key, key.algorithm, headers={'kid': key.kid})
+
+    def decode(self, token: str, key_ring: KeyRing) -> dict:
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+            key = key_ring.get_verification_key(kid)
+            if key is None:
+                raise TokenError(f'Unknown jwt key id: {kid}')
+
+            # Algorithm is pinned by the key to prevent algorithm confusion.
+            return jwt.decode(token, key.verification_key, key.algorithm)
+        except JWTError as excp:
+            raise TokenError(str(excp)) from excp
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b'=' * (-len(data) % 4))
+
+
+class HMACBackend(JWTBackend):
+    """
+    Minimal HS256/HS384/HS512 codec on top of orjson and hmac.
+    Header segments and HMAC key states are computed once per key.
+    """
+    digests = {
+        ALGORITHMS.HS256: hashlib.sha256,
+        ALGORITHMS.HS384: hashlib.sha384,
+        ALGORITHMS.HS512: hashlib.sha512,
+    }
+
+    def __init__(self):
+        self._headers: dict[str, bytes] = {}
+        self._macs: dict[str, hmac.HMAC] = {}
+
+    def _get_mac(self, key: SigningKey) -> hmac.HMAC:
+        mac = self._macs.get(key.kid)
+        if mac is None:
+            if key.algorithm not in self.digests or key.secret is None:
+                raise TokenError(f'Algorithm {key.algorithm} is not supported by HMAC backend')
+            mac = self._macs[key.kid] = hmac.new(key.secret, digestmod=self.digests[key.algorithm])
+        return mac.copy()
+
+    def _get_header(self, key: SigningKey) -> bytes:
+        header = self._headers.get(key.kid)
+        if header is None:
+            header = self._headers[key.kid] = b64encode(
+                orjson.dumps({'alg': key.algorithm, 'typ': 'JWT', 'kid': key.kid})
+            )
+        return header
+
+    def encode(self, claims: dict, key: SigningKey) -> str:
+        signing_input = self._get_header(key) + b'.' + b64encode(orjson.dumps(claims))
+        mac = self._get_mac(key)
+        mac.update(signing_input)
+        return (signing_input + b'.' + b64encode(mac.digest())).decode()
+
+    def decode(self, token: str, key_ring: KeyRing) -> dict:
+        try:
+            signing_input, signature = token.encode().rsplit(b'.', 1)
+            header_segment, payload_segment = signing_input.split(b'.')
+            header = orjson.loads(b64decode(header_segment))
+            key = key_ring.get_verification_key(header.get('kid'))
+            if key is None:
+                raise TokenError(f'Unknown jwt key id: {header.get("kid")}')
+            if header.get('alg') != key.algorithm:
+                raise TokenError('The specified alg value is not allowed')
+
+            mac = self._get_mac(key)
+            mac.update(signing_input)
+            if not hmac.compare_digest(mac.digest(), b64decode(signature)):
+                raise TokenError('Signature verification failed.')
+
+            claims = orjson.loads(b64decode(payload_segment))
+        except (ValueError, TypeError, AttributeError) as excp:
+            raise TokenError(f'Invalid token: {excp}') from excp
+
+        if not isinstance(claims, dict):
+            raise TokenError('Invalid payload')
+
+        exp = claims.get('exp')
+        if exp is not None:
+            if not isinstance(exp, int):
+                raise TokenError('Expiration Time claim (exp) must be an integer.')
+            if exp < time.time():
+                raise TokenError('Signature has expired.')
+
+        return claims
+
+
+@lru_cache()
+def get_jwt_backend(name: str | None = None) -> JWTBackend:
+    name = name or settings.jwt_backend
+    if name == 'jose':
+        return JoseBackend()
+    if name == 'hmac':
+        if settings.jwt_algorithm not in HMACBackend.digests:
+            raise ValueError(f'JWT backend "hmac" does not support {settings.jwt_algorithm} algorithm')
+        return HMACBackend()
+    raise ValueError(f'Unknown JWT backend: {name}')
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from jose import jwk
+from jose.backends.base import Key
+from jose.constants import ALGORITHMS
+
+from src.core.api_settings import settings
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    """
+    Preloaded key, so PEM is parsed once and not on every token.
+    'signing_key' is None for keys which can only verify tokens.
+    """
+    kid: str
+    algorithm: str
+    signing_key: Key | None
+    verification_key: Key
+    # Raw secret of symmetric keys.
+    secret: bytes | None = None
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm in ALGORITHMS.HMAC
+
+    def get_public_jwk(self) -> dict:
+        return {**self.verification_key.to_dict(), 'kid': self.kid, 'use': 'sig'}
+
+
+class KeyRing:
+    """
+    Active key signs new tokens, previous keys are still accepted
+    for verification, so keys can be rotated without logging users out.
+    """
+
+    def __init__(self, active_key: SigningKey, previous_keys: list[SigningKey] | None = None):
+        self.active_key = active_key
+        self.keys = {key.kid: key for key in [*(previous_keys or []), active_key]}
+
+    def get_verification_key(self, kid: str | None) -> SigningKey | None:
+        # Tokens without 'kid' were issued before key ring introduction.
+        if kid is None:
+            return self.active_key
+        return self.keys.get(kid)
+
+    def get_jwks(self) -> dict:
+        """
+        Returns JWK Set with public keys. Symmetric keys are never published.
+        """
+        return {'keys': [key.get_public_jwk() for key in self.keys.values() if not key.is_symmetric]}
+
+
+def get_key_id(pem: str) -> str:
+    return hashlib.sha256(pem.strip().encode()).hexdigest()[:16]
+
+
+def load_asymmetric_key(pem: str, algorithm: str, kid: str | None = None, private: bool = True) -> SigningKey:
+    key = jwk.construct(pem, algorithm)
+    verification_key = key.public_key() if private else key
+    # kid depends on the public key only, so it is the same for private and public PEM of one key.
+    kid = kid or get_key_id(verification_key.to_pem().decode())
+    return SigningKey(
+        kid=kid,
+        algorithm=algorithm,
+        signing_key=key if private else None,
+        verification_key=verification_key
+    )
+
+
+def build_key_ring() -> KeyRing:
+    algorithm = settings.jwt_algorithm
+
+    if algorithm in ALGORITHMS.HMAC:
+        key = jwk.construct(settings.jwt_secret_key, algorithm)
+        active_key = SigningKey(
+            kid=settings.jwt_key_id or 'hmac',
+            algorithm=algorithm,
+            signing_key=key,
+            verification_key=key,
+            secret=settings.jwt_secret_key.encode()
+        )
+        return KeyRing(active_key)
+
+    active_key = load_asymmetric_key(
+        Path(settings.jwt_private_key_path).read_text(),
+        algorithm,
+        kid=settings.jwt_key_id or None
+    )
+    previous_keys = [
+        load_asymmetric_key(Path(path).read_text(), algorithm, private=False)
+        for path in settings.jwt_previous_public_key_paths
+    ]
+    logging.info('JWT key ring loaded. Active key: %s, previous keys: %s',
+                 active_key.kid, [key.kid for key in previous_keys])
+    return KeyRing(active_key, previous_keys)
+
+
+@lru_cache()
+def get_key_ring() -> KeyRing:
+    return build_key_ring()
@@ -1,76 +1,92 @@
+import hashlib
 import logging
+import time
 import uuid
-from datetime import datetime, timedelta
 from functools import lru_cache
 
 from fastapi import Depends
-from jose import JWTError, jwt
 
 from src.core.api_settings import settings
+from src.core.logger import Redacted
+from src.core.metrics import timed
 from src.db.redis_db import get_redis
-from src.schema.model import AccessTokenData, RefreshTokenData
 
-from .helper import AsyncCache
+from .helper import AsyncCache, LRUCache
+from .jwt_backends import JWTBackend, TokenError, get_jwt_backend
+from .jwt_keys import KeyRing, get_key_ring
 
 
 class JWTService:
-    def __init__(self, cache: AsyncCache):
+    def __init__(self, cache: AsyncCache, key_ring: KeyRing | None = None, backend: JWTBackend | None = None):
         self.cache = cache
+        self.key_ring = key_ring or get_key_ring()
+        self.backend = backend or get_jwt_backend()
+        # Payloads of already verified tokens, keyed by token digest.
+        self.verified_tokens = LRUCache(max_size=settings.jwt_verify_cache_size)
 
-    secret_key = settings.jwt_secret_key
-    algorithm = settings.jwt_algorithm
     access_token_expire = settings.jwt_at_expire_minutes
     refresh_token_expire = settings.jwt_rt_expire_minutes
 
-    async def get_token_pair(self, user_id: str, session_id: str, roles: list = None, ) -> (str, str):
+    async def get_token_pair(
+            self,
+            user_id: str,
+            session_id: str,
+            roles: list = None,
+            permissions: str = None) -> (str, str):
         """
         Returns a pair of jwt tokens
         """
-        at_payload = await self.get_access_token_payload(user_id=user_id, roles=roles)
+        at_payload = await self.get_access_token_payload(user_id=user_id, roles=roles, permissions=permissions)
         rt_payload = await self.get_refresh_token_payload(user_id=user_id, roles=roles, session_id=session_id)
         access_token = await self.generate_token(at_payload, token_expire=self.access_token_expire)
         refresh_token = await self.generate_token(rt_payload, token_expire=self.refresh_token_expire)
 
         return access_token, refresh_token
 
-    async def generate_token(self, token_payload: [AccessTokenData or RefreshTokenData], token_expire: int) -> str:
+    @timed('jwt', 'encode')
+    async def generate_token(self, token_payload: dict, token_expire: int) -> str:
         """
-        Generates a jwt token
+        Generates a jwt token. Payload is described by AccessTokenData or RefreshTokenData.
         """
 
-        token_payload.exp = datetime.utcnow() + timedelta(minutes=token_expire)
-        to_encode = dict(token_payload)
+        token_payload['iat'] = int(time.time())
+        token_payload['exp'] = token_payload['iat'] + token_expire * 60
 
-        logging.info('Issued token: %s', to_encode)
-        encoded_jwt = jwt.encode(to_encode, self.secret_key, self.algorithm)
+        logging.debug('Issued token: %s', Redacted(token_payload))
+        encoded_jwt = self.backend.encode(token_payload, self.key_ring.active_key)
 
         return encoded_jwt
 
+    # Payloads are built as plain dicts, since the models are needed for decoding only.
+    # Empty claims are not encoded to keep cookies small.
     @staticmethod
-    async def get_access_token_payload(user_id: str, roles: list = None) -> AccessTokenData:
-        return AccessTokenData(
-            user_id=user_id,
-            iat=datetime.utcnow(),
-            exp=datetime.utcnow(),
-            roles=roles
-        )
+    async def get_access_token_payload(user_id: str, roles: list = None, permissions: str = None) -> dict:
+        payload = {'user_id': user_id}
+        if roles is not None:
+            payload['roles'] = roles
+        if permissions is not None:
+            payload['perms'] = permissions
+        return payload
 
     @staticmethod
-    async def get_refresh_token_payload(user_id: str, session_id: uuid, roles: list = None) -> RefreshTokenData:
-        return RefreshTokenData(
-            user_id=user_id,
-            iat=datetime.utcnow(),
-            exp=datetime.utcnow(),
-            roles=roles,
-            session_id=session_id
-        )
+    async def get_refresh_token_payload(user_id: str, session_id: uuid, roles: list = None) -> dict:
+        payload = {'user_id': user_id, 'session_id': str(session_id)}
+        if roles is not None:
+            payload['roles'] = roles
+        return payload
 
+    @timed('jwt', 'verify')
     async def verify_token(self, token: str) -> dict:
         """
         Verifies received jwt token and returnd decoded payload
         """
+        token_digest = hashlib.sha256(token.encode()).digest()
+        payload = self.verified_tokens.get(token_digest)
+        if payload is not None:
+            return dict(payload)
+
         try:
-            payload = jwt.decode(token, self.secret_key, self.algorithm)
+            payload = self.backend.decode(token, self.key_ring)
             # We do not check token expiration time since it happens during
             # token decoding.
 
@@ -80,11 +96,15 @@ class JWTService:
                 logging.error('Unable to find "user_id" in the "access_token". Received payload: %s', payload)
                 return {}
 
-        except JWTError as excp:
+        except TokenError as excp:
             logging.error('The following error occured during access token decoding: %s', excp)
             return {}
 
-        return payload
+        # Token must not outlive its 'exp' in the cache.
+        cache_ttl = min(payload.get('exp', 0) - time.time(), settings.jwt_verify_cache_ttl_sec)
+        self.verified_tokens.set(token_digest, payload, expire=cache_ttl)
+
+        return dict(payload)
 
 
 @lru_cache()
@@ -0,0 +1,218 @@
+import asyncio
+import ipaddress
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.api_settings import settings
+from src.core.metrics import (LOGIN_HISTORY_BATCH_SIZE,
+                              LOGIN_HISTORY_DROPPED, LOGIN_HISTORY_QUEUE_DEPTH)
+from src.db.postgres import async_session
+from src.models.db_entity import LoginHistory, UserLoginStats
+
+# A value longer than its column would fail the whole batch.
+MAX_LOCATION_LENGTH = LoginHistory.__table__.c.location.type.length
+MAX_USER_AGENT_LENGTH = LoginHistory.__table__.c.user_agent.type.length
+
+
+def normalize_ip_address(ip_address: str | None) -> str | None:
+    try:
+        return str(ipaddress.ip_address(ip_address))
+    except ValueError:
+        return None
+
+
+class LoginHistoryWriter:
+    """
+    Collects login history rows in a bounded queue and writes them to the DB
+    in the background with multi-row INSERTs, one transaction per batch.
+    Login counters in 'user_login_stats' are updated in the same transaction.
+    A batch rejected by the DB (e.g. a row of a user deleted after the login) is split in halves and retried,
+    so only the rejected rows are dropped.
+    A batch is flushed when it has 'batch_size' rows or after 'flush_interval' seconds.
+    When the queue is full, the 'drop' policy discards new rows and 'block' makes callers wait.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker[AsyncSession],
+            max_queue_size: int,
+            batch_size: int,
+            flush_interval: float,
+            overflow_policy: str = 'drop',
+            shutdown_timeout: float = 10):
+        if overflow_policy not in ('drop', 'block'):
+            raise ValueError(f'Unknown login history overflow policy: {overflow_policy}')
+
+        self.session_factory = session_factory
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.shutdown_timeout = shutdown_timeout
+        self.queue: asyncio.Queue[dict] | None = None
+        # Set on every enqueued row, so the writer waits for rows without 'wait_for(queue.get())',
+        # which may lose a row when the timeout and the row arrive together.
+        self._row_added: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._row_added = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name='login-history-writer')
+
+    async def stop(self) -> None:
+        """
+        Writes the rows left in the queue and stops the writer.
+        """
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logging.error('Login history writer has not drained in %s sec, %s rows are lost.',
+                          self.shutdown_timeout, self.queue.qsize())
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def put(self, user_id: str, ip_address: str, location: str, user_agent: str) -> bool:
+        """
+        Enqueues a login history row. Returns False if the row has been dropped.
+        """
+        row = {
+            'user_id': user_id,
+            # Login time, not the time of the batch flush.
+            'timestamp': datetime.utcnow(),
+            'ip_address': normalize_ip_address(ip_address),
+            'location': location[:MAX_LOCATION_LENGTH] if location else location,
+            'user_agent': user_agent[:MAX_USER_AGENT_LENGTH] if user_agent else user_agent,
+        }
+
+        if self._task is None:
+            # Writer is not running (e.g. a CLI or tests), writing the row inline.
+            await self.write_batch([row])
+            return True
+
+        # Incremented before the row is enqueued, the writer may take it before 'put' returns.
+        LOGIN_HISTORY_QUEUE_DEPTH.inc()
+        try:
+            if self.overflow_policy == 'block':
+                await self.queue.put(row)
+            else:
+                self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            LOGIN_HISTORY_QUEUE_DEPTH.dec()
+            LOGIN_HISTORY_DROPPED.inc()
+            logging.warning('Login history queue is full, row of user %s is dropped.', user_id)
+            return False
+        except BaseException:
+            # Cancelled while waiting for a free slot.
+            LOGIN_HISTORY_QUEUE_DEPTH.dec()
+            raise
+
+        self._row_added.set()
+        return True
+
+    async def write_batch(self, rows: list[dict]) -> None:
+        """
+        Inserts the rows and increments login counters of their users in one transaction.
+        """
+        stats: dict[str, dict] = {}
+        for row in rows:
+            user_stats = stats.setdefault(
+                str(row['user_id']),
+                {'user_id': row['user_id'], 'login_count': 0, 'last_login_at': row['timestamp']}
+            )
+            user_stats['login_count'] += 1
+            user_stats['last_login_at'] = max(user_stats['last_login_at'], row['timestamp'])
+
+        # Rows are sorted by user, so concurrent batches lock counters in the same order and do not deadlock.
+        stats_statement = insert(UserLoginStats).values([stats[user_id] for user_id in sorted(stats)])
+        stats_statement = stats_statement.on_conflict_do_update(
+            index_elements=[UserLoginStats.user_id],
+            set_={
+                'login_count': UserLoginStats.login_count + stats_statement.excluded.login_count,
+                'last_login_at': func.greatest(UserLoginStats.last_login_at, stats_statement.excluded.last_login_at),
+            }
+        )
+
+        async with self.session_factory() as db:
+            await db.execute(insert(LoginHistory), rows)
+            await db.execute(stats_statement)
+            await db.commit()
+
+    async def write_rows(self, rows: list[dict]) -> int:
+        """
+        Writes the rows in batches, returns the number of dropped rows.
+        """
+        try:
+            await self.write_batch(rows)
+        except (DataError, IntegrityError) as excp:
+            if len(rows) == 1:
+                logging.error('DB. Login history row of user %s is rejected: %s', rows[0]['user_id'], excp)
+                return 1
+            middle = len(rows) // 2
+            return await self.write_rows(rows[:middle]) + await self.write_rows(rows[middle:])
+        except Exception as excp:
+            logging.error('DB. Unable to save %s login history rows: %s', len(rows), excp)
+            return len(rows)
+        return 0
+
+    async def _get_batch(self) -> list[dict]:
+        # Waiting for the first row without a deadline, then collecting the rest of the batch.
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            # No await between the empty queue check and clear, so a row added meanwhile is not missed.
+            self._row_added.clear()
+            try:
+                await asyncio.wait_for(self._row_added.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._get_batch()
+            try:
+                dropped = await self.write_rows(batch)
+                LOGIN_HISTORY_DROPPED.inc(dropped)
+                if dropped < len(batch):
+                    LOGIN_HISTORY_BATCH_SIZE.observe(len(batch))
+            finally:
+                LOGIN_HISTORY_QUEUE_DEPTH.dec(len(batch))
+                for _ in batch:
+                    self.queue.task_done()
+
+
+login_history_writer = LoginHistoryWriter(
+    session_factory=async_session,
+    max_queue_size=settings.login_history_queue_size,
+    batch_size=settings.login_history_batch_size,
+    flush_interval=settings.login_history_flush_interval_sec,
+    overflow_policy=settings.login_history_overflow_policy
+)
+
+
+def get_login_history_writer() -> LoginHistoryWriter:
+    return login_history_writer
@@ -1,5 +1,10 @@
+import base64
+import binascii
+import datetime
+import uuid
 from enum import Enum
 
+import orjson
 from fastapi.param_functions import Query
 from pydantic import BaseModel
 
@@ -13,6 +18,8 @@ class Pagination(BaseModel):
     per_page: int
     page: int
     order: SortEnum
+    cursor: str | None = None
+    include_total: bool = True
 
     def get_offset(self):
         if self.page == 1:
@@ -26,5 +33,28 @@ class Pagination(BaseModel):
 def pagination_params(
         page: int = Query(ge=1, required=False, default=1, le=100),
         per_page: int = Query(ge=1, le=100, required=False, default=50),
-        order: SortEnum = SortEnum.DESC):
-    return Pagination(per_page=per_page, page=page, order=order.value)
+        order: SortEnum = SortEnum.DESC,
+        cursor: str | None = Query(default=None, description="'next_cursor' of the previous page. Overrides 'page'."),
+        include_total: bool = Query(default=True, description='Count total entries and pages.')):
+    return Pagination(per_page=per_page, page=page, order=order.value, cursor=cursor, include_total=include_total)
+
+
+def encode_cursor(timestamp: datetime.datetime, row_id: uuid.UUID, order: SortEnum) -> str:
+    """
+    Encodes an opaque keyset pagination cursor pointing right after the given row.
+    """
+    return base64.urlsafe_b64encode(orjson.dumps([timestamp.isoformat(), str(row_id), order.value])).decode()
+
+
+def decode_cursor(cursor: str, order: SortEnum) -> tuple[datetime.datetime, uuid.UUID]:
+    """
+    Decodes a cursor made by 'encode_cursor'. Raises ValueError if the cursor is malformed
+    or has been made for another sort order.
+    """
+    try:
+        timestamp, row_id, cursor_order = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_order != order.value:
+            raise ValueError('Cursor has been made for another sort order')
+        return datetime.datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except (TypeError, AttributeError, orjson.JSONDecodeError, binascii.Error) as excp:
+        raise ValueError(f'Invalid cursor: {excp}') from excp
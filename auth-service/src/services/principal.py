@@ -0,0 +1,123 @@
+import logging
+from functools import lru_cache
+
+from fastapi import Depends
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.api_settings import settings
+from src.db.redis_db import get_redis
+from src.schema.model import UserPrincipal
+from src.services.base import BaseService, get_base_service
+
+from .helper import AsyncCache, RedisCache, TieredCache
+
+
+class PrincipalService:
+    """
+    Resolves users from access tokens using a cache of compact user snapshots,
+    so authenticated requests do not query the DB.
+    Any change of the data stored in the snapshot must call 'invalidate'.
+    Every invalidation increments a per-user generation in Redis. A snapshot loaded from the DB
+    is dropped right after it is cached if the generation has changed meanwhile,
+    so a load racing with 'invalidate' does not leave a stale snapshot in the cache.
+    """
+
+    def __init__(self, cache: AsyncCache, base_service: BaseService, redis: Redis):
+        self.cache = cache
+        self.base_service = base_service
+        self.redis = redis
+
+    @staticmethod
+    def get_cache_key(user_id: str) -> str:
+        return f'principal:{user_id}'
+
+    @staticmethod
+    def get_generation_key(user_id: str) -> str:
+        return f'principal:generation:{user_id}'
+
+    async def get_generation(self, user_id: str) -> bytes | None:
+        return await self.redis.get(self.get_generation_key(user_id))
+
+    async def get_principal(self, db: AsyncSession, user_id: str) -> [UserPrincipal | None]:
+        """
+        Returns cached user snapshot, loads it from the DB on a cache miss.
+        """
+        key = self.get_cache_key(user_id)
+        try:
+            cached_principal = await self.cache.get(key)
+        except Exception as excp:
+            logging.error('Unable to get principal %s from cache: %s', user_id, excp)
+            cached_principal = None
+
+        if cached_principal is not None:
+            return UserPrincipal.model_validate_json(cached_principal)
+
+        try:
+            generation = await self.get_generation(user_id)
+        except Exception as excp:
+            # Redis is unavailable, the snapshot could not be cached anyway.
+            logging.error('Unable to get principal %s generation: %s', user_id, excp)
+            return await self.load_principal(db, user_id)
+
+        principal = await self.load_principal(db, user_id)
+        if principal is None:
+            return None
+
+        try:
+            await self.cache.set(key, principal.model_dump_json(), expire=settings.principal_cache_ttl_sec)
+            if await self.get_generation(user_id) != generation:
+                # Invalidated while the snapshot was loaded, the snapshot may be stale.
+                await self.cache.delete(key)
+        except Exception as excp:
+            logging.error('Unable to save principal %s to cache: %s', user_id, excp)
+
+        return principal
+
+    async def load_principal(self, db: AsyncSession, user_id: str) -> [UserPrincipal | None]:
+        user = await self.base_service.get_user_by_uuid(db, user_id)
+        if not user:
+            return None
+
+        user_roles = await self.base_service.get_user_roles(db, user.id)
+        return UserPrincipal(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            role_ids=[str(role.id) for role in user_roles]
+        )
+
+    async def invalidate(self, *user_ids: str) -> None:
+        """
+        Drops cached snapshots. Other workers may keep their local copy
+        for 'principal_local_cache_ttl_sec' seconds at most.
+        """
+        # Bounded commands, batch role changes may touch a lot of users.
+        for start in range(0, len(user_ids), 1000):
+            chunk = user_ids[start:start + 1000]
+            try:
+                # The generation is incremented before the delete, so a concurrent load
+                # which caches a stale snapshot after the delete sees the new generation.
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for user_id in chunk:
+                        pipe.incr(self.get_generation_key(user_id))
+                        # Generations matter only while a snapshot is loaded.
+                        pipe.expire(self.get_generation_key(user_id), settings.principal_cache_ttl_sec)
+                    await pipe.execute()
+                await self.cache.delete(*[self.get_cache_key(user_id) for user_id in chunk])
+            except Exception as excp:
+                logging.error('Unable to invalidate %s principals: %s', len(chunk), excp)
+
+
+@lru_cache()
+def get_principal_service(
+        redis: Redis = Depends(get_redis),
+        base_service: BaseService = Depends(get_base_service)
+) -> PrincipalService:
+    cache = TieredCache(
+        cache=RedisCache(redis),
+        local_max_size=settings.principal_local_cache_size,
+        local_expire=settings.principal_local_cache_ttl_sec
+    )
+    return PrincipalService(cache=cache, base_service=base_service, redis=redis)
@@ -0,0 +1,149 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+
+from fastapi import Depends
+from redis.asyncio import Redis
+
+from src.core.api_settings import settings
+from src.core.metrics import LOGIN_RATE_LIMITED, timed
+from src.db.redis_db import get_redis
+
+# Sliding window counter with exponential lockout, evaluated for several subjects at once.
+# Every subject has 3 keys: KEYS[3i-2] - window counters prefix, KEYS[3i-1] - lock, KEYS[3i] - lockouts counter.
+# ARGV[1] - lockout base ms, ARGV[2] - lockout max ms, ARGV[3] - lockouts counter ttl ms,
+# ARGV[3+2i-1] - subject attempts limit, ARGV[3+2i] - subject window ms.
+# The window is estimated as previous window count * its remaining share + current window count.
+# Counter keys are built in the script from the Redis time, so the script is meant for a single Redis node.
+# Returns {0, retry after ms, subject index} if the attempt is rejected, {1, 0, 0} otherwise.
+CHECK_LOGIN_ATTEMPT_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local subjects = #KEYS / 3
+
+for i = 1, subjects do
+    local ttl = redis.call('PTTL', KEYS[3 * i - 1])
+    if ttl > 0 then
+        return {0, ttl, i}
+    end
+end
+
+local current_keys = {}
+for i = 1, subjects do
+    local limit = tonumber(ARGV[3 + 2 * i - 1])
+    local window = tonumber(ARGV[3 + 2 * i])
+    local index = math.floor(now / window)
+    local current_key = KEYS[3 * i - 2] .. index
+    local current = tonumber(redis.call('GET', current_key) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[3 * i - 2] .. (index - 1)) or '0')
+    local previous_share = 1 - (now - index * window) / window
+
+    if previous * previous_share + current >= limit then
+        local lockouts = redis.call('INCR', KEYS[3 * i])
+        redis.call('PEXPIRE', KEYS[3 * i], ARGV[3])
+        local lockout = math.min(tonumber(ARGV[1]) * 2 ^ (lockouts - 1), tonumber(ARGV[2]))
+        redis.call('SET', KEYS[3 * i - 1], '1', 'PX', lockout)
+        return {0, lockout, i}
+    end
+    current_keys[i] = {current_key, window}
+end
+
+for i = 1, subjects do
+    redis.call('INCR', current_keys[i][1])
+    redis.call('PEXPIRE', current_keys[i][1], current_keys[i][2] * 2)
+end
+return {1, 0, 0}
+"""
+
+# Forgets attempts and lockouts of a subject. KEYS[1] - window counters prefix, KEYS[2] - lockouts counter.
+# ARGV[1] - window ms.
+RESET_LOGIN_ATTEMPTS_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local index = math.floor(now / tonumber(ARGV[1]))
+redis.call('DEL', KEYS[1] .. index, KEYS[1] .. (index - 1), KEYS[2])
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    subject: str
+    attempts: int
+    window_sec: int
+
+
+class LoginRateLimiter:
+    """
+    Limits login attempts per email and per client IP before credentials are checked,
+    so a brute force burst does not reach the DB and the password KDF.
+    A subject exceeding its limit is locked out, every next lockout is twice longer.
+    """
+    key_prefix = 'login:limit'
+
+    def __init__(
+            self,
+            redis: Redis,
+            email_policy: RateLimitPolicy,
+            ip_policy: RateLimitPolicy,
+            lockout_base_sec: int,
+            lockout_max_sec: int,
+            lockout_reset_sec: int):
+        self.email_policy = email_policy
+        self.ip_policy = ip_policy
+        self.lockout_args = [lockout_base_sec * 1000, lockout_max_sec * 1000, lockout_reset_sec * 1000]
+        self.check_script = redis.register_script(CHECK_LOGIN_ATTEMPT_SCRIPT)
+        self.reset_script = redis.register_script(RESET_LOGIN_ATTEMPTS_SCRIPT)
+
+    def get_keys(self, policy: RateLimitPolicy, value: str) -> list[str]:
+        # Hashing keeps emails out of Redis keys and bounds the key length.
+        digest = hashlib.blake2b(value.strip().lower().encode(), digest_size=16).hexdigest()
+        prefix = f'{self.key_prefix}:{policy.subject}:{digest}'
+        return [f'{prefix}:window:', f'{prefix}:lock', f'{prefix}:lockouts']
+
+    @timed('redis', 'check_login_attempt')
+    async def check(self, email: str, ip_address: str) -> float | None:
+        """
+        Registers a login attempt. Returns seconds to wait if the attempt is rejected, None otherwise.
+        Attempts are allowed if Redis is not available.
+        """
+        policies = [(self.email_policy, email), (self.ip_policy, ip_address)]
+        keys, args = [], list(self.lockout_args)
+        for policy, value in policies:
+            keys.extend(self.get_keys(policy, value))
+            args.extend([policy.attempts, policy.window_sec * 1000])
+
+        try:
+            allowed, retry_after_ms, subject_index = await self.check_script(keys=keys, args=args)
+        except Exception as excp:
+            logging.error('Unable to check login rate limit: %s', excp)
+            return None
+
+        if allowed:
+            return None
+
+        LOGIN_RATE_LIMITED.labels(subject=policies[subject_index - 1][0].subject).inc()
+        return retry_after_ms / 1000
+
+    async def reset(self, email: str) -> None:
+        """
+        Forgets failed attempts of the email after a successful login.
+        """
+        window_key, _, lockouts_key = self.get_keys(self.email_policy, email)
+        try:
+            await self.reset_script(keys=[window_key, lockouts_key], args=[self.email_policy.window_sec * 1000])
+        except Exception as excp:
+            logging.error('Unable to reset login rate limit: %s', excp)
+
+
+@lru_cache()
+def get_login_rate_limiter(redis: Redis = Depends(get_redis)) -> LoginRateLimiter:
+    return LoginRateLimiter(
+        redis,
+        email_policy=RateLimitPolicy('email', settings.login_limit_email_attempts, settings.login_limit_email_window_sec),
+        ip_policy=RateLimitPolicy('ip', settings.login_limit_ip_attempts, settings.login_limit_ip_window_sec),
+        lockout_base_sec=settings.login_lockout_base_sec,
+        lockout_max_sec=settings.login_lockout_max_sec,
+        lockout_reset_sec=settings.login_lockout_reset_sec
+    )
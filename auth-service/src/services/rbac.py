@@ -0,0 +1,194 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping
+
+from sqlalchemy.sql import select
+
+from src.core.api_settings import settings
+from src.db import redis_db
+from src.db.postgres import async_session
+from src.models.db_entity import Permission, RolePermission
+from src.schema.model import UserPrincipal
+
+
+@dataclass(frozen=True)
+class PermissionMatrix:
+    """
+    Immutable snapshot of roles permissions.
+    'fingerprint' is a hash of the content used in permission claims, so a claim can not be
+    checked against a different matrix, whatever the sync version is.
+    """
+    version: str
+    # permission name -> permission id
+    permission_ids: Mapping[str, str] = field(default_factory=dict)
+    # role id -> ids of the role permissions
+    role_permissions: Mapping[str, frozenset[str]] = field(default_factory=dict)
+    # Permission names sorted by name, the index of a name is its bit in the permissions bitmap.
+    permission_names: tuple[str, ...] = ()
+    # role id -> bitmap of the role permissions
+    role_bitmaps: Mapping[str, int] = field(default_factory=dict)
+    fingerprint: str = field(init=False)
+
+    def __post_init__(self):
+        digest = hashlib.blake2b(digest_size=8)
+        for name in self.permission_names:
+            digest.update(name.encode() + b'\0')
+        for role_id, bitmap in sorted(self.role_bitmaps.items()):
+            digest.update(f'{role_id}={bitmap:x}'.encode() + b'\0')
+        object.__setattr__(self, 'fingerprint', digest.hexdigest())
+
+    def has_permission(self, role_ids: list[str], permission_name: str) -> bool:
+        permission_id = self.permission_ids.get(permission_name)
+        if permission_id is None:
+            return False
+        return any(permission_id in self.role_permissions.get(role_id, ()) for role_id in role_ids)
+
+    def get_permissions_claim(self, role_ids: list[str]) -> str:
+        """
+        Returns '<fingerprint>:<base64url little-endian bitmap>' of the roles permissions.
+        """
+        bitmap = 0
+        for role_id in role_ids:
+            bitmap |= self.role_bitmaps.get(role_id, 0)
+        bitmap_bytes = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+        return f'{self.fingerprint}:{base64.urlsafe_b64encode(bitmap_bytes).rstrip(b"=").decode()}'
+
+    def check_permissions_claim(self, claim: str | None, permission_name: str) -> bool | None:
+        """
+        Checks permission using a claim built by 'get_permissions_claim'.
+        Returns None if the claim can not be used: absent or built by another matrix.
+        """
+        if not claim:
+            return None
+
+        fingerprint, _, encoded_bitmap = claim.partition(':')
+        if fingerprint != self.fingerprint:
+            return None
+
+        try:
+            bit = self.permission_names.index(permission_name)
+        except ValueError:
+            return False
+
+        bitmap_bytes = base64.urlsafe_b64decode(encoded_bitmap + '=' * (-len(encoded_bitmap) % 4))
+        return bool(int.from_bytes(bitmap_bytes, 'little') >> bit & 1)
+
+
+class RBACService:
+    """
+    Keeps in memory a PermissionMatrix built from 'roles', 'permissions' and 'role_permissions' tables.
+    Every change of these tables sets a new random version in Redis,
+    workers compare it with their matrix version at most once per 'poll_interval' seconds.
+    Random versions are never reused, unlike a counter which restarts after Redis loses its data.
+    """
+    version_key = 'rbac:version'
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self.matrix = PermissionMatrix(version='')
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_remote_version(self) -> str:
+        version = await redis_db.redis.get(self.version_key)
+        return version.decode() if version else ''
+
+    async def load(self, version: str) -> None:
+        """
+        Builds a new matrix from the DB and replaces the current one.
+        Version must be read before the DB, so a concurrent change
+        results in a newer version and one more reload.
+        """
+        async with async_session() as db:
+            permissions = (await db.execute(select(Permission.id, Permission.name))).all()
+            role_permissions = (await db.execute(select(RolePermission.role_id, RolePermission.permission_id))).all()
+
+        permission_ids = {name: str(permission_id) for permission_id, name in permissions}
+        permission_names = tuple(sorted(permission_ids))
+        permission_bits = {permission_ids[name]: 1 << bit for bit, name in enumerate(permission_names)}
+
+        permissions_by_role: dict[str, set[str]] = {}
+        role_bitmaps: dict[str, int] = {}
+        for role_id, permission_id in role_permissions:
+            role_id, permission_id = str(role_id), str(permission_id)
+            permissions_by_role.setdefault(role_id, set()).add(permission_id)
+            role_bitmaps[role_id] = role_bitmaps.get(role_id, 0) | permission_bits.get(permission_id, 0)
+
+        self.matrix = PermissionMatrix(
+            version=version,
+            permission_ids=MappingProxyType(permission_ids),
+            role_permissions=MappingProxyType(
+                {role_id: frozenset(permission_ids) for role_id, permission_ids in permissions_by_role.items()}
+            ),
+            permission_names=permission_names,
+            role_bitmaps=MappingProxyType(role_bitmaps)
+        )
+        logging.info('RBAC permission matrix version %s loaded: %s permissions, %s roles, fingerprint %s.',
+                     version or '-', len(permissions), len(permissions_by_role), self.matrix.fingerprint)
+
+    async def start(self) -> None:
+        try:
+            version = await self.get_remote_version()
+        except Exception as excp:
+            logging.error('Unable to get RBAC version from Redis: %s', excp)
+            version = ''
+        await self.load(version)
+        self._checked_at = time.monotonic()
+
+    async def sync(self) -> None:
+        """
+        Reloads the matrix if another worker has changed roles or permissions.
+        """
+        if time.monotonic() - self._checked_at < self.poll_interval:
+            return
+        self._checked_at = time.monotonic()
+
+        try:
+            version = await self.get_remote_version()
+        except Exception as excp:
+            logging.error('Unable to get RBAC version from Redis: %s', excp)
+            return
+
+        if version == self.matrix.version:
+            return
+
+        async with self._lock:
+            if version != self.matrix.version:
+                await self.load(version)
+
+    async def invalidate(self) -> None:
+        """
+        Must be called after roles or permissions are changed in the DB.
+        """
+        version = uuid.uuid4().hex
+        try:
+            await redis_db.redis.set(self.version_key, version)
+        except Exception as excp:
+            # Other workers will not see the change until the next successful update,
+            # claims issued by them are rejected here since the matrix fingerprint differs.
+            logging.error('Unable to update RBAC version in Redis: %s', excp)
+
+        async with self._lock:
+            await self.load(version)
+        self._checked_at = time.monotonic()
+
+    def has_permission(self, user: UserPrincipal, permission_name: str) -> bool:
+        """
+        Checks user permission without any IO.
+        """
+        if user.is_superuser:
+            return True
+        return self.matrix.has_permission(user.role_ids, permission_name)
+
+
+rbac_service = RBACService(poll_interval=settings.rbac_poll_interval_sec)
+
+
+def get_rbac_service() -> RBACService:
+    return rbac_service
@@ -1,3 +1,4 @@
+import time
 from functools import lru_cache
 
 import backoff
@@ -5,6 +6,7 @@ import requests
 from fastapi import Depends
 from redis.asyncio import Redis
 
+from src.core.metrics import timed
 from src.db.redis_db import get_redis
 
 BACKOFF_SETTINGS = {
@@ -15,6 +17,43 @@ BACKOFF_SETTINGS = {
 }
 
 
+# Every refresh token session is stored as '<user_id>:<session_id>' key and as a member
+# of 'sessions:<user_id>' sorted set scored by the session expiration timestamp.
+# Expired members are pruned lazily on every change of the set.
+
+# Atomically revokes the current refresh token session and whitelists the new one.
+# KEYS[1] - current session key, KEYS[2] - new session key, KEYS[3] - user sessions index.
+# ARGV[1] - new session ttl in seconds, ARGV[2] - current timestamp,
+# ARGV[3] - current session id, ARGV[4] - new session id.
+# Returns 0 if the current session does not exist (revoked, expired or already rotated).
+ROTATE_REFRESH_TOKEN_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if not value then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], value, 'EX', ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[3])
+redis.call('ZADD', KEYS[3], tonumber(ARGV[2]) + tonumber(ARGV[1]), ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', ARGV[2])
+redis.call('EXPIRE', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Atomically revokes all the user sessions.
+# KEYS[1] - user sessions index, ARGV[1] - user session keys prefix.
+# Returns the number of revoked sessions.
+REVOKE_ALL_REFRESH_TOKENS_SCRIPT = """
+local session_ids = redis.call('ZRANGE', KEYS[1], 0, -1)
+local revoked = 0
+for _, session_id in ipairs(session_ids) do
+    revoked = revoked + redis.call('DEL', ARGV[1] .. session_id)
+end
+redis.call('DEL', KEYS[1])
+return revoked
+"""
+
+
 class RedisService:
     """
     A class to combine all the Redis operations in the one place.
@@ -22,6 +61,9 @@ class RedisService:
 
     def __init__(self, redis: Redis):
         self.redis = redis
+        # Scripts are sent with EVALSHA and loaded with SCRIPT LOAD only when Redis does not know them.
+        self.rotate_refresh_token_script = redis.register_script(ROTATE_REFRESH_TOKEN_SCRIPT)
+        self.revoke_all_refresh_tokens_script = redis.register_script(REVOKE_ALL_REFRESH_TOKENS_SCRIPT)
 
     @staticmethod
     async def get_redis_key(user_id: str, session_id: str) -> str:
@@ -30,26 +72,106 @@ class RedisService:
         """
         return f'{user_id}:{session_id}'
 
+    @staticmethod
+    async def get_sessions_key(user_id: str) -> str:
+        """
+        Generate key value for the user sessions index.
+        """
+        return f'sessions:{user_id}'
+
+    @timed('redis')
     @backoff.on_exception(**BACKOFF_SETTINGS)
-    async def save_refresh_token(self, user_id: str, session_id: str, expire_time_sec: int) -> None:
+    async def save_refresh_token(self, user_id: str, session_id: str, expire_time_sec: int, value: str = 'rt') -> None:
         """
-        Save refresh_token in Redis.
+        Save refresh_token in Redis and add it to the user sessions index.
         """
         key = await self.get_redis_key(user_id, session_id)
-        await self.redis.setex(
-            name=key,
-            value='rt',
-            time=expire_time_sec
-        )
+        sessions_key = await self.get_sessions_key(user_id)
+        now = int(time.time())
 
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.setex(name=key, value=value, time=expire_time_sec)
+            pipe.zadd(sessions_key, {session_id: now + expire_time_sec})
+            pipe.zremrangebyscore(sessions_key, '-inf', now)
+            # All sessions have the same ttl, so the newest one expires last.
+            pipe.expire(sessions_key, expire_time_sec)
+            await pipe.execute()
+
+    @timed('redis')
     @backoff.on_exception(**BACKOFF_SETTINGS)
     async def del_refresh_token(self, user_id: str, session_id: str) -> None:
         """
-        Set exp time now for refresh_token in Redis.
+        Remove refresh_token from Redis and from the user sessions index.
+        """
+        key = await self.get_redis_key(user_id, session_id)
+        sessions_key = await self.get_sessions_key(user_id)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.zrem(sessions_key, session_id)
+            await pipe.execute()
+
+    # No retries here: repeating a rotation which has already succeeded would revoke the new session.
+    @timed('redis')
+    async def rotate_refresh_token(
+            self,
+            user_id: str,
+            session_id: str,
+            new_session_id: str,
+            expire_time_sec: int) -> bool:
+        """
+        Replaces refresh_token session with a new one in a single round trip.
+        Only one of concurrent rotations of the same session succeeds.
         """
         key = await self.get_redis_key(user_id, session_id)
-        await self.redis.expire(name=key, time=0)
+        new_key = await self.get_redis_key(user_id, new_session_id)
+        sessions_key = await self.get_sessions_key(user_id)
+        result = await self.rotate_refresh_token_script(
+            keys=[key, new_key, sessions_key],
+            args=[expire_time_sec, int(time.time()), session_id, new_session_id]
+        )
+        return bool(result)
+
+    @timed('redis')
+    @backoff.on_exception(**BACKOFF_SETTINGS)
+    async def del_all_refresh_tokens(self, user_id: str) -> int:
+        """
+        Revoke all the user refresh_token sessions.
+        Costs O(sessions of the user) regardless of the Redis keys amount.
+        """
+        sessions_key = await self.get_sessions_key(user_id)
+        prefix = await self.get_redis_key(user_id, '')
+        return await self.revoke_all_refresh_tokens_script(keys=[sessions_key], args=[prefix])
+
+    @timed('redis')
+    @backoff.on_exception(**BACKOFF_SETTINGS)
+    async def get_user_sessions(self, user_id: str) -> list[tuple[str, int, bytes | None]]:
+        """
+        Returns (session_id, expiration timestamp, saved session value) of the active user sessions.
+        """
+        sessions_key = await self.get_sessions_key(user_id)
+        now = int(time.time())
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(sessions_key, '-inf', now)
+            pipe.zrange(sessions_key, 0, -1, withscores=True)
+            _, sessions = await pipe.execute()
+
+        if not sessions:
+            return []
+
+        session_ids = [session_id.decode() if isinstance(session_id, bytes) else session_id
+                       for session_id, _ in sessions]
+        values = await self.redis.mget([await self.get_redis_key(user_id, session_id) for session_id in session_ids])
+
+        # Session key may be already deleted by a concurrent logout.
+        return [
+            (session_id, int(expire_at), value)
+            for session_id, (_, expire_at), value in zip(session_ids, sessions, values)
+            if value is not None
+        ]
 
+    @timed('redis')
     @backoff.on_exception(**BACKOFF_SETTINGS)
     async def get_value_by_key(self, key: str) -> str:
         """
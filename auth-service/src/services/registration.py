@@ -8,13 +8,16 @@ from sqlalchemy.sql import select
 from src.db.redis_db import get_redis
 from src.models.db_entity import User
 from src.schema.model import UserRegisteredResp, UserRegistrationReq
+from src.services.email_filter import EmailFilter, get_email_filter
+from src.services.hashing import password_hasher
 
 from .helper import AsyncCache
 
 
 class RegistrationService:
-    def __init__(self, cache: AsyncCache):
+    def __init__(self, cache: AsyncCache, email_filter: EmailFilter):
         self.cache = cache
+        self.email_filter = email_filter
 
     async def register_user(
         self,
@@ -33,6 +36,8 @@ class RegistrationService:
 
     # TODO: check password validity
     async def check_user_exists(self, db: AsyncSession, email: str) -> bool:
+        if not await self.email_filter.might_contain(email):
+            return False
         statement = select(User).where(User.email == email)
         statement_result = await db.execute(statement=statement)
         user = statement_result.scalar_one_or_none()
@@ -43,7 +48,10 @@ class RegistrationService:
             db: AsyncSession,
             user_info: UserRegistrationReq) -> UserRegisteredResp:
 
-        user = User(email=user_info.email, hashed_password=user_info.password)
+        hashed_password = await password_hasher.hash_password(user_info.password)
+        # Before the commit, so the user can log in right after it on any worker.
+        await self.email_filter.add(user_info.email)
+        user = User(email=user_info.email, hashed_password=hashed_password)
         db.add(user)
         await db.commit()
         await db.refresh(user)
@@ -58,5 +66,6 @@ class RegistrationService:
 @lru_cache()
 def get_registration_service(
         cache: AsyncCache = Depends(get_redis),
+        email_filter: EmailFilter = Depends(get_email_filter)
 ) -> RegistrationService:
-    return RegistrationService(cache=cache)
\ No newline at end of file
+    return RegistrationService(cache=cache, email_filter=email_filter)
\ No newline at end of file
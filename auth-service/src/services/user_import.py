@@ -0,0 +1,226 @@
+import asyncio
+import codecs
+import csv
+import uuid
+from datetime import UTC, datetime
+from enum import Enum
+from functools import lru_cache
+from typing import AsyncIterator
+
+import orjson
+from asyncpg.exceptions import DataError as CopyDataError
+from fastapi import Depends
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import DataError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.api_settings import settings
+from src.db.postgres import async_session
+from src.models.db_entity import User
+from src.schema.model import UserImportError, UserImportResp, UserImportRow
+from src.services.email_filter import EmailFilter, get_email_filter
+from src.services.hashing import canonical_method, get_hash_method, password_hasher
+
+IMPORT_COLUMNS = ('id', 'email', 'hashed_password', 'is_active', 'is_superuser', 'is_verified', 'registered_at')
+# Longer values would fail the whole COPY, emails are limited to 254 characters by the validation.
+MAX_HASHED_PASSWORD_LENGTH = User.__table__.c.hashed_password.type.length
+
+
+class ImportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a stream of UTF-8 chunks (e.g. a request body) into lines.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = ''
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+async def parse_rows(lines: AsyncIterator[str], file_format: ImportFormat) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    Yields (line number, row fields) or (line number, parse error). CSV must have a header line.
+    Quoted CSV values can not contain line breaks.
+    """
+    header = None
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        line = line.rstrip('\r')
+        if not line.strip():
+            continue
+
+        if file_format == ImportFormat.ndjson:
+            try:
+                row = orjson.loads(line)
+            except orjson.JSONDecodeError as excp:
+                yield line_number, f'invalid JSON: {excp}'
+                continue
+            yield line_number, row if isinstance(row, dict) else 'row must be a JSON object'
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield line_number, f'expected {len(header)} values, got {len(values)}'
+            continue
+        # Empty CSV values are treated as absent.
+        yield line_number, {name: value for name, value in zip(header, values) if value != ''}
+
+
+class UserImporter:
+    """
+    Imports users in chunks of 'chunk_size' rows. Every chunk is loaded with COPY into a temporary table
+    and moved to 'users' with INSERT ... ON CONFLICT DO NOTHING, so existing emails are reported and skipped.
+    A value rejected by Postgres fails the whole chunk, so such a chunk is split in halves and retried
+    until the bad rows are isolated.
+    Plain passwords are hashed with the service password hasher, imports with plain passwords
+    compete with logins for the hashing workers.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker[AsyncSession],
+            email_filter: EmailFilter,
+            chunk_size: int,
+            max_errors: int | None = None):
+        self.session_factory = session_factory
+        self.email_filter = email_filter
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    def add_error(self, result: UserImportResp, line: int, email: str | None, error: str) -> None:
+        result.failed += 1
+        if self.max_errors is not None and len(result.errors) >= self.max_errors:
+            result.errors_truncated = True
+            return
+        result.errors.append(UserImportError(line=line, email=email, error=error))
+
+    async def run(self, lines: AsyncIterator[str], file_format: ImportFormat) -> UserImportResp:
+        result = UserImportResp()
+        seen_emails = set()
+        chunk: list[tuple[int, UserImportRow]] = []
+
+        async for line_number, fields in parse_rows(lines, file_format):
+            if isinstance(fields, str):
+                self.add_error(result, line_number, None, fields)
+                continue
+
+            try:
+                row = UserImportRow.model_validate(fields)
+            except ValidationError as excp:
+                errors = '; '.join(f'{".".join(map(str, error["loc"])) or "row"}: {error["msg"]}'
+                                   for error in excp.errors())
+                self.add_error(result, line_number, fields.get('email'), errors)
+                continue
+
+            if row.hashed_password is not None:
+                if len(row.hashed_password) > MAX_HASHED_PASSWORD_LENGTH:
+                    self.add_error(result, line_number, row.email,
+                                   f'hashed_password is longer than {MAX_HASHED_PASSWORD_LENGTH} characters')
+                    continue
+                try:
+                    canonical_method(get_hash_method(row.hashed_password))
+                except ValueError as excp:
+                    self.add_error(result, line_number, row.email, f'unsupported password hash: {excp}')
+                    continue
+
+            if row.email in seen_emails:
+                self.add_error(result, line_number, row.email, 'duplicate email in the import')
+                continue
+            seen_emails.add(row.email)
+
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                await self.load_chunk(chunk, result)
+                chunk = []
+
+        if chunk:
+            await self.load_chunk(chunk, result)
+        return result
+
+    async def load_chunk(self, chunk: list[tuple[int, UserImportRow]], result: UserImportResp) -> None:
+        hashed_passwords = [row.hashed_password for _, row in chunk]
+        plain_indexes = [index for index, hashed_password in enumerate(hashed_passwords) if hashed_password is None]
+        # Plain passwords of the chunk are hashed in parallel on all the hashing workers.
+        hashed = await asyncio.gather(*(
+            password_hasher.hash_password(chunk[index][1].password) for index in plain_indexes
+        ))
+        for index, hashed_password in zip(plain_indexes, hashed):
+            hashed_passwords[index] = hashed_password
+
+        now = datetime.now(UTC)
+        records = [
+            (uuid.uuid4(), row.email, hashed_password, row.is_active, False, row.is_verified, row.registered_at or now)
+            for (_, row), hashed_password in zip(chunk, hashed_passwords)
+        ]
+        # Before the commit, so imported users can log in right after it on any worker.
+        await self.email_filter.add_many([row.email for _, row in chunk])
+
+        await self.load_records([line_number for line_number, _ in chunk], records, result)
+
+    async def load_records(self, line_numbers: list[int], records: list[tuple], result: UserImportResp) -> None:
+        try:
+            inserted_emails = await self.insert_records(records)
+        except (CopyDataError, DataError) as excp:
+            if len(records) == 1:
+                self.add_error(result, line_numbers[0], records[0][1], f'user is not imported: {excp}')
+                return
+            # A bad value fails the whole COPY, the halves are retried to import the other rows.
+            middle = len(records) // 2
+            await self.load_records(line_numbers[:middle], records[:middle], result)
+            await self.load_records(line_numbers[middle:], records[middle:], result)
+            return
+        except Exception as excp:
+            for line_number, record in zip(line_numbers, records):
+                self.add_error(result, line_number, record[1], f'chunk is not imported: {excp}')
+            return
+
+        result.imported += len(inserted_emails)
+        for line_number, record in zip(line_numbers, records):
+            if record[1] not in inserted_emails:
+                self.add_error(result, line_number, record[1], 'user with this email already exists')
+
+    async def insert_records(self, records: list[tuple]) -> set[str]:
+        """
+        Inserts records of IMPORT_COLUMNS in one transaction, returns emails of the inserted users.
+        """
+        columns = ', '.join(IMPORT_COLUMNS)
+        async with self.session_factory() as db:
+            conn = await db.connection()
+            await conn.execute(text(
+                f'CREATE TEMPORARY TABLE users_import (LIKE {User.__tablename__} INCLUDING DEFAULTS) ON COMMIT DROP'
+            ))
+            raw_connection = await conn.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                'users_import', records=records, columns=IMPORT_COLUMNS)
+            inserted = await conn.execute(text(
+                f'INSERT INTO {User.__tablename__} ({columns}) SELECT {columns} FROM users_import '
+                f'ON CONFLICT (email) DO NOTHING RETURNING email'
+            ))
+            inserted_emails = set(inserted.scalars())
+            await db.commit()
+        return inserted_emails
+
+
+@lru_cache()
+def get_user_importer(email_filter: EmailFilter = Depends(get_email_filter)) -> UserImporter:
+    return UserImporter(
+        session_factory=async_session,
+        email_filter=email_filter,
+        chunk_size=settings.user_import_chunk_size,
+        max_errors=settings.user_import_max_errors
+    )
@@ -0,0 +1,116 @@
+"""
+Benchmark of 'AdminRolesService.get_all_roles' against the test Postgres.
+Counts DB round trips and measures latency of the set-based implementation
+and of the previous one (a query per role plus a query per role permission).
+
+All tables of the test DB are cleaned before seeding.
+
+Usage, from the auth-service folder with the test stack up:
+    python -m src.tests.benchmarks.bench_get_all_roles --roles 1000 --permissions 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
+
+from src.models.db_entity import Base, Permission, Role, RolePermission
+from src.services.admin_roles import get_admin_roles_service
+from src.tests.functional.settings import test_base_settings as settings
+
+INSERT_CHUNK_SIZE = 10000
+
+
+class QueryCounter:
+    """
+    Counts statements sent to the DB by the engine.
+    """
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, 'before_cursor_execute', self)
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+async def seed(engine, roles_amount: int, permissions_amount: int) -> None:
+    """
+    Creates roles and permissions, every role gets every permission.
+    """
+    permission_rows = [{'id': uuid.uuid4(), 'name': f'bench.permission.{i}'} for i in range(permissions_amount)]
+    role_rows = [{'id': uuid.uuid4(), 'name': f'bench.role.{i}'} for i in range(roles_amount)]
+    role_permission_rows = [
+        {'id': uuid.uuid4(), 'role_id': role['id'], 'permission_id': permission['id']}
+        for role in role_rows for permission in permission_rows
+    ]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(table.delete())
+        await conn.execute(insert(Permission), permission_rows)
+        await conn.execute(insert(Role), role_rows)
+        for i in range(0, len(role_permission_rows), INSERT_CHUNK_SIZE):
+            await conn.execute(insert(RolePermission), role_permission_rows[i:i + INSERT_CHUNK_SIZE])
+
+
+async def get_all_roles_per_row(db: AsyncSession) -> None:
+    """
+    Previous implementation of 'get_all_roles', kept here for comparison.
+    """
+    roles = (await db.execute(select(Role))).scalars().all()
+    for role in roles:
+        statement = select(RolePermission).where(RolePermission.role_id == role.id)
+        role_permissions = (await db.execute(statement)).scalars().all()
+        for role_permission in role_permissions:
+            statement = select(Permission).where(Permission.id == role_permission.permission_id)
+            (await db.execute(statement)).scalar_one()
+
+
+async def measure(name: str, func, session_maker, counter: QueryCounter, repeat: int) -> None:
+    timings = []
+    for _ in range(repeat):
+        async with session_maker() as db:
+            counter.count = 0
+            started = time.perf_counter()
+            await func(db)
+            timings.append(time.perf_counter() - started)
+
+    print(
+        f'{name}: round trips={counter.count}, '
+        f'median={statistics.median(timings) * 1000:.1f}ms, min={min(timings) * 1000:.1f}ms'
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    dsn = f'postgresql+asyncpg://{settings.pg_user}:{settings.pg_password}@{settings.pg_host}:{settings.pg_port}/{settings.pg_db}'
+    engine = create_async_engine(dsn, echo=False, future=True)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    try:
+        await seed(engine, args.roles, args.permissions)
+        counter = QueryCounter(engine)
+        admin_roles_service = get_admin_roles_service()
+
+        await measure('set-based', admin_roles_service.get_all_roles, session_maker, counter, args.repeat)
+        if not args.skip_per_row:
+            await measure('per-row', get_all_roles_per_row, session_maker, counter, 1)
+    finally:
+        async with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                await conn.execute(table.delete())
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--roles', type=int, default=1000)
+    parser.add_argument('--permissions', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-per-row', action='store_true', help='skip the slow per-row implementation')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+"""
+Runs the benchmarks on two commits and prints the mean time of every benchmark side by side.
+The base commit is checked out into a temporary git worktree, the target is the current
+working tree unless another commit is given.
+
+Usage, from the auth-service folder:
+    python -m src.tests.benchmarks.compare HEAD~3
+    python -m src.tests.benchmarks.compare main feature-branch -k "get_tokens or refresh"
+    python -m src.tests.benchmarks.compare HEAD~3 --current-suite
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BENCHMARKS_DIR = Path('src/tests/benchmarks')
+# Local settings are not committed, but are needed to import the service modules.
+LOCAL_FILES = [Path('src/core/.env')]
+
+
+def git(*args: str, cwd: Path | None = None) -> str:
+    return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def run_benchmarks(service_dir: Path, output: Path, keyword: str | None) -> dict[str, float]:
+    """
+    Runs pytest-benchmark in the service folder and returns benchmark name -> mean seconds.
+    """
+    command = [
+        sys.executable, '-m', 'pytest', str(BENCHMARKS_DIR), '-q', '-p', 'no:logging', '-p', 'no:cacheprovider',
+        '--benchmark-only', f'--benchmark-json={output}',
+    ]
+    if keyword:
+        command += ['-k', keyword]
+    subprocess.run(command, cwd=service_dir, check=True)
+
+    report = json.loads(output.read_text())
+    return {benchmark['fullname']: benchmark['stats']['mean'] for benchmark in report['benchmarks']}
+
+
+def run_on_commit(ref: str, service_dir: Path, work_dir: Path, keyword: str | None, current_suite: bool) -> dict[str, float]:
+    repo_root = Path(git('rev-parse', '--show-toplevel', cwd=service_dir))
+    service_path = service_dir.resolve().relative_to(repo_root)
+    worktree = work_dir / ref.replace('/', '_')
+
+    git('worktree', 'add', '--detach', str(worktree), ref, cwd=service_dir)
+    try:
+        worktree_service_dir = worktree / service_path
+        for path in LOCAL_FILES:
+            if (service_dir / path).exists():
+                shutil.copy(service_dir / path, worktree_service_dir / path)
+        if current_suite:
+            # The same benchmarks against the code of both commits.
+            shutil.rmtree(worktree_service_dir / BENCHMARKS_DIR, ignore_errors=True)
+            shutil.copytree(service_dir / BENCHMARKS_DIR, worktree_service_dir / BENCHMARKS_DIR,
+                            ignore=shutil.ignore_patterns('__pycache__'))
+        return run_benchmarks(worktree_service_dir, work_dir / f'{worktree.name}.json', keyword)
+    finally:
+        git('worktree', 'remove', '--force', str(worktree), cwd=service_dir)
+
+
+def print_comparison(base_name: str, base: dict[str, float], target_name: str, target: dict[str, float]) -> None:
+    names = sorted(set(base) | set(target))
+    width = max(len(name) for name in names)
+    print(f'\n{"benchmark":<{width}}  {base_name[:12]:>12}  {target_name[:12]:>12}  {"change":>8}')
+    for name in names:
+        base_mean, target_mean = base.get(name), target.get(name)
+        base_text = f'{base_mean * 1e6:.1f}us' if base_mean else '-'
+        target_text = f'{target_mean * 1e6:.1f}us' if target_mean else '-'
+        change = f'{(target_mean / base_mean - 1) * 100:+.1f}%' if base_mean and target_mean else ''
+        print(f'{name:<{width}}  {base_text:>12}  {target_text:>12}  {change:>8}')
+
+
+def main(args: argparse.Namespace) -> None:
+    service_dir = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix='auth-benchmarks-') as work_dir:
+        work_dir = Path(work_dir)
+        base = run_on_commit(args.base, service_dir, work_dir, args.keyword, args.current_suite)
+        if args.target:
+            target = run_on_commit(args.target, service_dir, work_dir, args.keyword, args.current_suite)
+        else:
+            target = run_benchmarks(service_dir, work_dir / 'working_tree.json', args.keyword)
+
+    print_comparison(args.base, base, args.target or 'working tree', target)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base', help='commit to compare with')
+    parser.add_argument('target', nargs='?', help='commit to compare, the working tree by default')
+    parser.add_argument('-k', dest='keyword', help='pytest -k expression to select benchmarks')
+    parser.add_argument('--current-suite', action='store_true',
+                        help='run benchmarks of the working tree on both commits')
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+
+import fakeredis
+import pytest
+from jose import jwk
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
+
+from src.models.db_entity import (Base, Permission, Role, RolePermission, User,
+                                  UserRole)
+from src.services.jwt_keys import KeyRing, SigningKey
+
+BENCHMARK_SECRET = 'benchmark-secret-key'
+
+
+@pytest.fixture(name='event_loop', scope='session')
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(name='run_async')
+def run_async(event_loop):
+    def inner(coroutine_function, *args, **kwargs):
+        """
+        Runs coroutine function in the session event loop, so it can be passed to 'benchmark'.
+        """
+        return event_loop.run_until_complete(coroutine_function(*args, **kwargs))
+
+    return inner
+
+
+@pytest.fixture(name='hmac_key_ring', scope='session')
+def hmac_key_ring() -> KeyRing:
+    key = jwk.construct(BENCHMARK_SECRET, 'HS256')
+    return KeyRing(
+        SigningKey(kid='benchmark', algorithm='HS256', signing_key=key, verification_key=key,
+                   secret=BENCHMARK_SECRET.encode())
+    )
+
+
+@pytest.fixture(name='fake_redis')
+def fake_redis(event_loop):
+    """
+    In-memory Redis stand-in. Lua scripts need 'lupa' installed.
+    """
+    redis = fakeredis.FakeAsyncRedis()
+    yield redis
+    event_loop.run_until_complete(redis.aclose())
+
+
+@pytest.fixture(name='sqlite_session_maker', scope='session')
+def sqlite_session_maker(event_loop):
+    """
+    In-memory SQLite DB with the service schema, seeded with 'BENCHMARK_ROLES' roles,
+    'BENCHMARK_PERMISSIONS' permissions per role and a user having 'BENCHMARK_USER_ROLES' roles.
+    Postgres specific table options (partitioning) are ignored by SQLite.
+    """
+    engine = create_async_engine('sqlite+aiosqlite://', future=True)
+    event_loop.run_until_complete(seed(engine))
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    event_loop.run_until_complete(engine.dispose())
+
+
+BENCHMARK_USER_ID = uuid.UUID('8ab71a54-7b99-4322-a07e-0b2a0c40ff44')
+BENCHMARK_ROLES = 100
+BENCHMARK_PERMISSIONS = 20
+BENCHMARK_USER_ROLES = 5
+
+
+async def seed(engine) -> None:
+    permission_rows = [{'id': uuid.uuid4(), 'name': f'bench.permission.{i}'} for i in range(BENCHMARK_PERMISSIONS)]
+    role_rows = [{'id': uuid.uuid4(), 'name': f'bench.role.{i}'} for i in range(BENCHMARK_ROLES)]
+    role_permission_rows = [
+        {'id': uuid.uuid4(), 'role_id': role['id'], 'permission_id': permission['id']}
+        for role in role_rows for permission in permission_rows
+    ]
+    user_role_rows = [
+        {'id': uuid.uuid4(), 'user_id': BENCHMARK_USER_ID, 'role_id': role['id']}
+        for role in role_rows[:BENCHMARK_USER_ROLES]
+    ]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{
+            'id': BENCHMARK_USER_ID, 'email': 'bench@mail.com', 'hashed_password': 'not-used',
+            'is_active': True, 'is_superuser': False, 'is_verified': False,
+        }])
+        await conn.execute(insert(Permission), permission_rows)
+        await conn.execute(insert(Role), role_rows)
+        await conn.execute(insert(RolePermission), role_permission_rows)
+        await conn.execute(insert(UserRole), user_role_rows)
@@ -0,0 +1,60 @@
+"""
+Tokens/sec of JWTService with different JWT backends.
+
+Usage, from the auth-service folder:
+    pytest src/tests/benchmarks/test_jwt_backends.py --benchmark-group-by=func
+"""
+import pytest
+
+from src.services.jwt_backends import HMACBackend, JoseBackend, TokenError
+from src.services.jwt_token import JWTService
+
+USER_ID = '8ab71a54-7b99-4322-a07e-0b2a0c40ff44'
+SESSION_ID = '22bd63b2-3d33-45b7-991b-d2e37662426a'
+ROLES = [{'id': 'e3a6a3a4-7a49-4fb1-a4c8-1c6d3b1f9f2a', 'name': 'subscriber'}]
+
+BACKENDS = {
+    'jose': JoseBackend,
+    'hmac': HMACBackend,
+}
+
+
+@pytest.fixture(name='jwt_service', params=BACKENDS.keys())
+def jwt_service(request, hmac_key_ring) -> JWTService:
+    service = JWTService(cache=None, key_ring=hmac_key_ring, backend=BACKENDS[request.param]())
+    # Verification cache would hide the backend decode cost.
+    service.verified_tokens.max_size = 0
+    return service
+
+
+@pytest.mark.parametrize('encode_backend, decode_backend', [
+    ('jose', 'hmac'),
+    ('hmac', 'jose'),
+])
+def test_backends_compatibility(hmac_key_ring, encode_backend, decode_backend):
+    claims = {'user_id': USER_ID, 'roles': ROLES, 'iat': 1, 'exp': 4102444800}
+    token = BACKENDS[encode_backend]().encode(dict(claims), hmac_key_ring.active_key)
+
+    assert BACKENDS[decode_backend]().decode(token, hmac_key_ring) == claims
+
+
+@pytest.mark.parametrize('backend', BACKENDS.keys())
+def test_backends_reject_tampered_token(hmac_key_ring, backend):
+    token = BACKENDS[backend]().encode({'user_id': USER_ID, 'exp': 4102444800}, hmac_key_ring.active_key)
+    header, payload, signature = token.split('.')
+    tampered_token = '.'.join([header, payload, signature[:-2] + ('AA' if signature[-2:] != 'AA' else 'BB')])
+
+    with pytest.raises(TokenError):
+        BACKENDS[backend]().decode(tampered_token, hmac_key_ring)
+
+
+def test_get_token_pair(benchmark, run_async, jwt_service):
+    benchmark(run_async, jwt_service.get_token_pair, user_id=USER_ID, session_id=SESSION_ID, roles=ROLES)
+
+
+def test_verify_token(benchmark, run_async, jwt_service):
+    access_token, _ = run_async(jwt_service.get_token_pair, user_id=USER_ID, session_id=SESSION_ID, roles=ROLES)
+
+    payload = benchmark(run_async, jwt_service.verify_token, access_token)
+
+    assert payload['user_id'] == USER_ID
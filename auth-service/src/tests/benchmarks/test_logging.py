@@ -0,0 +1,161 @@
+"""
+Login endpoint throughput with different logging pipelines. Requests go through the login handler
+with its dependencies on in-memory stand-ins: fakeredis for Redis, SQLite for Postgres and a cheap
+password hash, so the hashing cost does not hide the logging cost. The login rate limiter is disabled,
+all the requests come from one IP address.
+Records are written to os.devnull, so the numbers show the cost of the pipeline itself.
+Pytest log capturing must be disabled, otherwise it formats every record in all the cases.
+
+Usage, from the auth-service folder:
+    pytest src/tests/benchmarks/test_logging.py -p no:logging --benchmark-group-by=func
+"""
+import logging
+import os
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import insert, select
+
+from src.api.v1 import authentication
+from src.core.api_settings import settings
+from src.core.logger import JSONFormatter, Redacted, move_handlers_to_queue
+from src.db.postgres import get_pg_session
+from src.models.db_entity import User, UserRole
+from src.services import hashing
+from src.services.authentication import (AuthenticationService,
+                                         get_authentication_service)
+from src.services.email_filter import EmailFilter
+from src.services.hashing import PasswordHasher
+from src.services.jwt_backends import HMACBackend
+from src.services.jwt_token import JWTService
+from src.services.login_history import LoginHistoryWriter
+from src.services.rbac import RBACService
+from src.services.redis import RedisService
+from src.tests.benchmarks.conftest import BENCHMARK_USER_ID
+
+USER_ID = '8ab71a54-7b99-4322-a07e-0b2a0c40ff44'
+SESSION_ID = '22bd63b2-3d33-45b7-991b-d2e37662426a'
+LOGIN_USER_ID = uuid.UUID('5c3e1f0a-2b4d-4e6f-8a9b-0c1d2e3f4a5b')
+LOGIN_EMAIL = 'login-bench@mail.com'
+LOGIN_PASSWORD = 'benchmark-password'
+# One iteration, the benchmark measures the handler and not the KDF.
+LOGIN_HASH_METHOD = 'pbkdf2:sha256:1'
+
+PIPELINES = ['disabled', 'sync', 'sync_json', 'queue', 'queue_json']
+
+
+@pytest.fixture(name='root_logger', params=PIPELINES)
+def root_logger(request):
+    """
+    Replaces handlers of the root logger with the pipeline writing to os.devnull.
+    """
+    logger = logging.getLogger()
+    saved_handlers, saved_level = logger.handlers, logger.level
+
+    devnull = open(os.devnull, 'w')
+    handler = logging.StreamHandler(devnull)
+    if request.param.endswith('json'):
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(settings.log_format))
+    logger.handlers = [handler]
+    logger.setLevel(logging.WARNING if request.param == 'disabled' else logging.DEBUG)
+
+    listener = move_handlers_to_queue(logger) if request.param.startswith('queue') else None
+
+    yield logger
+
+    if listener is not None:
+        listener.stop()
+    logger.handlers, logger.level = saved_handlers, saved_level
+    devnull.close()
+
+
+class DiscardingWriter(LoginHistoryWriter):
+    """
+    Login history writer which is not started, so rows are passed to 'write_batch' inline and discarded.
+    """
+
+    async def write_batch(self, rows: list[dict]) -> None:
+        pass
+
+
+@pytest.fixture(name='login_user', scope='module')
+def login_user(event_loop, sqlite_session_maker) -> None:
+    """
+    Adds a user with the roles of the benchmark user and a cheap password hash.
+    """
+    async def add_user():
+        async with sqlite_session_maker() as db:
+            await db.execute(insert(User), [{
+                'id': LOGIN_USER_ID, 'email': LOGIN_EMAIL,
+                'hashed_password': hashing.generate_hash(LOGIN_PASSWORD, LOGIN_HASH_METHOD),
+                'is_active': True, 'is_superuser': False, 'is_verified': False,
+            }])
+            role_ids = (await db.execute(select(UserRole.role_id).where(UserRole.user_id == BENCHMARK_USER_ID))).scalars()
+            await db.execute(insert(UserRole), [
+                {'id': uuid.uuid4(), 'user_id': LOGIN_USER_ID, 'role_id': role_id} for role_id in role_ids
+            ])
+            await db.commit()
+
+    event_loop.run_until_complete(add_user())
+
+
+@pytest.fixture(name='login_client')
+def login_client(monkeypatch, event_loop, fake_redis, hmac_key_ring, sqlite_session_maker, login_user):
+    """
+    HTTP client of an app with the authentication router and its dependencies on in-memory stand-ins.
+    """
+    password_hasher = PasswordHasher(method=LOGIN_HASH_METHOD, executor_type='thread', max_workers=1)
+    monkeypatch.setattr(hashing, 'password_hasher', password_hasher)
+    monkeypatch.setattr('src.services.authentication.password_hasher', password_hasher)
+    monkeypatch.setattr(settings, 'login_rate_limit_enabled', False)
+
+    authentication_service = AuthenticationService(
+        cache=fake_redis,
+        redis_service=RedisService(fake_redis),
+        jwt_service=JWTService(cache=fake_redis, key_ring=hmac_key_ring, backend=HMACBackend()),
+        rbac_service=RBACService(poll_interval=60),
+        login_history_writer=DiscardingWriter(
+            session_factory=None, max_queue_size=1, batch_size=1, flush_interval=1
+        ),
+        email_filter=EmailFilter(None, mode='off', capacity=1, error_rate=0.01, max_age=300)
+    )
+
+    async def get_session():
+        async with sqlite_session_maker() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(authentication.router, prefix='/api/v1')
+    app.dependency_overrides[get_pg_session] = get_session
+    app.dependency_overrides[get_authentication_service] = lambda: authentication_service
+    app.dependency_overrides[authentication.get_login_rate_limiter] = lambda: None
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench')
+    yield client
+    event_loop.run_until_complete(client.aclose())
+    password_hasher.shutdown()
+
+
+def test_redacted_masks_sensitive_keys():
+    payload = {'user_id': USER_ID, 'session_id': SESSION_ID, 'roles': [{'token': 'secret', 'name': 'admin'}]}
+
+    assert str(Redacted(payload)) == str(
+        {'user_id': USER_ID, 'session_id': '***', 'roles': [{'token': '***', 'name': 'admin'}]}
+    )
+    # The payload itself is not changed.
+    assert payload['session_id'] == SESSION_ID
+
+
+def test_login_logging(benchmark, run_async, login_client, root_logger):
+    response = benchmark(
+        run_async, login_client.post, '/api/v1/login',
+        data={'username': LOGIN_EMAIL, 'password': LOGIN_PASSWORD},
+        headers={'user-agent': 'benchmark'}
+    )
+
+    assert response.status_code == 200
+    assert response.cookies
@@ -0,0 +1,79 @@
+"""
+Service layer hot paths against in-memory stand-ins: fakeredis for Redis, SQLite for Postgres.
+Absolute numbers differ from production, use them to compare implementations
+(see compare.py to compare two commits).
+
+Usage, from the auth-service folder:
+    pytest src/tests/benchmarks/test_service_layer.py -p no:logging --benchmark-group-by=func
+"""
+import pytest
+
+from src.services.admin_roles import AdminRolesService
+from src.services.authentication import AuthenticationService
+from src.services.base import BaseService
+from src.services.jwt_backends import HMACBackend
+from src.services.jwt_token import JWTService
+from src.services.rbac import RBACService
+from src.services.redis import RedisService
+from src.tests.benchmarks.conftest import (BENCHMARK_ROLES,
+                                           BENCHMARK_USER_ID,
+                                           BENCHMARK_USER_ROLES)
+
+USER_ID = str(BENCHMARK_USER_ID)
+ROLES = [{'id': 'e3a6a3a4-7a49-4fb1-a4c8-1c6d3b1f9f2a', 'name': 'subscriber'}]
+
+
+@pytest.fixture(name='authentication_service')
+def authentication_service(fake_redis, hmac_key_ring) -> AuthenticationService:
+    jwt_service = JWTService(cache=fake_redis, key_ring=hmac_key_ring, backend=HMACBackend())
+    return AuthenticationService(
+        cache=fake_redis,
+        redis_service=RedisService(fake_redis),
+        jwt_service=jwt_service,
+        rbac_service=RBACService(poll_interval=60),
+        login_history_writer=None,
+        email_filter=None
+    )
+
+
+def test_get_tokens(benchmark, run_async, authentication_service):
+    access_token, refresh_token = benchmark(
+        run_async, authentication_service.get_tokens, user_id=USER_ID, user_roles=ROLES)
+
+    assert access_token and refresh_token
+
+
+def test_refresh_tokens(benchmark, run_async, authentication_service):
+    _, refresh_token = run_async(authentication_service.get_tokens, user_id=USER_ID, user_roles=ROLES)
+    state = {'refresh_token': refresh_token}
+
+    async def refresh():
+        # Every refresh token can be used once, so the next round uses the new one.
+        payload = await authentication_service.jwt_service.verify_token(state['refresh_token'])
+        _, state['refresh_token'] = await authentication_service.refresh_tokens(payload)
+
+    benchmark(run_async, refresh)
+
+    assert state['refresh_token'] is not None
+
+
+def test_get_user_roles(benchmark, run_async, sqlite_session_maker):
+    async def get_user_roles():
+        async with sqlite_session_maker() as db:
+            return await BaseService.get_user_roles(db, BENCHMARK_USER_ID)
+
+    roles = benchmark(run_async, get_user_roles)
+
+    assert len(roles) == BENCHMARK_USER_ROLES
+
+
+def test_get_all_roles(benchmark, run_async, sqlite_session_maker):
+    admin_roles_service = AdminRolesService(rbac_service=None)
+
+    async def get_all_roles():
+        async with sqlite_session_maker() as db:
+            return await admin_roles_service.get_all_roles(db)
+
+    roles = benchmark(run_async, get_all_roles)
+
+    assert len(roles.data) == BENCHMARK_ROLES
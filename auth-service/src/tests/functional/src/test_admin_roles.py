@@ -6,7 +6,8 @@ from src.models.db_entity import Permission, Role, RolePermission, User
 from src.tests.functional.fixtures.client_fixtures import (
     api_make_get_request, api_post)
 from src.tests.functional.testdata.jwt_tokens import JWTtokens
-from src.tests.functional.testdata.pg_db_data_input import su_user_data
+from src.tests.functional.testdata.pg_db_data_input import (su_user_data,
+                                                           user_login_data)
 
 # All test coroutines will be treated as marked.
 pytestmark = pytest.mark.asyncio
@@ -124,3 +125,36 @@ async def test_get_roles(
         assert body['data'][0]['name'] == role_name
     finally:
         await pg_clear_tables_data()
+
+
+@pytest.mark.parametrize('user_data_fixture, expected_granted', [
+    ('su_user_data', True),
+    ('user_login_data', False),
+])
+async def test_check_permission(
+        request,
+        pg_insert_table_data,
+        pg_clear_tables_data,
+        api_make_get_request,
+        user_data_fixture,
+        expected_granted):
+
+    await pg_clear_tables_data()
+    jwt = JWTtokens()
+
+    try:
+        data = await request.getfixturevalue(user_data_fixture)()
+        await pg_insert_table_data(table_name=User, data=data)
+        access_token, refresh_token = await jwt.get_token_pair(
+            user_id=data.get('id'),
+            session_id='22bd63b2-3d33-45b7-991b-d2e37662426a'
+        )
+        status, body = await api_make_get_request(
+            endpoint='/api/v1/permissions/permission.ABC/check',
+            headers={'cookie': f'auth-app-access-key={access_token}'}
+        )
+
+        assert status == HTTPStatus.OK
+        assert body['granted'] is expected_granted
+    finally:
+        await pg_clear_tables_data()
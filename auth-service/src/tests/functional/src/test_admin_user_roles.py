@@ -0,0 +1,98 @@
+from http import HTTPStatus
+
+import pytest
+
+from src.models.db_entity import Role, User, UserRole
+from src.tests.functional.fixtures.client_fixtures import api_post
+from src.tests.functional.testdata.jwt_tokens import JWTtokens
+from src.tests.functional.testdata.pg_db_data_input import (su_user_data,
+                                                           user_login_data)
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+ROLE_ID = '0c5f0d3e-6a52-4bd2-9b7c-3f1a2d4e5f61'
+OTHER_ROLE_ID = '7d2e4f6a-8b9c-4d1e-a2f3-b4c5d6e7f809'
+UNKNOWN_ID = 'f0e1d2c3-b4a5-4968-8776-655443322110'
+
+
+async def prepare_users_and_roles(pg_insert_table_data, su_user_data, user_login_data) -> tuple[str, str]:
+    """
+    Inserts a superuser, a user with the ROLE_ID role and both roles, returns the access token and the user id.
+    """
+    su_user = await su_user_data()
+    user = await user_login_data()
+    await pg_insert_table_data(table_name=User, data=su_user)
+    await pg_insert_table_data(table_name=User, data=user)
+    await pg_insert_table_data(table_name=Role, data={'id': ROLE_ID, 'name': 'role.assigned'})
+    await pg_insert_table_data(table_name=Role, data={'id': OTHER_ROLE_ID, 'name': 'role.other'})
+    await pg_insert_table_data(table_name=UserRole, data={'user_id': user['id'], 'role_id': ROLE_ID})
+
+    access_token, _ = await JWTtokens().get_token_pair(
+        user_id=su_user.get('id'),
+        session_id='22bd63b2-3d33-45b7-991b-d2e37662426a'
+    )
+    return access_token, user['id']
+
+
+async def test_assign_roles_to_users(
+        pg_clear_tables_data,
+        pg_insert_table_data,
+        su_user_data,
+        user_login_data,
+        api_post):
+
+    await pg_clear_tables_data()
+
+    try:
+        access_token, user_id = await prepare_users_and_roles(pg_insert_table_data, su_user_data, user_login_data)
+        headers = {'cookie': f'auth-app-access-key={access_token}'}
+        batch = {'user_ids': [user_id, UNKNOWN_ID], 'role_ids': [ROLE_ID, OTHER_ROLE_ID, UNKNOWN_ID]}
+
+        status, body, _ = await api_post(body=batch, endpoint='/api/v1/admin/users/roles/assign', headers=headers)
+
+        assert status == HTTPStatus.OK
+        # The already assigned role is skipped by ON CONFLICT DO NOTHING.
+        assert body['changed'] == {OTHER_ROLE_ID: [user_id]}
+        assert body['changed_count'] == 1
+        assert body['unknown_user_ids'] == [UNKNOWN_ID]
+        assert body['unknown_role_ids'] == [UNKNOWN_ID]
+
+        status, body, _ = await api_post(body=batch, endpoint='/api/v1/admin/users/roles/assign', headers=headers)
+
+        assert status == HTTPStatus.OK
+        assert body['changed'] == {}
+        assert body['changed_count'] == 0
+    finally:
+        await pg_clear_tables_data()
+
+
+async def test_revoke_roles_from_users(
+        pg_clear_tables_data,
+        pg_insert_table_data,
+        su_user_data,
+        user_login_data,
+        api_post):
+
+    await pg_clear_tables_data()
+
+    try:
+        access_token, user_id = await prepare_users_and_roles(pg_insert_table_data, su_user_data, user_login_data)
+        headers = {'cookie': f'auth-app-access-key={access_token}'}
+        batch = {'user_ids': [user_id], 'role_ids': [ROLE_ID, OTHER_ROLE_ID, UNKNOWN_ID]}
+
+        status, body, _ = await api_post(body=batch, endpoint='/api/v1/admin/users/roles/revoke', headers=headers)
+
+        assert status == HTTPStatus.OK
+        # Only the assigned role is removed.
+        assert body['changed'] == {ROLE_ID: [user_id]}
+        assert body['changed_count'] == 1
+        assert body['unknown_user_ids'] == []
+        assert body['unknown_role_ids'] == [UNKNOWN_ID]
+
+        status, body, _ = await api_post(body=batch, endpoint='/api/v1/admin/users/roles/revoke', headers=headers)
+
+        assert status == HTTPStatus.OK
+        assert body['changed_count'] == 0
+    finally:
+        await pg_clear_tables_data()
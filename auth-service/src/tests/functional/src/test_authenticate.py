@@ -1,3 +1,4 @@
+import asyncio
 from http import HTTPStatus
 
 import pytest
@@ -188,3 +189,64 @@ async def test_token_refresh_endpoint_access(
         )
 
     assert status == expected_status
+
+
+async def test_token_refresh_concurrent_rotation(
+        redis_client,
+        prepare_jwt_tokens,
+        prepare_cookies,
+        api_make_post_request):
+    """
+    Test for /api/v1/token-refresh endpoint.
+    Sending the same refresh token in parallel requests,
+    only one of them must get a new token pair.
+    """
+    parallel_requests = 20
+
+    access_token, refresh_token = await prepare_jwt_tokens({})
+    cookies = await prepare_cookies(access_token, refresh_token)
+    # Whitelisting refresh token session the same way the service does on login.
+    await redis_client.setex(
+        name='8ab71a54-7b99-4322-a07e-0b2a0c40ff44:22bd63b2-3d33-45b7-991b-d2e37662426a',
+        time=600,
+        value='rt'
+    )
+
+    results = await asyncio.gather(*[
+        api_make_post_request(query_data={}, endpoint='/api/v1/token-refresh', headers=cookies)
+        for _ in range(parallel_requests)
+    ])
+    statuses = [status for status, _, _ in results]
+
+    assert statuses.count(HTTPStatus.OK) == 1
+    assert statuses.count(HTTPStatus.UNAUTHORIZED) == parallel_requests - 1
+
+
+async def test_logout_all_endpoint(
+        redis_client,
+        prepare_jwt_tokens,
+        prepare_cookies,
+        api_make_post_request):
+    """
+    Test for /api/v1/logout-all endpoint.
+    All the refresh token sessions of the user must be revoked.
+    """
+    user_id = '8ab71a54-7b99-4322-a07e-0b2a0c40ff44'
+    session_ids = ['22bd63b2-3d33-45b7-991b-d2e37662426a', '5d1f0e7c-6a3b-4c2e-9f3a-1b2c3d4e5f60']
+
+    access_token, refresh_token = await prepare_jwt_tokens({})
+    cookies = await prepare_cookies(access_token, refresh_token)
+    for session_id in session_ids:
+        await redis_client.setex(name=f'{user_id}:{session_id}', time=600, value='rt')
+        await redis_client.zadd(f'sessions:{user_id}', {session_id: 9999999999})
+
+    status, _, _ = await api_make_post_request(query_data={}, endpoint='/api/v1/logout-all', headers=cookies)
+
+    assert status == HTTPStatus.NO_CONTENT
+    for session_id in session_ids:
+        assert await redis_client.get(f'{user_id}:{session_id}') is None
+    assert await redis_client.exists(f'sessions:{user_id}') == 0
+
+    status, _, _ = await api_make_post_request(query_data={}, endpoint='/api/v1/token-refresh', headers=cookies)
+
+    assert status == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,82 @@
+import gzip
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from src.db.partitions import (create_partitions, drop_old_partitions,
+                               get_partitions)
+from src.tests.functional.fixtures.pg_fixtures import engine
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+TABLE = 'partitions_test'
+NOW = datetime(2024, 5, 15)
+
+
+@pytest_asyncio.fixture(name='partitioned_table')
+async def partitioned_table():
+    async with engine.begin() as conn:
+        await conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+        await conn.execute(text(
+            f'CREATE TABLE {TABLE} (id int NOT NULL, ts timestamp NOT NULL, PRIMARY KEY (id, ts)) '
+            f'PARTITION BY RANGE (ts)'
+        ))
+    yield TABLE
+    async with engine.begin() as conn:
+        await conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+
+
+async def count_rows(table: str) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(text(f'SELECT count(*) FROM "{table}"'))).scalar_one()
+
+
+async def test_create_partitions(partitioned_table):
+    async with engine.begin() as conn:
+        created = await create_partitions(conn, partitioned_table, months_ahead=2, now=NOW)
+        assert created == [f'{TABLE}_y2024m05', f'{TABLE}_y2024m06', f'{TABLE}_y2024m07']
+        assert await create_partitions(conn, partitioned_table, months_ahead=2, now=NOW) == []
+
+
+async def test_rows_without_partition_go_to_default_and_are_moved(partitioned_table):
+    async with engine.begin() as conn:
+        await create_partitions(conn, partitioned_table, months_ahead=0, now=NOW)
+    async with engine.begin() as conn:
+        # The partition of August has not been created in time.
+        await conn.execute(text(f"INSERT INTO {TABLE} VALUES (1, '2024-05-20'), (2, '2024-08-01'), (3, '2024-08-31')"))
+    assert await count_rows(f'{TABLE}_default') == 2
+
+    async with engine.begin() as conn:
+        created = await create_partitions(conn, partitioned_table, months_ahead=0, now=datetime(2024, 9, 1))
+
+    assert created == [f'{TABLE}_y2024m08', f'{TABLE}_y2024m09']
+    assert await count_rows(f'{TABLE}_default') == 0
+    assert await count_rows(f'{TABLE}_y2024m08') == 2
+    assert await count_rows(TABLE) == 3
+
+
+async def test_drop_old_partitions(partitioned_table, tmp_path):
+    async with engine.begin() as conn:
+        await create_partitions(conn, partitioned_table, months_ahead=0, now=datetime(2024, 1, 1))
+        await create_partitions(conn, partitioned_table, months_ahead=0, now=datetime(2024, 2, 1))
+        await create_partitions(conn, partitioned_table, months_ahead=0, now=NOW)
+        await conn.execute(text(f"INSERT INTO {TABLE} VALUES (1, '2024-01-10'), (2, '2024-02-10'), (3, '2024-05-10')"))
+
+    detached = []
+
+    async def before_detach(conn, name):
+        detached.append((name, (await conn.execute(text(f'SELECT count(*) FROM "{name}"'))).scalar_one()))
+
+    dropped = await drop_old_partitions(
+        engine, partitioned_table, retention_months=3, archive_dir=tmp_path, before_detach=before_detach, now=NOW)
+
+    assert dropped == [f'{TABLE}_y2024m01']
+    assert detached == [(f'{TABLE}_y2024m01', 1)]
+    with gzip.open(tmp_path / f'{TABLE}_y2024m01.csv.gz', 'rt') as archive:
+        assert archive.read().splitlines() == ['id,ts', '1,2024-01-10 00:00:00']
+    async with engine.connect() as conn:
+        assert set(await get_partitions(conn, partitioned_table)) == {f'{TABLE}_y2024m02', f'{TABLE}_y2024m05'}
+    assert await count_rows(TABLE) == 2
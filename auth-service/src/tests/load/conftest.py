@@ -0,0 +1,28 @@
+import asyncio
+from pathlib import Path
+
+import pytest_asyncio
+
+pytest_plugins = [
+    "src.tests.functional.fixtures.client_fixtures",
+    "src.tests.functional.fixtures.pg_fixtures",
+]
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+RESULTS_PATH = Path(__file__).parent / 'results' / 'latest.json'
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('load', 'load tests')
+    group.addoption('--load-duration', type=float, default=30, help='seconds every scenario runs')
+    group.addoption('--load-concurrency', type=int, default=20, help='concurrent virtual users')
+    group.addoption('--load-tolerance', type=float, default=0.2,
+                    help='allowed relative degradation against the baseline')
+    group.addoption('--update-baseline', action='store_true', help='store results as the new baseline')
+
+
+@pytest_asyncio.fixture(scope='session')
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
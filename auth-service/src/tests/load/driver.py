@@ -0,0 +1,119 @@
+"""
+Minimal asyncio load driver: runs a scenario step in concurrent workers
+for a fixed time and collects latencies of every step.
+"""
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Awaitable, Callable
+
+# A step gets the worker state, sends one request and returns its HTTP status.
+Step = Callable[[dict], Awaitable[int]]
+
+
+@dataclass
+class LoadResult:
+    scenario: str
+    concurrency: int
+    duration_sec: float
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    def __str__(self) -> str:
+        return (f'{self.scenario}: {self.requests} requests, {self.errors} errors, {self.rps:.1f} rps, '
+                f'p50 {self.p50_ms:.1f} ms, p95 {self.p95_ms:.1f} ms, p99 {self.p99_ms:.1f} ms')
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(percent / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def run_load(
+        scenario: str,
+        step: Step,
+        concurrency: int,
+        duration_sec: float,
+        setup: Callable[[dict], Awaitable[None]] | None = None,
+        expected_status: int = 200) -> LoadResult:
+    """
+    Runs 'step' in 'concurrency' workers for 'duration_sec' seconds.
+    'setup' prepares the worker state (e.g. logs in) and is not measured.
+    """
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker(state: dict) -> None:
+        nonlocal errors
+        deadline = time.monotonic() + duration_sec
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await step(state)
+            except Exception:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            if status != expected_status:
+                errors += 1
+
+    states = [{'worker': index} for index in range(concurrency)]
+    if setup is not None:
+        await asyncio.gather(*[setup(state) for state in states])
+
+    started = time.monotonic()
+    await asyncio.gather(*[worker(state) for state in states])
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return LoadResult(
+        scenario=scenario,
+        concurrency=concurrency,
+        duration_sec=round(elapsed, 2),
+        requests=len(latencies),
+        errors=errors,
+        rps=round(len(latencies) / elapsed, 1),
+        p50_ms=round(statistics.median(latencies) * 1000, 2) if latencies else 0.0,
+        p95_ms=round(percentile(latencies, 95) * 1000, 2),
+        p99_ms=round(percentile(latencies, 99) * 1000, 2),
+    )
+
+
+def load_baseline(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_result(path: Path, result: LoadResult) -> None:
+    """
+    Stores the result in a JSON file with results of other scenarios.
+    """
+    results = load_baseline(path)
+    results[result.scenario] = asdict(result)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True))
+
+
+def find_regressions(result: LoadResult, baseline: dict | None, tolerance: float) -> list[str]:
+    """
+    Compares the result with the baseline of the scenario measured with the same concurrency.
+    """
+    if not baseline or baseline['concurrency'] != result.concurrency:
+        return []
+
+    regressions = []
+    for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+        if getattr(result, metric) > baseline[metric] * (1 + tolerance):
+            regressions.append(f'{metric} {getattr(result, metric)} > baseline {baseline[metric]}')
+    if result.rps < baseline['rps'] * (1 - tolerance):
+        regressions.append(f'rps {result.rps} < baseline {baseline["rps"]}')
+    return regressions
@@ -0,0 +1,123 @@
+"""
+Load tests of the hot endpoints against a running stack (docker-compose.tests.yml).
+Every scenario seeds the DB with the functional tests data, runs for --load-duration
+seconds in --load-concurrency workers and reports RPS and p50/p95/p99 latency.
+
+Results are written to src/tests/load/results/latest.json. With --update-baseline they
+are stored in src/tests/load/baseline.json, which is committed. Every run is compared
+with the baseline measured at the same concurrency and fails on a regression above --load-tolerance.
+
+Usage, from the auth-service folder with the stack up:
+    pytest src/tests/load -s -p no:logging --load-duration 30 --load-concurrency 20
+"""
+import aiohttp
+import pytest
+
+from src.tests.functional.fixtures.pg_fixtures import (User,
+                                                       pg_clear_tables_data,
+                                                       pg_insert_table_data)
+from src.tests.functional.settings import test_base_settings
+from src.tests.functional.testdata.pg_db_data_input import (  # noqa: F401
+    su_user_data, user_login_data)
+from src.tests.load.conftest import BASELINE_PATH, RESULTS_PATH
+from src.tests.load.driver import (find_regressions, load_baseline, run_load,
+                                   save_result)
+
+pytestmark = pytest.mark.asyncio
+
+BASE_URL = f'http://{test_base_settings.service_host}:{test_base_settings.service_port}/api/v1'
+PASSWORD = '123qwe'
+
+
+async def login(state: dict, email: str) -> int:
+    """
+    Logs in with a worker own cookie jar, so token cookies are not shared between workers.
+    """
+    if 'session' not in state:
+        # Unsafe jar accepts cookies of IP hosts like 0.0.0.0.
+        state['session'] = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+    async with state['session'].post(f'{BASE_URL}/login', data={'username': email, 'password': PASSWORD}) as response:
+        await response.read()
+        return response.status
+
+
+async def refresh(state: dict) -> int:
+    async with state['session'].post(f'{BASE_URL}/token-refresh') as response:
+        await response.read()
+        return response.status
+
+
+async def get(state: dict, endpoint: str) -> int:
+    async with state['session'].get(f'{BASE_URL}{endpoint}') as response:
+        await response.read()
+        return response.status
+
+
+async def logged_in(state: dict, email: str) -> None:
+    status = await login(state, email)
+    assert status == 200, f'Unable to log in as {email}: {status}'
+
+
+SCENARIOS = {
+    'login': {
+        'step': lambda state: login(state, 'admin@mail.com'),
+    },
+    'token_refresh': {
+        'setup': lambda state: logged_in(state, 'admin@mail.com'),
+        'step': refresh,
+    },
+    'account_info': {
+        'setup': lambda state: logged_in(state, 'admin@mail.com'),
+        'step': lambda state: get(state, '/account/8ab71a54-7b99-4322-a07e-0b2a0c40ff44'),
+    },
+    'admin_roles': {
+        'setup': lambda state: logged_in(state, 'su_user@mail.com'),
+        'step': lambda state: get(state, '/admin/roles'),
+    },
+}
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS.keys())
+async def test_load(
+        request,
+        pg_clear_tables_data,
+        pg_insert_table_data,
+        user_login_data,
+        su_user_data,
+        scenario):
+    options = request.config.option
+    await pg_clear_tables_data()
+    await pg_insert_table_data(table_name=User, data=await user_login_data())
+    await pg_insert_table_data(table_name=User, data=await su_user_data())
+
+    states = []
+
+    async def setup(state: dict) -> None:
+        states.append(state)
+        if 'setup' in SCENARIOS[scenario]:
+            await SCENARIOS[scenario]['setup'](state)
+
+    try:
+        result = await run_load(
+            scenario,
+            step=SCENARIOS[scenario]['step'],
+            concurrency=options.load_concurrency,
+            duration_sec=options.load_duration,
+            setup=setup,
+        )
+    finally:
+        for state in states:
+            if 'session' in state:
+                await state['session'].close()
+        await pg_clear_tables_data()
+
+    print(f'\n{result}')
+    save_result(RESULTS_PATH, result)
+
+    if options.update_baseline:
+        save_result(BASELINE_PATH, result)
+        return
+
+    assert result.errors == 0, f'{result.errors} failed requests'
+    regressions = find_regressions(result, load_baseline(BASELINE_PATH).get(scenario), options.load_tolerance)
+    assert not regressions, f'{scenario} regressed: {", ".join(regressions)}'
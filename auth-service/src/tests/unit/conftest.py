@@ -0,0 +1,42 @@
+import asyncio
+
+import fakeredis
+import pytest
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
+
+from src.models.db_entity import Base
+
+
+@pytest.fixture(name='event_loop', scope='session')
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(name='fake_redis')
+def fake_redis(event_loop):
+    """
+    In-memory Redis stand-in. Lua scripts need 'lupa' installed.
+    """
+    redis = fakeredis.FakeAsyncRedis()
+    yield redis
+    event_loop.run_until_complete(redis.aclose())
+
+
+@pytest.fixture(name='sqlite_session_maker')
+def sqlite_session_maker(event_loop):
+    """
+    Empty in-memory SQLite DB with the service schema.
+    Postgres specific table options (partitioning) are ignored by SQLite.
+    """
+    engine = create_async_engine('sqlite+aiosqlite://', future=True)
+    event_loop.run_until_complete(create_schema(engine))
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    event_loop.run_until_complete(engine.dispose())
+
+
+async def create_schema(engine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
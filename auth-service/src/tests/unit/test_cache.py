@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import helper
+from src.services.helper import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def clock(monkeypatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr(helper, 'time', SimpleNamespace(monotonic=fake_clock))
+    return fake_clock
+
+
+def test_lru_cache_evicts_least_recently_used(clock):
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1, expire=10)
+    cache.set('b', 2, expire=10)
+    # Reading 'a' makes 'b' the least recently used entry.
+    assert cache.get('a') == 1
+
+    cache.set('c', 3, expire=10)
+
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_lru_cache_overwrite_does_not_evict(clock):
+    cache = LRUCache(max_size=2)
+    cache.set('a', 1, expire=10)
+    cache.set('b', 2, expire=10)
+    cache.set('a', 3, expire=10)
+
+    assert len(cache) == 2
+    assert cache.get('a') == 3
+    assert cache.get('b') == 2
+
+
+def test_lru_cache_expires_entries(clock):
+    cache = LRUCache(max_size=10)
+    cache.set('short', 1, expire=5)
+    cache.set('long', 2, expire=60)
+
+    clock.now += 4.9
+    assert cache.get('short') == 1
+
+    clock.now += 0.1
+    assert cache.get('short') is None
+    assert cache.get('long') == 2
+    # Expired entries are dropped on read.
+    assert len(cache) == 1
+
+
+def test_lru_cache_overwrite_resets_expiration(clock):
+    cache = LRUCache(max_size=10)
+    cache.set('a', 1, expire=5)
+    clock.now += 4
+    cache.set('a', 2, expire=5)
+    clock.now += 4
+
+    assert cache.get('a') == 2
+
+
+@pytest.mark.parametrize('max_size, expire', [(0, 10), (10, 0), (10, -1)])
+def test_lru_cache_disabled(clock, max_size, expire):
+    cache = LRUCache(max_size=max_size)
+    cache.set('a', 1, expire=expire)
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_lru_cache_delete_and_clear(clock):
+    cache = LRUCache(max_size=10)
+    cache.set('a', 1, expire=10)
+    cache.set('b', 2, expire=10)
+
+    cache.delete('a')
+    cache.delete('missing')
+    assert cache.get('a') is None
+    assert len(cache) == 1
+
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,43 @@
+import ipaddress
+
+import pytest
+from starlette.requests import Request
+
+from src.api.v1 import authentication
+from src.api.v1.authentication import get_client_ip
+
+PROXY = '172.18.0.5'
+
+
+def make_request(peer: str, headers: dict | None = None) -> Request:
+    return Request({
+        'type': 'http',
+        'client': (peer, 54321),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+@pytest.fixture(autouse=True)
+def trusted_proxies(monkeypatch):
+    monkeypatch.setattr(authentication, 'TRUSTED_PROXIES', [ipaddress.ip_network('172.16.0.0/12')])
+
+
+@pytest.mark.parametrize('peer, headers, client_ip', [
+    # Direct connection, the headers are set by the client and ignored.
+    ('203.0.113.10', {}, '203.0.113.10'),
+    ('203.0.113.10', {'X-Forwarded-For': '198.51.100.1', 'X-Real-IP': '198.51.100.1'}, '203.0.113.10'),
+    # Behind the proxy.
+    (PROXY, {'X-Forwarded-For': '203.0.113.10'}, '203.0.113.10'),
+    (PROXY, {'X-Real-IP': '203.0.113.10'}, '203.0.113.10'),
+    # The client has sent its own X-Forwarded-For, the proxy appended the real address.
+    (PROXY, {'X-Forwarded-For': '198.51.100.1, 203.0.113.10'}, '203.0.113.10'),
+    # Chain of trusted proxies.
+    (PROXY, {'X-Forwarded-For': '203.0.113.10, 172.18.0.7'}, '203.0.113.10'),
+    (PROXY, {'X-Forwarded-For': '172.18.0.9, 172.18.0.7'}, '172.18.0.9'),
+    # Garbage in the headers.
+    (PROXY, {'X-Forwarded-For': 'unknown'}, PROXY),
+    (PROXY, {'X-Real-IP': 'unknown'}, PROXY),
+    (PROXY, {}, PROXY),
+])
+def test_get_client_ip(peer, headers, client_ip):
+    assert get_client_ip(make_request(peer, headers)) == client_ip
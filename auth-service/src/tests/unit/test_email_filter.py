@@ -0,0 +1,174 @@
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from src.db import redis_db
+from src.models.db_entity import User
+from src.services import email_filter as email_filter_module
+from src.services.email_filter import BloomFilter, EmailFilter
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name='clock')
+def clock(monkeypatch) -> FakeClock:
+    fake_clock = FakeClock()
+    monkeypatch.setattr(email_filter_module, 'time', fake_clock)
+    return fake_clock
+
+
+@pytest.fixture(name='redis')
+def redis(monkeypatch, fake_redis):
+    monkeypatch.setattr(redis_db, 'redis', fake_redis)
+    return fake_redis
+
+
+async def insert_users(session_maker, *emails: str) -> None:
+    async with session_maker() as db:
+        await db.execute(insert(User), [
+            {'id': uuid.uuid4(), 'email': email, 'hashed_password': 'not-used',
+             'is_active': True, 'is_superuser': False, 'is_verified': False}
+            for email in emails
+        ])
+        await db.commit()
+
+
+def build_filter(session_maker, mode: str, max_age: float = 300) -> EmailFilter:
+    return EmailFilter(session_maker, mode=mode, capacity=1000, error_rate=0.01, max_age=max_age)
+
+
+async def test_bloom_filter_has_no_false_negatives():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    emails = [f'user{i}@mail.com' for i in range(1000)]
+    for email in emails:
+        bloom_filter.add(email)
+
+    assert all(email in bloom_filter for email in emails)
+
+
+async def test_bloom_filter_false_positive_rate():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom_filter.add(f'user{i}@mail.com')
+
+    false_positives = sum(f'other{i}@mail.com' in bloom_filter for i in range(10000))
+
+    # 1% expected, the bound leaves room for the variance of 10000 checks.
+    assert false_positives < 200
+
+
+@pytest.mark.parametrize('capacity, error_rate, size, hash_count', [
+    (1000, 0.01, 9586, 7),
+    (1, 0.5, 8, 6),
+])
+async def test_bloom_filter_size(capacity, error_rate, size, hash_count):
+    bloom_filter = BloomFilter(capacity=capacity, error_rate=error_rate)
+
+    assert (bloom_filter.size, bloom_filter.hash_count) == (size, hash_count)
+    assert len(bloom_filter.bits) == (size + 7) // 8
+
+
+async def test_bloom_filter_bit_order_matches_redis(fake_redis):
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    offsets = bloom_filter.add('user@mail.com')
+    await fake_redis.set('bits', bytes(bloom_filter.bits))
+
+    assert [await fake_redis.getbit('bits', offset) for offset in offsets] == [1] * len(offsets)
+    assert await fake_redis.bitcount('bits') == len(set(offsets))
+
+
+async def test_might_contain_before_load(sqlite_session_maker):
+    email_filter = build_filter(sqlite_session_maker, 'local')
+
+    assert await email_filter.might_contain('unknown@mail.com')
+
+
+async def test_local_filter(sqlite_session_maker, clock):
+    await insert_users(sqlite_session_maker, 'User@Mail.com')
+    email_filter = build_filter(sqlite_session_maker, 'local')
+    await email_filter.load()
+
+    assert await email_filter.might_contain('user@mail.com')
+    assert await email_filter.might_contain(' USER@mail.com ')
+    assert not await email_filter.might_contain('unknown@mail.com')
+
+    await email_filter.add('new@mail.com')
+    assert await email_filter.might_contain('new@mail.com')
+
+
+async def test_off_mode(sqlite_session_maker):
+    email_filter = build_filter(sqlite_session_maker, 'off')
+    await email_filter.load()
+    await email_filter.add('new@mail.com')
+
+    assert email_filter.filter is None
+    assert await email_filter.might_contain('unknown@mail.com')
+
+
+async def test_shared_filter_sees_emails_of_other_workers(sqlite_session_maker, redis, clock):
+    await insert_users(sqlite_session_maker, 'user@mail.com')
+    worker, other_worker = build_filter(sqlite_session_maker, 'redis'), build_filter(sqlite_session_maker, 'redis')
+    await worker.load()
+    await other_worker.load()
+
+    await other_worker.add('new@mail.com')
+
+    assert await worker.might_contain('new@mail.com')
+    assert not await worker.might_contain('unknown@mail.com')
+
+
+async def test_incomplete_shared_filter_is_not_trusted(sqlite_session_maker, redis, clock):
+    email_filter = build_filter(sqlite_session_maker, 'redis')
+    await email_filter.load()
+    assert not await email_filter.might_contain('unknown@mail.com')
+
+    # Redis has lost the bitmap, emails added by other workers since then are unknown.
+    await redis.flushall()
+    assert await email_filter.might_contain('unknown@mail.com')
+
+
+async def test_unavailable_redis_is_not_trusted(sqlite_session_maker, redis, monkeypatch, clock):
+    email_filter = build_filter(sqlite_session_maker, 'redis')
+    await email_filter.load()
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError('Redis is down')
+
+    monkeypatch.setattr(email_filter, '_check_script', fail)
+    assert await email_filter.might_contain('unknown@mail.com')
+
+
+async def test_stale_filter_checks_db_and_reloads(sqlite_session_maker, redis, clock):
+    email_filter = build_filter(sqlite_session_maker, 'redis', max_age=60)
+    await email_filter.load()
+    # Inserted bypassing the service.
+    await insert_users(sqlite_session_maker, 'restored@mail.com')
+    assert not await email_filter.might_contain('restored@mail.com')
+
+    clock.now += 61
+    assert await email_filter.might_contain('restored@mail.com')
+    await email_filter._reload_task
+
+    assert await email_filter.might_contain('restored@mail.com')
+    assert not await email_filter.might_contain('unknown@mail.com')
+
+
+async def test_bloom_filter_update_merges_values():
+    first, second = BloomFilter(capacity=1000, error_rate=0.01), BloomFilter(capacity=1000, error_rate=0.01)
+    first.add('first@mail.com')
+    second.add('second@mail.com')
+    expected = bytearray(a | b for a, b in zip(first.bits, second.bits))
+
+    first.update(second)
+
+    assert first.bits == expected
+    assert 'first@mail.com' in first and 'second@mail.com' in first
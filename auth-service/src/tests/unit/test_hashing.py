@@ -0,0 +1,211 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from sqlalchemy import insert, select, update
+from werkzeug.security import generate_password_hash
+
+from src.models.db_entity import User
+from src.services import authentication, hashing
+from src.services.authentication import AuthenticationService
+from src.services.hashing import (PasswordHasher, canonical_method,
+                                  get_hash_method)
+
+pytestmark = pytest.mark.asyncio
+
+# Cheap parameters, the tests check the executor handling and not the KDF.
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+class BrokenExecutor(ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool('a worker process died')
+
+
+async def test_start_falls_back_to_threads(monkeypatch):
+    def raise_os_error(*args, **kwargs):
+        raise OSError('no semaphores')
+
+    monkeypatch.setattr(hashing, 'ProcessPoolExecutor', raise_os_error)
+    hasher = PasswordHasher(method=FAST_METHOD, executor_type='process', max_workers=1)
+    hasher.start()
+    try:
+        assert isinstance(hasher.executor, ThreadPoolExecutor)
+
+        hashed_password = await hasher.hash_password('password')
+        assert await hasher.check_password(hashed_password, 'password')
+        assert not await hasher.check_password(hashed_password, 'wrong-password')
+    finally:
+        hasher.shutdown()
+
+
+async def test_start_is_idempotent():
+    hasher = PasswordHasher(method=FAST_METHOD, executor_type='thread', max_workers=1)
+    hasher.start()
+    try:
+        executor = hasher.executor
+        hasher.start()
+        assert hasher.executor is executor
+    finally:
+        hasher.shutdown()
+    assert hasher.executor is None
+
+
+async def test_broken_process_pool_switches_to_threads():
+    hasher = PasswordHasher(method=FAST_METHOD, executor_type='process', max_workers=1)
+    broken_executor = BrokenExecutor(max_workers=1)
+    hasher.executor = broken_executor
+    try:
+        hashed_password = await hasher.hash_password('password')
+
+        assert hasher.executor is not broken_executor
+        assert isinstance(hasher.executor, ThreadPoolExecutor)
+        assert hasher.executor_type == 'thread'
+        assert await hasher.check_password(hashed_password, 'password')
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('scrypt', 'scrypt:32768:8:1'),
+    ('scrypt:16384', 'scrypt:16384:8:1'),
+    ('pbkdf2', 'pbkdf2:sha256:600000'),
+    ('pbkdf2:sha512:1000', 'pbkdf2:sha512:1000'),
+    ('argon2', 'argon2:65536:3:4'),
+    ('argon2:19456:2', 'argon2:19456:2:4'),
+])
+async def test_canonical_method(method, expected):
+    assert canonical_method(method) == expected
+
+
+@pytest.mark.parametrize('method', [
+    'md5', 'scrypt:1:2:3:4', 'scrypt:abc', 'pbkdf2:not-a-digest:1000', 'pbkdf2:sha256:many', 'argon2:1:2:3:4', '',
+])
+async def test_canonical_method_rejects_unknown(method):
+    with pytest.raises(ValueError):
+        canonical_method(method)
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('scrypt:16384:8:1', 'scrypt:16384:8:1'),
+    # werkzeug writes the parameters filled with its defaults into the hash.
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:1000'),
+    ('pbkdf2', 'pbkdf2:sha256:600000'),
+])
+async def test_get_hash_method_of_werkzeug_hashes(method, expected):
+    assert canonical_method(get_hash_method(generate_password_hash('password', method))) == expected
+
+
+@pytest.mark.parametrize('hashed_password, method', [
+    ('$argon2id$v=19$m=65536,t=3,p=4$c2FsdHNhbHQ$aGFzaGhhc2hoYXNoaGFzaA', 'argon2:65536:3:4'),
+    ('$argon2id$v=19$m=19456,t=2,p=1$c2FsdHNhbHQ$aGFzaGhhc2hoYXNoaGFzaA', 'argon2:19456:2:1'),
+    ('$argon2i$v=19$m=4096,t=3,p=1$c2FsdHNhbHQ$aGFzaGhhc2hoYXNoaGFzaA', 'argon2i'),
+    # argon2 1.0 hashes have no version.
+    ('$argon2i$m=4096,t=3,p=1$c2FsdHNhbHQ$aGFzaGhhc2hoYXNoaGFzaA', 'argon2i'),
+    ('pbkdf2:sha256:260000$salt$hash', 'pbkdf2:sha256:260000'),
+])
+async def test_get_hash_method(hashed_password, method):
+    assert get_hash_method(hashed_password) == method
+
+
+@pytest.mark.parametrize('hashed_password', [
+    '',
+    'scrypt',
+    'scrypt:32768:8:1$salt',
+    'scrypt:32768:8:1$$hash',
+    'scrypt:32768:8:1$salt$hash$extra',
+    '$argon2id',
+    '$argon2id$v=19$m=1,t=2$s$h',
+    '$argon2id$v=19$m=1,t=2,p$s$h',
+    '$argon2id$v=19$m=x,t=2,p=1$s$h',
+    '$argon2id$v=19$m=1,t=2,p=1$s',
+    '$argon2id$v=19$m=1,t=2,p=1$$h',
+])
+async def test_get_hash_method_rejects_malformed_hash(hashed_password):
+    with pytest.raises(ValueError):
+        get_hash_method(hashed_password)
+
+
+@pytest.mark.parametrize('hashed_password, needs_rehash', [
+    ('pbkdf2:sha256:1000$salt$hash', False),
+    # Legacy iterations count.
+    ('pbkdf2:sha256:260000$salt$hash', True),
+    ('scrypt:32768:8:1$salt$hash', True),
+    ('$argon2id$v=19$m=65536,t=3,p=4$c2FsdHNhbHQ$aGFzaGhhc2hoYXNoaGFzaA', True),
+    ('$argon2i$v=19$m=4096,t=3,p=1$c2FsdHNhbHQ$aGFzaGhhc2hoYXNoaGFzaA', True),
+    # Malformed hashes are rehashed instead of failing the login.
+    ('$argon2id$v=19$m=1,t=2$s$h', True),
+    ('scrypt', True),
+])
+async def test_needs_rehash(hashed_password, needs_rehash):
+    hasher = PasswordHasher(method=FAST_METHOD, executor_type='thread')
+
+    assert hasher.needs_rehash(hashed_password) is needs_rehash
+
+
+async def test_argon2_round_trip():
+    pytest.importorskip('argon2')
+    hasher = PasswordHasher(method='argon2:1024:1:1', executor_type='thread', max_workers=1)
+    try:
+        hashed_password = await hasher.hash_password('password')
+
+        assert get_hash_method(hashed_password) == 'argon2:1024:1:1'
+        assert not hasher.needs_rehash(hashed_password)
+        assert await hasher.check_password(hashed_password, 'password')
+        assert not await hasher.check_password(hashed_password, 'wrong-password')
+    finally:
+        hasher.shutdown()
+
+
+@pytest.fixture(name='fast_password_hasher')
+def fast_password_hasher(monkeypatch):
+    hasher = PasswordHasher(method=FAST_METHOD, executor_type='thread', max_workers=1)
+    monkeypatch.setattr(authentication, 'password_hasher', hasher)
+    yield hasher
+    hasher.shutdown()
+
+
+async def insert_user(session_maker, hashed_password: str) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    async with session_maker() as db:
+        await db.execute(insert(User).values(
+            id=user_id, email='user@mail.com', hashed_password=hashed_password,
+            is_active=True, is_superuser=False, is_verified=False))
+        await db.commit()
+    return user_id
+
+
+async def get_stored_hash(session_maker, user_id: uuid.UUID) -> str:
+    async with session_maker() as db:
+        return (await db.execute(select(User.hashed_password).where(User.id == user_id))).scalar_one()
+
+
+async def test_upgrade_password_hash(sqlite_session_maker, fast_password_hasher):
+    user_id = await insert_user(sqlite_session_maker, generate_password_hash('password', 'pbkdf2:sha256:2000'))
+
+    async with sqlite_session_maker() as db:
+        user = await db.get(User, user_id)
+        await AuthenticationService.upgrade_password_hash(db, user, 'password')
+
+    stored_hash = await get_stored_hash(sqlite_session_maker, user_id)
+    assert user.hashed_password == stored_hash
+    assert get_hash_method(stored_hash) == FAST_METHOD
+
+
+async def test_upgrade_password_hash_loses_to_concurrent_reset(sqlite_session_maker, fast_password_hasher):
+    user_id = await insert_user(sqlite_session_maker, generate_password_hash('password', 'pbkdf2:sha256:2000'))
+    reset_hash = generate_password_hash('new-password', FAST_METHOD)
+
+    async with sqlite_session_maker() as db:
+        user = await db.get(User, user_id)
+        old_hash = user.hashed_password
+        # The password is reset after the login has read the user.
+        async with sqlite_session_maker() as reset_db:
+            await reset_db.execute(update(User).where(User.id == user_id).values(hashed_password=reset_hash))
+            await reset_db.commit()
+
+        await AuthenticationService.upgrade_password_hash(db, user, 'password')
+
+    assert await get_stored_hash(sqlite_session_maker, user_id) == reset_hash
+    assert user.hashed_password == old_hash
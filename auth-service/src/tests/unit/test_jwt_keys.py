@@ -0,0 +1,115 @@
+import time
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI
+
+from src.api import well_known
+from src.core.api_settings import settings
+from src.services.jwt_backends import JoseBackend, TokenError
+from src.services.jwt_keys import build_key_ring
+
+pytestmark = pytest.mark.asyncio
+
+
+def generate_rsa_pems() -> tuple[str, str]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+@pytest.fixture(name='rsa_pems', scope='module')
+def rsa_pems() -> list[tuple[str, str]]:
+    return [generate_rsa_pems() for _ in range(2)]
+
+
+@pytest.fixture(name='build_rs256_key_ring')
+def build_rs256_key_ring(monkeypatch, tmp_path):
+    """
+    Builds a key ring from the settings, as the service does, with the given PEMs written to files.
+    """
+    def inner(private_pem: str, *previous_public_pems: str):
+        private_path = tmp_path / 'private.pem'
+        private_path.write_text(private_pem)
+        previous_paths = []
+        for i, public_pem in enumerate(previous_public_pems):
+            previous_paths.append(tmp_path / f'previous_{i}.pub')
+            previous_paths[-1].write_text(public_pem)
+
+        monkeypatch.setattr(settings, 'jwt_algorithm', 'RS256')
+        monkeypatch.setattr(settings, 'jwt_key_id', '')
+        monkeypatch.setattr(settings, 'jwt_private_key_path', str(private_path))
+        monkeypatch.setattr(settings, 'jwt_previous_public_key_paths', [str(path) for path in previous_paths])
+        return build_key_ring()
+
+    return inner
+
+
+def get_claims() -> dict:
+    return {'user_id': 'user', 'exp': int(time.time()) + 60}
+
+
+async def test_token_of_previous_key_is_verified_after_rotation(rsa_pems, build_rs256_key_ring):
+    (old_private, old_public), (new_private, _) = rsa_pems
+    backend = JoseBackend()
+    old_ring = build_rs256_key_ring(old_private)
+    old_token = backend.encode(get_claims(), old_ring.active_key)
+
+    new_ring = build_rs256_key_ring(new_private, old_public)
+
+    # kid depends on the public key only, so the old key keeps its kid when loaded from the public PEM.
+    assert old_ring.active_key.kid in new_ring.keys
+    assert new_ring.active_key.kid != old_ring.active_key.kid
+    assert backend.decode(old_token, new_ring)['user_id'] == 'user'
+    assert backend.decode(backend.encode(get_claims(), new_ring.active_key), new_ring)['user_id'] == 'user'
+
+
+async def test_token_of_unknown_key_is_rejected(rsa_pems, build_rs256_key_ring):
+    (old_private, _), (new_private, _) = rsa_pems
+    backend = JoseBackend()
+    old_token = backend.encode(get_claims(), build_rs256_key_ring(old_private).active_key)
+
+    # The old key is not in the previous keys.
+    new_ring = build_rs256_key_ring(new_private)
+
+    with pytest.raises(TokenError, match='Unknown jwt key id'):
+        backend.decode(old_token, new_ring)
+
+
+async def test_jwks_contains_only_public_components(rsa_pems, build_rs256_key_ring):
+    (old_private, old_public), (new_private, _) = rsa_pems
+    key_ring = build_rs256_key_ring(new_private, old_public)
+
+    jwks = key_ring.get_jwks()
+
+    assert sorted(key['kid'] for key in jwks['keys']) == sorted(key_ring.keys)
+    for key in jwks['keys']:
+        assert set(key) == {'kty', 'alg', 'n', 'e', 'kid', 'use'}
+        assert (key['kty'], key['alg'], key['use']) == ('RSA', 'RS256', 'sig')
+
+
+async def test_jwks_endpoint_returns_304_for_matching_etag(monkeypatch, rsa_pems, build_rs256_key_ring):
+    key_ring = build_rs256_key_ring(rsa_pems[0][0])
+    monkeypatch.setattr(well_known, 'get_key_ring', lambda: key_ring)
+    app = FastAPI()
+    app.include_router(well_known.router)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        response = await client.get('/.well-known/jwks.json')
+        etag = response.headers['etag']
+        not_modified = await client.get('/.well-known/jwks.json', headers={'If-None-Match': etag})
+        modified = await client.get('/.well-known/jwks.json', headers={'If-None-Match': '"other"'})
+
+    assert response.status_code == 200
+    assert response.json() == key_ring.get_jwks()
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert not_modified.headers['etag'] == etag
+    assert modified.status_code == 200
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import IntegrityError
+
+from src.services.login_history import LoginHistoryWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingWriter(LoginHistoryWriter):
+    """
+    Keeps written batches in memory. Batches fail while 'fail' is set.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('session_factory', None)
+        kwargs.setdefault('max_queue_size', 100)
+        kwargs.setdefault('flush_interval', 0.05)
+        super().__init__(**kwargs)
+        self.batches: list[list[dict]] = []
+        self.fail = False
+        self.written = asyncio.Event()
+
+    async def write_batch(self, rows: list[dict]) -> None:
+        if self.fail:
+            raise ConnectionError('DB is down')
+        self.batches.append(rows)
+        self.written.set()
+
+
+def get_queue_depth() -> float:
+    return REGISTRY.get_sample_value('auth_login_history_queue_depth')
+
+
+def get_dropped() -> float:
+    return REGISTRY.get_sample_value('auth_login_history_dropped_total') or 0
+
+
+async def put_rows(writer: LoginHistoryWriter, count: int) -> list[bool]:
+    return [await writer.put(f'user-{i}', '127.0.0.1', 'test', 'pytest') for i in range(count)]
+
+
+async def test_rows_are_written_in_batches():
+    writer = RecordingWriter(batch_size=3)
+    queue_depth = get_queue_depth()
+    writer.start()
+    try:
+        assert await put_rows(writer, 7) == [True] * 7
+        await asyncio.wait_for(writer.queue.join(), timeout=1)
+    finally:
+        await writer.stop()
+
+    assert [len(batch) for batch in writer.batches] == [3, 3, 1]
+    assert [row['user_id'] for batch in writer.batches for row in batch] == [f'user-{i}' for i in range(7)]
+    assert get_queue_depth() == queue_depth
+
+
+async def test_partial_batch_is_flushed_after_interval():
+    writer = RecordingWriter(batch_size=100, flush_interval=0.05)
+    writer.start()
+    try:
+        await put_rows(writer, 2)
+        await asyncio.wait_for(writer.written.wait(), timeout=1)
+        # Rows added while the writer waits for the batch to fill up are not lost.
+        writer.written.clear()
+        await asyncio.sleep(0)
+        await put_rows(writer, 1)
+        await asyncio.wait_for(writer.written.wait(), timeout=1)
+    finally:
+        await writer.stop()
+
+    assert sum(len(batch) for batch in writer.batches) == 3
+
+
+async def test_full_queue_drops_rows():
+    writer = RecordingWriter(batch_size=10, max_queue_size=2)
+    queue_depth = get_queue_depth()
+    writer.start()
+    try:
+        # The writer has no chance to take rows, since 'put' does not yield with the 'drop' policy.
+        assert await put_rows(writer, 3) == [True, True, False]
+        assert get_queue_depth() == queue_depth + 2
+    finally:
+        await writer.stop()
+
+    assert sum(len(batch) for batch in writer.batches) == 2
+    assert get_queue_depth() == queue_depth
+
+
+async def test_block_policy_waits_for_free_slot():
+    writer = RecordingWriter(batch_size=1, max_queue_size=1, overflow_policy='block')
+    writer.start()
+    try:
+        assert await put_rows(writer, 5) == [True] * 5
+    finally:
+        await writer.stop()
+
+    assert sum(len(batch) for batch in writer.batches) == 5
+
+
+async def test_failed_batch_is_dropped_and_acknowledged():
+    writer = RecordingWriter(batch_size=10)
+    queue_depth = get_queue_depth()
+    writer.fail = True
+    writer.start()
+    try:
+        await put_rows(writer, 3)
+        # 'join' returns only if every taken row has been marked as done.
+        await asyncio.wait_for(writer.queue.join(), timeout=1)
+        writer.fail = False
+        await put_rows(writer, 1)
+    finally:
+        await writer.stop()
+
+    assert [len(batch) for batch in writer.batches] == [1]
+    assert get_queue_depth() == queue_depth
+
+
+async def test_stop_writes_queued_rows():
+    writer = RecordingWriter(batch_size=100, flush_interval=0.1)
+    writer.start()
+    await put_rows(writer, 5)
+    await asyncio.wait_for(writer.stop(), timeout=1)
+
+    assert sum(len(batch) for batch in writer.batches) == 5
+
+
+async def test_rejected_row_does_not_drop_the_batch():
+    class RejectingWriter(RecordingWriter):
+        async def write_batch(self, rows: list[dict]) -> None:
+            if any(row['user_id'] == 'deleted-user' for row in rows):
+                raise IntegrityError('INSERT INTO login_history', {}, Exception('foreign key violation'))
+            await super().write_batch(rows)
+
+    writer = RejectingWriter(batch_size=8)
+    dropped = get_dropped()
+    writer.start()
+    try:
+        for i in range(8):
+            await writer.put('deleted-user' if i == 5 else f'user-{i}', '127.0.0.1', 'test', 'pytest')
+        await asyncio.wait_for(writer.queue.join(), timeout=1)
+    finally:
+        await writer.stop()
+
+    assert sorted(row['user_id'] for batch in writer.batches for row in batch) == [
+        f'user-{i}' for i in range(8) if i != 5
+    ]
+    assert get_dropped() == dropped + 1
+
+
+async def test_put_normalizes_values_to_the_columns():
+    writer = RecordingWriter(batch_size=1)
+
+    await writer.put('user', '2001:db8::1', 'l' * 300, 'u' * 300)
+    await writer.put('user', 'testclient', None, None)
+
+    first, second = writer.batches[0][0], writer.batches[1][0]
+    assert first['ip_address'] == '2001:db8::1'
+    assert (len(first['location']), len(first['user_agent'])) == (255, 255)
+    assert (second['ip_address'], second['location'], second['user_agent']) == (None, None, None)
@@ -0,0 +1,42 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+from src.cli.login_history import rebuild_stats
+from src.models.db_entity import LoginHistory, User, UserLoginStats
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_rebuild_stats(sqlite_session_maker):
+    active_user_id, purged_user_id, new_user_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    async with sqlite_session_maker() as db:
+        await db.execute(insert(User), [
+            {'id': user_id, 'email': f'{user_id}@mail.com', 'hashed_password': 'not-used',
+             'is_active': True, 'is_superuser': False, 'is_verified': False}
+            for user_id in (active_user_id, purged_user_id, new_user_id)
+        ])
+        await db.execute(insert(LoginHistory), [
+            {'id': uuid.uuid4(), 'user_id': active_user_id, 'timestamp': datetime(2024, 5, day)} for day in (1, 2)
+        ] + [{'id': uuid.uuid4(), 'user_id': new_user_id, 'timestamp': datetime(2024, 5, 3)}])
+        # Stale counters, the history of the purged user has been dropped completely.
+        await db.execute(insert(UserLoginStats), [
+            {'user_id': active_user_id, 'login_count': 10, 'last_login_at': datetime(2023, 1, 1)},
+            {'user_id': purged_user_id, 'login_count': 5, 'last_login_at': datetime(2023, 1, 1)},
+        ])
+        await db.commit()
+
+    async with sqlite_session_maker() as db:
+        await rebuild_stats(await db.connection())
+        await db.commit()
+
+    async with sqlite_session_maker() as db:
+        stats = {row.user_id: (row.login_count, row.last_login_at)
+                 for row in (await db.execute(select(UserLoginStats))).scalars()}
+
+    assert stats == {
+        active_user_id: (2, datetime(2024, 5, 2)),
+        new_user_id: (1, datetime(2024, 5, 3)),
+    }
@@ -0,0 +1,83 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, values
+
+from src.api import metrics
+from src.core.metrics import timed
+from src.core.middleware import record_request_latency
+
+pytestmark = pytest.mark.asyncio
+
+
+def get_request_count(route: str, status: str = '200') -> float:
+    return REGISTRY.get_sample_value(
+        'auth_http_request_seconds_count', {'method': 'GET', 'route': route, 'status': status}
+    ) or 0
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(metrics.router)
+
+    @app.get('/unit/users/{user_id}')
+    async def get_user(user_id: str) -> dict:
+        return {'user_id': user_id}
+
+    app.middleware('http')(record_request_latency)
+    return app
+
+
+async def request(app: FastAPI, path: str) -> httpx.Response:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        return await client.get(path)
+
+
+async def test_request_latency_is_labeled_by_route_template():
+    app = build_app()
+    matched = get_request_count('/unit/users/{user_id}')
+    unmatched = get_request_count('unmatched', status='404')
+
+    assert (await request(app, '/unit/users/1')).status_code == 200
+    assert (await request(app, '/unit/users/2')).status_code == 200
+    assert (await request(app, '/unit/unknown/3')).status_code == 404
+
+    assert get_request_count('/unit/users/{user_id}') == matched + 2
+    assert get_request_count('/unit/users/1') == 0
+    # Unknown paths share one label.
+    assert get_request_count('unmatched', status='404') == unmatched + 1
+    assert get_request_count('/unit/unknown/3', status='404') == 0
+
+
+async def test_timed_observes_calls_and_failures():
+    @timed('unit', 'timed_call')
+    async def call(fail: bool) -> None:
+        if fail:
+            raise ValueError('failed')
+
+    def get_count() -> float:
+        return REGISTRY.get_sample_value(
+            'auth_dependency_seconds_count', {'component': 'unit', 'operation': 'timed_call'}
+        ) or 0
+
+    count = get_count()
+    await call(fail=False)
+    with pytest.raises(ValueError):
+        await call(fail=True)
+
+    assert get_count() == count + 2
+
+
+async def test_metrics_endpoint_aggregates_workers_in_multiprocess_mode(monkeypatch, tmp_path):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    # A metric of another gunicorn worker, written to the shared directory.
+    monkeypatch.setattr(values, 'ValueClass', values.MultiProcessValue(process_identifier=lambda: 12345))
+    worker_logins = Counter('auth_unit_worker_logins', 'Logins of a worker.', registry=None)
+    worker_logins.inc(3)
+
+    response = await request(build_app(), '/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == CONTENT_TYPE_LATEST
+    assert '# TYPE auth_unit_worker_logins_total counter' in response.text
+    assert 'auth_unit_worker_logins_total 3.0' in response.text
@@ -0,0 +1,49 @@
+import base64
+import datetime
+import uuid
+
+import orjson
+import pytest
+
+from src.services.pagination import SortEnum, decode_cursor, encode_cursor
+
+ROW_ID = uuid.UUID('8ab71a54-7b99-4322-a07e-0b2a0c40ff44')
+
+
+def make_cursor(value) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(value)).decode()
+
+
+@pytest.mark.parametrize('timestamp', [
+    datetime.datetime(2024, 1, 31, 23, 59, 59, 999999),
+    datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC),
+])
+@pytest.mark.parametrize('order', list(SortEnum))
+def test_cursor_round_trip(timestamp, order):
+    assert decode_cursor(encode_cursor(timestamp, ROW_ID, order), order) == (timestamp, ROW_ID)
+
+
+def test_cursor_of_another_order_is_rejected():
+    cursor = encode_cursor(datetime.datetime(2024, 1, 1), ROW_ID, SortEnum.ASC)
+
+    with pytest.raises(ValueError, match='another sort order'):
+        decode_cursor(cursor, SortEnum.DESC)
+
+
+@pytest.mark.parametrize('cursor', [
+    '',
+    'not base64!',
+    'YWJj',  # 'abc', not JSON
+    'ключ',
+    make_cursor({'timestamp': '2024-01-01T00:00:00'}),
+    make_cursor(42),
+    make_cursor(['2024-01-01T00:00:00', str(ROW_ID)]),
+    make_cursor(['not a date', str(ROW_ID), 'asc']),
+    make_cursor([20240101, str(ROW_ID), 'asc']),
+    make_cursor(['2024-01-01T00:00:00', 'not a uuid', 'asc']),
+    make_cursor(['2024-01-01T00:00:00', 42, 'asc']),
+    make_cursor(['2024-01-01T00:00:00', None, 'asc']),
+])
+def test_tampered_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, SortEnum.ASC)
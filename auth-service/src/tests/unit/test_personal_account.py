@@ -0,0 +1,18 @@
+from datetime import UTC, datetime, timedelta, timezone
+
+import pytest
+
+from src.api.v1.personal_account import as_naive_utc
+
+
+@pytest.mark.parametrize('moment, expected', [
+    (None, None),
+    (datetime(2024, 1, 1, 12), datetime(2024, 1, 1, 12)),
+    (datetime(2024, 1, 1, 12, tzinfo=UTC), datetime(2024, 1, 1, 12)),
+    (datetime(2024, 1, 1, 0, 30, tzinfo=timezone(timedelta(hours=3))), datetime(2023, 12, 31, 21, 30)),
+])
+def test_as_naive_utc(moment, expected):
+    result = as_naive_utc(moment)
+
+    assert result == expected
+    assert result is None or result.tzinfo is None
@@ -0,0 +1,51 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.db.pool import InstrumentedAsyncPool
+
+pytestmark = pytest.mark.asyncio
+
+
+def get_sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, {'pool': 'unit', **labels}) or 0
+
+
+async def test_pool_metrics_follow_checkouts(tmp_path):
+    # The pool overrides private SQLAlchemy hooks, the test fails if they are no longer called.
+    engine = create_async_engine(
+        f'sqlite+aiosqlite:///{tmp_path / "pool.db"}',
+        poolclass=InstrumentedAsyncPool,
+        pool_logging_name='unit',
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.1
+    )
+    checkouts = get_sample('auth_db_pool_checkout_seconds_count')
+    overflow = get_sample('auth_db_pool_overflow_total')
+    timeouts = get_sample('auth_db_pool_timeouts_total')
+
+    try:
+        first = await engine.connect()
+        await first.execute(text('SELECT 1'))
+        assert get_sample('auth_db_pool_connections', state='in_use') == 1
+        assert get_sample('auth_db_pool_checkout_seconds_count') == checkouts + 1
+
+        second = await engine.connect()
+        assert get_sample('auth_db_pool_connections', state='in_use') == 2
+        assert get_sample('auth_db_pool_overflow_total') == overflow + 1
+
+        with pytest.raises(exc.TimeoutError):
+            await engine.connect()
+        assert get_sample('auth_db_pool_timeouts_total') == timeouts + 1
+        # The failed wait is measured too.
+        assert get_sample('auth_db_pool_checkout_seconds_count') == checkouts + 3
+
+        await second.close()
+        await first.close()
+        assert get_sample('auth_db_pool_connections', state='in_use') == 0
+        # The overflow connection is closed on return, the pool keeps pool_size connections.
+        assert get_sample('auth_db_pool_connections', state='idle') == 1
+    finally:
+        await engine.dispose()
@@ -0,0 +1,136 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.helper import RedisCache, TieredCache
+from src.services.principal import PrincipalService
+
+pytestmark = pytest.mark.asyncio
+
+USER_ID = uuid.UUID('8ab71a54-7b99-4322-a07e-0b2a0c40ff44')
+ROLE_ID = uuid.UUID('e3a6a3a4-7a49-4fb1-a4c8-1c6d3b1f9f2a')
+
+
+class FakeBaseService:
+    """
+    Serves one user, counts DB loads. 'on_load' runs in the middle of a load.
+    """
+
+    def __init__(self):
+        self.user = SimpleNamespace(id=USER_ID, email='user@mail.com', is_active=True, is_superuser=False)
+        self.roles = [SimpleNamespace(id=ROLE_ID)]
+        self.loads = 0
+        self.on_load = None
+
+    async def get_user_by_uuid(self, db, user_id):
+        self.loads += 1
+        user = SimpleNamespace(**vars(self.user)) if user_id == USER_ID else None
+        if self.on_load is not None:
+            await self.on_load()
+        return user
+
+    async def get_user_roles(self, db, user_id):
+        return list(self.roles)
+
+
+@pytest.fixture(name='tiered_cache')
+def tiered_cache(fake_redis) -> TieredCache:
+    return TieredCache(cache=RedisCache(fake_redis), local_max_size=100, local_expire=5)
+
+
+@pytest.fixture(name='base_service')
+def base_service() -> FakeBaseService:
+    return FakeBaseService()
+
+
+@pytest.fixture(name='principal_service')
+def principal_service(tiered_cache, base_service, fake_redis) -> PrincipalService:
+    return PrincipalService(cache=tiered_cache, base_service=base_service, redis=fake_redis)
+
+
+async def test_tiered_cache_reads_through_shared_cache(fake_redis, tiered_cache):
+    await fake_redis.set('key', 'value')
+
+    assert await tiered_cache.get('key') == b'value'
+    # Served from the local tier afterwards.
+    await fake_redis.delete('key')
+    assert await tiered_cache.get('key') == b'value'
+
+
+async def test_tiered_cache_set_and_delete(fake_redis, tiered_cache):
+    await tiered_cache.set('key', 'value', expire=60)
+    assert await fake_redis.get('key') == b'value'
+    assert tiered_cache.local.get('key') == 'value'
+
+    await tiered_cache.delete('key')
+    assert await fake_redis.get('key') is None
+    assert await tiered_cache.get('key') is None
+
+
+async def test_tiered_cache_local_expire_is_bounded(monkeypatch, tiered_cache):
+    expires = []
+    monkeypatch.setattr(tiered_cache.local, 'set', lambda key, value, expire: expires.append(expire))
+
+    await tiered_cache.set('key', 'value', expire=60)
+    await tiered_cache.set('key', 'value', expire=2)
+
+    assert expires == [5, 2]
+
+
+async def test_get_principal_is_cached(principal_service, base_service):
+    principal = await principal_service.get_principal(None, USER_ID)
+    assert principal.id == USER_ID
+    assert principal.role_ids == [str(ROLE_ID)]
+
+    assert await principal_service.get_principal(None, USER_ID) == principal
+    assert base_service.loads == 1
+
+
+async def test_get_principal_unknown_user(principal_service, fake_redis):
+    assert await principal_service.get_principal(None, uuid.uuid4()) is None
+    assert await fake_redis.keys('principal:*') == []
+
+
+async def test_invalidate_reloads_principal(principal_service, base_service):
+    await principal_service.get_principal(None, USER_ID)
+    base_service.user.is_active = False
+    base_service.roles = []
+
+    await principal_service.invalidate(USER_ID)
+    principal = await principal_service.get_principal(None, USER_ID)
+
+    assert base_service.loads == 2
+    assert not principal.is_active
+    assert principal.role_ids == []
+
+
+async def test_invalidate_many_users(principal_service, tiered_cache, fake_redis):
+    user_ids = [uuid.uuid4() for _ in range(2500)]
+    for user_id in user_ids:
+        await tiered_cache.set(principal_service.get_cache_key(user_id), '{}', expire=60)
+
+    await principal_service.invalidate(*user_ids)
+
+    assert await fake_redis.exists(*[principal_service.get_cache_key(user_id) for user_id in user_ids]) == 0
+    assert len(tiered_cache.local) == 0
+
+
+async def test_invalidate_during_load_drops_stale_snapshot(principal_service, base_service, fake_redis):
+    async def deactivate_user():
+        # The user has been read, it is deactivated and invalidated before the snapshot is cached.
+        base_service.on_load = None
+        base_service.user.is_active = False
+        await principal_service.invalidate(USER_ID)
+
+    base_service.on_load = deactivate_user
+    stale_principal = await principal_service.get_principal(None, USER_ID)
+    assert stale_principal.is_active
+
+    key = principal_service.get_cache_key(USER_ID)
+    assert await fake_redis.get(key) is None
+    assert principal_service.cache.local.get(key) is None
+
+    principal = await principal_service.get_principal(None, USER_ID)
+    assert not principal.is_active
+    assert base_service.loads == 2
@@ -0,0 +1,86 @@
+import pytest
+
+from src.services.rate_limit import LoginRateLimiter, RateLimitPolicy
+
+pytestmark = pytest.mark.asyncio
+
+EMAIL = 'user@mail.com'
+IP_ADDRESS = '203.0.113.10'
+
+
+class FailingRedis:
+    def register_script(self, script):
+        async def fail(*args, **kwargs):
+            raise ConnectionError('Redis is down')
+        return fail
+
+
+def build_limiter(redis, email_attempts: int = 3, ip_attempts: int = 10) -> LoginRateLimiter:
+    return LoginRateLimiter(
+        redis,
+        email_policy=RateLimitPolicy('email', email_attempts, 60),
+        ip_policy=RateLimitPolicy('ip', ip_attempts, 60),
+        lockout_base_sec=30,
+        lockout_max_sec=100,
+        lockout_reset_sec=3600
+    )
+
+
+async def check_attempts(limiter: LoginRateLimiter, count: int, email: str = EMAIL, ip_address: str = IP_ADDRESS):
+    return [await limiter.check(email, ip_address) for _ in range(count)]
+
+
+async def test_email_limit_locks_out(fake_redis):
+    limiter = build_limiter(fake_redis)
+
+    assert await check_attempts(limiter, 3) == [None] * 3
+    assert await limiter.check(EMAIL, IP_ADDRESS) == 30
+    # Locked out whatever the IP is, other emails are allowed.
+    assert 0 < await limiter.check(EMAIL.upper(), '198.51.100.1') <= 30
+    assert await limiter.check('other@mail.com', IP_ADDRESS) is None
+
+
+async def test_ip_limit_locks_out(fake_redis):
+    limiter = build_limiter(fake_redis, email_attempts=100, ip_attempts=5)
+
+    assert await check_attempts(limiter, 5, email='first@mail.com') == [None] * 5
+    assert await limiter.check('second@mail.com', IP_ADDRESS) == 30
+    assert await limiter.check('second@mail.com', '198.51.100.1') is None
+
+
+async def test_rejected_attempts_are_not_counted(fake_redis):
+    limiter = build_limiter(fake_redis, email_attempts=100, ip_attempts=2)
+    await check_attempts(limiter, 2, email='first@mail.com')
+    assert await limiter.check('second@mail.com', IP_ADDRESS) is not None
+
+    # The email counter has not been incremented by the attempt rejected by the IP limit.
+    window_key = limiter.get_keys(limiter.email_policy, 'second@mail.com')[0]
+    assert await fake_redis.keys(f'{window_key}*') == []
+
+
+async def test_lockout_doubles_up_to_max(fake_redis):
+    limiter = build_limiter(fake_redis, email_attempts=1)
+    _, lock_key, _ = limiter.get_keys(limiter.email_policy, EMAIL)
+
+    lockouts = []
+    for _ in range(4):
+        await fake_redis.delete(lock_key)
+        lockouts.append(await limiter.check(EMAIL, IP_ADDRESS))
+
+    assert lockouts == [None, 30, 60, 100]
+
+
+async def test_reset_forgets_email_attempts(fake_redis):
+    limiter = build_limiter(fake_redis)
+    await check_attempts(limiter, 2)
+
+    await limiter.reset(EMAIL)
+
+    assert await check_attempts(limiter, 3) == [None] * 3
+
+
+async def test_attempts_are_allowed_without_redis():
+    limiter = build_limiter(FailingRedis(), email_attempts=1)
+
+    assert await check_attempts(limiter, 3) == [None] * 3
+    await limiter.reset(EMAIL)
@@ -0,0 +1,137 @@
+import uuid
+
+import pytest
+from sqlalchemy import delete, insert
+
+from src.db import redis_db
+from src.models.db_entity import Permission, Role, RolePermission
+from src.services import rbac
+from src.services.rbac import PermissionMatrix, RBACService
+
+pytestmark = pytest.mark.asyncio
+
+READ_ID, WRITE_ID = str(uuid.uuid4()), str(uuid.uuid4())
+READER_ID, WRITER_ID = str(uuid.uuid4()), str(uuid.uuid4())
+
+
+def build_matrix(version: str, reader_bitmap: int = 0b01) -> PermissionMatrix:
+    return PermissionMatrix(
+        version=version,
+        permission_ids={'read': READ_ID, 'write': WRITE_ID},
+        role_permissions={READER_ID: frozenset({READ_ID}), WRITER_ID: frozenset({READ_ID, WRITE_ID})},
+        permission_names=('read', 'write'),
+        role_bitmaps={READER_ID: reader_bitmap, WRITER_ID: 0b11}
+    )
+
+
+class FailingRedis:
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            raise ConnectionError('Redis is down')
+        return fail
+
+
+@pytest.fixture(name='rbac_db')
+def rbac_db(monkeypatch, sqlite_session_maker, fake_redis):
+    monkeypatch.setattr(rbac, 'async_session', sqlite_session_maker)
+    monkeypatch.setattr(redis_db, 'redis', fake_redis)
+    return sqlite_session_maker
+
+
+async def grant(session_maker, role_id: str, permission_id: str) -> None:
+    async with session_maker() as db:
+        await db.execute(insert(RolePermission).values(
+            id=uuid.uuid4(), role_id=uuid.UUID(role_id), permission_id=uuid.UUID(permission_id)))
+        await db.commit()
+
+
+async def seed(session_maker) -> None:
+    async with session_maker() as db:
+        await db.execute(insert(Permission), [
+            {'id': uuid.UUID(READ_ID), 'name': 'read'}, {'id': uuid.UUID(WRITE_ID), 'name': 'write'}])
+        await db.execute(insert(Role), [
+            {'id': uuid.UUID(READER_ID), 'name': 'reader'}, {'id': uuid.UUID(WRITER_ID), 'name': 'writer'}])
+        await db.commit()
+    await grant(session_maker, READER_ID, READ_ID)
+
+
+async def test_permissions_claim_round_trip():
+    matrix = build_matrix('1')
+
+    reader_claim = matrix.get_permissions_claim([READER_ID])
+    assert reader_claim.startswith(f'{matrix.fingerprint}:')
+    assert matrix.check_permissions_claim(reader_claim, 'read') is True
+    assert matrix.check_permissions_claim(reader_claim, 'write') is False
+    assert matrix.check_permissions_claim(reader_claim, 'unknown') is False
+    assert matrix.check_permissions_claim(matrix.get_permissions_claim([READER_ID, WRITER_ID]), 'write') is True
+    assert matrix.check_permissions_claim(None, 'read') is None
+
+
+async def test_fingerprint_depends_on_content_only():
+    assert build_matrix('1').fingerprint == build_matrix('2').fingerprint
+    assert build_matrix('1').fingerprint != build_matrix('1', reader_bitmap=0b11).fingerprint
+
+
+async def test_claim_of_another_matrix_is_rejected():
+    old_matrix, new_matrix = build_matrix('1', reader_bitmap=0b11), build_matrix('1')
+
+    claim = old_matrix.get_permissions_claim([READER_ID])
+
+    assert new_matrix.check_permissions_claim(claim, 'write') is None
+
+
+async def test_invalidate_sets_new_version(rbac_db, fake_redis):
+    await seed(rbac_db)
+    service, other_service = RBACService(poll_interval=0), RBACService(poll_interval=0)
+    await service.start()
+    await other_service.start()
+    assert not service.matrix.has_permission([READER_ID], 'write')
+
+    await grant(rbac_db, READER_ID, WRITE_ID)
+    await service.invalidate()
+    first_version = service.matrix.version
+    assert service.matrix.has_permission([READER_ID], 'write')
+
+    await other_service.sync()
+    assert other_service.matrix.version == first_version
+    assert other_service.matrix.has_permission([READER_ID], 'write')
+
+    await service.invalidate()
+    assert service.matrix.version not in ('', first_version)
+
+
+async def test_sync_reloads_after_redis_data_loss(rbac_db, fake_redis):
+    await seed(rbac_db)
+    service = RBACService(poll_interval=0)
+    await service.invalidate()
+
+    await fake_redis.flushall()
+    async with rbac_db() as db:
+        await db.execute(delete(RolePermission))
+        await db.commit()
+    await service.sync()
+
+    assert service.matrix.version == ''
+    assert not service.matrix.has_permission([READER_ID], 'read')
+
+
+async def test_invalidate_without_redis_rejects_old_claims(rbac_db, monkeypatch):
+    await seed(rbac_db)
+    service = RBACService(poll_interval=0)
+    await service.start()
+    await grant(rbac_db, READER_ID, WRITE_ID)
+    await service.invalidate()
+    claim = service.matrix.get_permissions_claim([READER_ID])
+    assert service.matrix.check_permissions_claim(claim, 'write') is True
+
+    monkeypatch.setattr(redis_db, 'redis', FailingRedis())
+    async with rbac_db() as db:
+        await db.execute(delete(RolePermission).where(RolePermission.permission_id == uuid.UUID(WRITE_ID)))
+        await db.commit()
+    version = service.matrix.version
+    await service.invalidate()
+
+    # The matrix is reloaded and the claim with the revoked permission is not trusted anymore.
+    assert service.matrix.version != version
+    assert service.matrix.check_permissions_claim(claim, 'write') is None
+    assert not service.matrix.has_permission([READER_ID], 'write')
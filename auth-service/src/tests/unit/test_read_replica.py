@@ -0,0 +1,115 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from src.db import postgres
+from src.db.postgres import ReplicaHealth, is_pinned_to_primary, open_read_session
+from src.schema.cookie import PrimaryPinCookie
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeSession:
+    def __init__(self, name: str, error: Exception | None = None):
+        self.name = name
+        self.error = error
+        self.closed = False
+
+    async def connection(self):
+        if self.error is not None:
+            raise self.error
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeSessionMaker:
+    def __init__(self, name: str, error: Exception | None = None):
+        self.name = name
+        self.error = error
+        self.sessions: list[FakeSession] = []
+
+    def __call__(self) -> FakeSession:
+        self.sessions.append(FakeSession(self.name, self.error))
+        return self.sessions[-1]
+
+
+def make_request(cookies: dict | None = None) -> Request:
+    cookie_header = '; '.join(f'{name}={value}' for name, value in (cookies or {}).items())
+    return Request({'type': 'http', 'headers': [(b'cookie', cookie_header.encode())] if cookies else []})
+
+
+@pytest.fixture(name='replica_health')
+def replica_health(monkeypatch) -> ReplicaHealth:
+    health = ReplicaHealth(retry_interval=30)
+    monkeypatch.setattr(postgres, 'replica_health', health)
+    monkeypatch.setattr(postgres, 'async_session', FakeSessionMaker('primary'))
+    return health
+
+
+async def test_replica_health_retries_after_interval(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(postgres, 'time', SimpleNamespace(monotonic=lambda: now))
+    health = ReplicaHealth(retry_interval=30)
+    assert health.is_available()
+
+    health.mark_down(OSError('connection refused'))
+    now += 29.9
+    assert not health.is_available()
+    now += 0.1
+    assert health.is_available()
+
+
+async def test_reads_go_to_replica(monkeypatch, replica_health):
+    monkeypatch.setattr(postgres, 'async_read_session', FakeSessionMaker('replica'))
+
+    session = await open_read_session(make_request())
+
+    assert session.name == 'replica'
+    assert replica_health.is_available()
+
+
+@pytest.mark.parametrize('error', [OSError('connection refused'), TimeoutError()])
+async def test_unavailable_replica_fails_over_to_primary(monkeypatch, replica_health, error):
+    replica_session_maker = FakeSessionMaker('replica', error)
+    monkeypatch.setattr(postgres, 'async_read_session', replica_session_maker)
+
+    session = await open_read_session(make_request())
+
+    assert session.name == 'primary'
+    assert replica_session_maker.sessions[0].closed
+    assert not replica_health.is_available()
+
+    # The replica is not tried again until the retry interval has passed.
+    session = await open_read_session(make_request())
+    assert session.name == 'primary'
+    assert len(replica_session_maker.sessions) == 1
+
+
+async def test_reads_without_replica_go_to_primary(monkeypatch, replica_health):
+    monkeypatch.setattr(postgres, 'async_read_session', None)
+
+    assert (await open_read_session(make_request())).name == 'primary'
+
+
+async def test_pinned_client_reads_from_primary(monkeypatch, replica_health):
+    replica_session_maker = FakeSessionMaker('replica')
+    monkeypatch.setattr(postgres, 'async_read_session', replica_session_maker)
+    request = make_request({PrimaryPinCookie.name: str(int(time.time()) + 60)})
+
+    assert (await open_read_session(request)).name == 'primary'
+    assert replica_session_maker.sessions == []
+
+
+@pytest.mark.parametrize('cookie, pinned', [
+    (None, False),
+    ('not-a-number', False),
+    (str(int(time.time()) - 1), False),
+    (str(int(time.time()) + 60), True),
+])
+async def test_is_pinned_to_primary(cookie, pinned):
+    request = make_request({PrimaryPinCookie.name: cookie} if cookie is not None else None)
+
+    assert is_pinned_to_primary(request) is pinned
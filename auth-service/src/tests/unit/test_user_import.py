@@ -0,0 +1,160 @@
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+import pytest
+from asyncpg.exceptions import CharacterNotInRepertoireError
+from werkzeug.security import generate_password_hash
+
+from src.services import user_import as user_import_module
+from src.services.email_filter import EmailFilter
+from src.services.user_import import (ImportFormat, UserImporter, iter_lines,
+                                      parse_rows)
+
+pytestmark = pytest.mark.asyncio
+
+HASHED_PASSWORD = generate_password_hash('password', 'pbkdf2:sha256:1000')
+
+
+class RecordingImporter(UserImporter):
+    """
+    Keeps inserted records in memory instead of Postgres. Password hashes with a NUL character are rejected
+    like Postgres does, failing the whole insert.
+    """
+
+    def __init__(self, chunk_size: int, existing_emails: set[str] = frozenset()):
+        email_filter = EmailFilter(None, mode='off', capacity=1000, error_rate=0.01, max_age=300)
+        super().__init__(None, email_filter, chunk_size=chunk_size)
+        self.existing_emails = set(existing_emails)
+        self.inserts: list[list[tuple]] = []
+
+    async def insert_records(self, records: list[tuple]) -> set[str]:
+        self.inserts.append(records)
+        if any('\x00' in record[2] for record in records):
+            raise CharacterNotInRepertoireError('invalid byte sequence for encoding "UTF8": 0x00')
+        inserted_emails = {record[1] for record in records} - self.existing_emails
+        self.existing_emails |= inserted_emails
+        return inserted_emails
+
+
+async def iterate(*items) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+async def collect(iterator: AsyncIterator) -> list:
+    return [item async for item in iterator]
+
+
+def ndjson(*rows: str) -> AsyncIterator[str]:
+    return iterate(*rows)
+
+
+async def test_iter_lines_splits_chunks_on_line_breaks():
+    # 'é' is split between the chunks.
+    chunks = iterate(b'first\nsec', b'ond\n\xc3', b'\xa9\nlast')
+
+    assert await collect(iter_lines(chunks)) == ['first', 'second', 'é', 'last']
+
+
+async def test_parse_rows_ndjson():
+    lines = iterate('{"email": "a@mail.com"}', '', '{broken', '[1]')
+
+    assert await collect(parse_rows(lines, ImportFormat.ndjson)) == [
+        (1, {'email': 'a@mail.com'}),
+        (3, 'invalid JSON: unexpected character: line 1 column 2 (char 1)'),
+        (4, 'row must be a JSON object'),
+    ]
+
+
+async def test_parse_rows_csv():
+    lines = iterate('email, password, is_active\r', 'a@mail.com,"pass,word",\r', 'b@mail.com,password')
+
+    assert await collect(parse_rows(lines, ImportFormat.csv)) == [
+        (2, {'email': 'a@mail.com', 'password': 'pass,word'}),
+        (3, 'expected 3 values, got 2'),
+    ]
+
+
+async def test_run_imports_rows_in_chunks():
+    importer = RecordingImporter(chunk_size=2)
+    lines = ndjson(*(f'{{"email": "user{i}@mail.com", "hashed_password": "{HASHED_PASSWORD}"}}' for i in range(5)))
+
+    result = await importer.run(lines, ImportFormat.ndjson)
+
+    assert (result.imported, result.failed) == (5, 0)
+    assert [len(records) for records in importer.inserts] == [2, 2, 1]
+
+
+async def test_run_hashes_plain_passwords(monkeypatch):
+    async def hash_password(password: str) -> str:
+        return f'hashed:{password}'
+
+    monkeypatch.setattr(user_import_module, 'password_hasher', SimpleNamespace(hash_password=hash_password))
+    importer = RecordingImporter(chunk_size=10)
+
+    result = await importer.run(ndjson('{"email": "user@mail.com", "password": "secret"}'), ImportFormat.ndjson)
+
+    assert result.imported == 1
+    assert importer.inserts[0][0][2] == 'hashed:secret'
+
+
+async def test_run_reports_row_errors():
+    importer = RecordingImporter(chunk_size=10, existing_emails={'existing@mail.com'})
+    lines = ndjson(
+        '{"email": "not-an-email", "password": "password"}',
+        '{"email": "both@mail.com", "password": "password", "hashed_password": "scrypt$salt$hash"}',
+        '{"email": "scrypt@mail.com", "hashed_password": "scrypt"}',
+        '{"email": "argon@mail.com", "hashed_password": "$argon2id$v=19$m=65536$salt$hash"}',
+        '{"email": "md5@mail.com", "hashed_password": "md5$salt$hash"}',
+        f'{{"email": "{"a" * 250}@mail.com", "hashed_password": "{HASHED_PASSWORD}"}}',
+        f'{{"email": "long@mail.com", "hashed_password": "scrypt:32768:8:1${"a" * 1024}$hash"}}',
+        f'{{"email": "existing@mail.com", "hashed_password": "{HASHED_PASSWORD}"}}',
+        f'{{"email": "new@mail.com", "hashed_password": "{HASHED_PASSWORD}"}}',
+        f'{{"email": "new@mail.com", "hashed_password": "{HASHED_PASSWORD}"}}',
+    )
+
+    result = await importer.run(lines, ImportFormat.ndjson)
+
+    assert (result.imported, result.failed) == (1, 9)
+    errors = {error.line: error.error for error in result.errors}
+    assert errors[1].startswith('email: ')
+    assert errors[2] == 'row: Value error, exactly one of password and hashed_password is required'
+    assert errors[3] == 'unsupported password hash: Malformed password hash'
+    assert errors[4] == 'unsupported password hash: Malformed argon2 hash parameters'
+    assert errors[5] == 'unsupported password hash: Unknown password hash method: md5'
+    assert errors[6].startswith('email: value is not a valid email address')
+    assert errors[7] == 'hashed_password is longer than 1024 characters'
+    assert errors[8] == 'user with this email already exists'
+    assert errors[10] == 'duplicate email in the import'
+
+
+async def test_run_isolates_rows_rejected_by_the_db():
+    importer = RecordingImporter(chunk_size=8)
+    hashed_passwords = [HASHED_PASSWORD] * 8
+    hashed_passwords[5] = HASHED_PASSWORD + '\\u0000'
+    lines = ndjson(*(f'{{"email": "user{i}@mail.com", "hashed_password": "{hashed_password}"}}'
+                     for i, hashed_password in enumerate(hashed_passwords)))
+
+    result = await importer.run(lines, ImportFormat.ndjson)
+
+    assert (result.imported, result.failed) == (7, 1)
+    assert result.errors[0].line == 6
+    assert result.errors[0].error.startswith('user is not imported: invalid byte sequence')
+    # The chunk, its half and the quarter with the bad row fail, the other parts are inserted once.
+    assert sorted(len(records) for records in importer.inserts) == [1, 1, 2, 2, 4, 4, 8]
+
+
+async def test_run_fails_the_chunk_on_other_errors():
+    class UnavailableImporter(RecordingImporter):
+        async def insert_records(self, records: list[tuple]) -> set[str]:
+            self.inserts.append(records)
+            raise ConnectionRefusedError('connection refused')
+
+    importer = UnavailableImporter(chunk_size=10)
+    lines = ndjson(*(f'{{"email": "user{i}@mail.com", "hashed_password": "{HASHED_PASSWORD}"}}' for i in range(3)))
+
+    result = await importer.run(lines, ImportFormat.ndjson)
+
+    assert (result.imported, result.failed) == (0, 3)
+    assert len(importer.inserts) == 1
+    assert {error.error for error in result.errors} == {'chunk is not imported: connection refused'}